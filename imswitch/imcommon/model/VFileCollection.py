@@ -1,6 +1,9 @@
+import os
+import shutil
+from collections import OrderedDict
 from dataclasses import dataclass
 from io import IOBase
-from typing import Union
+from typing import Optional, Union
 
 import h5py
 
@@ -16,16 +19,58 @@ class VFileItem:
 
 class VFileCollection(SignalInterface):
     """ VFileCollection is a collection of virtual file-like objects. In
-    addition to holding the data, it also handles saving it to the disk. """
+    addition to holding the data, it also handles saving it to the disk.
+
+    If a memory budget is set, the in-memory files are kept within it by
+    evicting the least recently used of them when new data is set, or when
+    more memory is reserved for files that are still being written: they are
+    saved to disk (to their save paths, or next to them if those are taken)
+    and then removed from the collection. sigDataWillEvict is emitted before
+    an evicted file is closed, after sigDataSavedToDisk, so that users of the
+    data can switch to the saved file. """
 
     sigDataSet = Signal(str, VFileItem)  # (name, vFileItem)
     sigDataSavedToDisk = Signal(str, str)  # (name, filePath)
+    sigDataWillEvict = Signal(str)  # (name)
     sigDataWillRemove = Signal(str)  # (name)
     sigDataRemoved = Signal(str)  # (name)
 
-    def __init__(self):
+    def __init__(self, memoryBudget: Optional[int] = None):
         super().__init__()
-        self._data = {}
+        self._data = OrderedDict()  # In order of use, least recently used first
+        self._memoryBudget = memoryBudget
+        self._reservedMemory = 0
+
+    @property
+    def memoryBudget(self) -> Optional[int]:
+        """ The maximum number of bytes of in-memory files to hold, or None
+        for no limit. """
+        return self._memoryBudget
+
+    @memoryBudget.setter
+    def memoryBudget(self, value: Optional[int]):
+        self._memoryBudget = value
+        self._evictIfOverBudget()
+
+    @property
+    def reservedMemory(self) -> int:
+        """ The number of bytes held by in-memory files that are still being
+        written (such as recordings in progress), and so are not yet in the
+        collection. They count towards the memory budget, but can't be
+        evicted. """
+        return self._reservedMemory
+
+    @reservedMemory.setter
+    def reservedMemory(self, value: int):
+        self._reservedMemory = value
+        self._evictIfOverBudget()
+
+    @property
+    def memoryUsage(self) -> int:
+        """ The number of bytes held by in-memory files, including the
+        reserved memory. """
+        return (self._reservedMemory +
+                sum(self._getMemoryUsage(item) for item in self._data.values()))
 
     def getSavePath(self, name):
         """ Returns the path to which the file associated with the given name
@@ -35,19 +80,31 @@ class VFileCollection(SignalInterface):
     def saveToDisk(self, name):
         """ Saves the data with the given name to disk. """
         filePath = self.getSavePath(name)
-
-        if isinstance(self._data[name].data, IOBase):
-            with open(filePath, 'wb') as file:
-                file.write(self._data[name].data.getbuffer())
-        elif isinstance(self._data[name].data, h5py.File):
-            with open(filePath, 'wb') as file:
-                file.write(self._data[name].data.id.get_file_image())
+        data = self._data[name].data
+
+        # The data is written piece by piece, so that no full copy of the file is made in memory
+        if isinstance(data, IOBase):
+            with data.getbuffer() as buffer, open(filePath, 'wb') as file:
+                for start in range(0, buffer.nbytes, _saveBlockBytes):
+                    file.write(buffer[start:start + _saveBlockBytes])
+        elif isinstance(data, h5py.File):
+            data.flush()
+            if _isFileOnDisk(data):
+                if os.path.abspath(data.filename) != os.path.abspath(filePath):
+                    shutil.copyfile(data.filename, filePath)
+            else:
+                with h5py.File(filePath, 'w') as file:
+                    file.attrs.update(data.attrs)
+                    for key in data.keys():
+                        data.copy(data[key], file, name=key)
         else:
-            raise TypeError(f'Data has unsupported type "{type(self._data[name].data).__name__}"')
+            raise TypeError(f'Data has unsupported type "{type(data).__name__}"')
 
+        self._data[name].savedToDisk = True
         self.sigDataSavedToDisk.emit(name, filePath)
 
     def __getitem__(self, name):
+        self._data.move_to_end(name)  # Mark as most recently used
         return self._data[name]
 
     def __setitem__(self, name, value):
@@ -58,7 +115,9 @@ class VFileCollection(SignalInterface):
             del self._data[name]
 
         self._data[name] = value
+        self._data.move_to_end(name)
         self.sigDataSet.emit(name, value)
+        self._evictIfOverBudget()
 
     def __delitem__(self, name):
         self.sigDataWillRemove.emit(name)
@@ -70,7 +129,55 @@ class VFileCollection(SignalInterface):
         return name in self._data
 
     def __iter__(self):
-        yield from self._data.items()
+        yield from list(self._data.items())
+
+    def _evictIfOverBudget(self):
+        if self._memoryBudget is None:
+            return
+
+        memoryUsage = self.memoryUsage
+        for name, item in list(self._data.items()):
+            if memoryUsage <= self._memoryBudget:
+                break
+
+            itemMemoryUsage = self._getMemoryUsage(item)
+            if itemMemoryUsage < 1:
+                continue
+
+            self._evict(name)
+            memoryUsage -= itemMemoryUsage
+
+    def _evict(self, name):
+        item = self._data[name]
+        if os.path.exists(item.filePath):
+            item.filePath = _getUnusedPath(item.filePath)
+        self.saveToDisk(name)
+
+        self.sigDataWillEvict.emit(name)
+        item.data.close()
+        del self._data[name]
+
+    @staticmethod
+    def _getMemoryUsage(item):
+        if isinstance(item.data, IOBase) and not item.data.closed:
+            with item.data.getbuffer() as buffer:
+                return buffer.nbytes
+        return 0  # Data in files on disk doesn't count towards the budget
+
+
+def _isFileOnDisk(file):
+    return file.driver != 'fileobj' and os.path.isfile(file.filename)
+
+
+def _getUnusedPath(path):
+    pathWithoutExt, pathExt = os.path.splitext(path)
+    numExisting = 1
+    while os.path.exists(f'{pathWithoutExt}_{numExisting}{pathExt}'):
+        numExisting += 1
+    return f'{pathWithoutExt}_{numExisting}{pathExt}'
+
+
+_saveBlockBytes = 16 * 1024 ** 2
 
 
 # Copyright (C) 2020-2021 ImSwitch developers
@@ -3,6 +3,8 @@ from .BetterSlider import BetterSlider
 from .CheckableComboBox import CheckableComboBox
 from .FloatSlider import FloatSlider
 from .dialogtools import askYesNoQuestion, askForFilePath, askForFolderPath, askForTextInput
-from .imagetools import bestLevels, minmaxLevels
+from .imagetools import (
+    bestLevels, minmaxLevels, sampleImage, LevelsEstimator, displayPyramid, DisplayPyramidBuilder
+)
 from .stylesheet import getBaseStyleSheet
 from .texttools import ordinalSuffix
@@ -43,6 +43,140 @@ def minmaxLevels(arr):
     return minlevel, maxlevel
 
 
+def sampleImage(arr, maxSamples=65536):
+    """ Returns a strided sample of about maxSamples pixels of an array, as a
+    view. Levels estimated from the sample are close to those of the full
+    array, at a fraction of the cost. """
+    step = int(np.ceil((arr.size / maxSamples) ** (1 / arr.ndim))) if arr.ndim > 0 else 1
+    return arr[(slice(None, None, max(step, 1)),) * arr.ndim]
+
+
+class LevelsEstimator:
+    """ Estimates display levels for a stream of frames. The levels are
+    percentiles of a strided sample of the pixels of each frame, smoothed
+    exponentially across frames. New levels are only reported when they have
+    moved by more than a fraction of the display range, so that the display
+    doesn't follow noise. """
+
+    def __init__(self, percentiles=(0, 100), maxSamples=65536, smoothing=0.5,
+                 tolerance=0.02):
+        """
+        Args:
+            percentiles: The percentiles of the pixel values to use as the
+              lower and upper level.
+            maxSamples: The number of pixels to sample from each frame.
+            smoothing: The weight of the latest frame in the smoothed levels,
+              between 0 and 1. 1 means no smoothing.
+            tolerance: The fraction of the reported display range that the
+              levels must move by before new levels are reported.
+        """
+        self._percentiles = list(percentiles)
+        self._maxSamples = maxSamples
+        self._smoothing = smoothing
+        self._tolerance = tolerance
+        self.reset()
+
+    def reset(self):
+        """ Forgets the previous frames; the levels of the next frame are
+        reported as they are. """
+        self._levels = None
+        self._reportedLevels = None
+
+    def update(self, image):
+        """ Updates the levels with a new frame. Returns the new levels as a
+        tuple (min, max) if they should be applied, otherwise None. Empty
+        frames are ignored. """
+        sample = sampleImage(image, self._maxSamples)
+        if sample.size < 1:
+            return None
+        if self._percentiles == [0, 100]:
+            levels = np.array([sample.min(), sample.max()], dtype=float)
+        else:
+            levels = np.percentile(sample, self._percentiles)
+
+        if self._levels is None:
+            self._levels = levels
+        else:
+            self._levels = self._smoothing * levels + (1 - self._smoothing) * self._levels
+
+        if self._reportedLevels is not None:
+            reportedRange = max(self._reportedLevels[1] - self._reportedLevels[0], 1)
+            change = np.abs(self._levels - self._reportedLevels).max()
+            if change <= self._tolerance * reportedRange:
+                return None
+
+        self._reportedLevels = self._levels.copy()
+        low, high = self._reportedLevels
+        return float(low), float(max(high, low + 1))
+
+
+def displayPyramid(image, minSize=512):
+    """ Returns a list of increasingly coarse versions of a 2D image, for
+    display as a napari multiscale layer. The first level is the image itself;
+    each following level halves the previous one by averaging 2x2 blocks,
+    until the largest dimension is at most minSize pixels. The coarse levels
+    are float32, which is what napari uploads to the GPU. """
+    levels = [image]
+    for _ in _pyramidShapes(image.shape, minSize):
+        levels.append(_halveImage(levels[-1]))
+    return levels
+
+
+class DisplayPyramidBuilder:
+    """ Builds display pyramids (see displayPyramid) of a stream of frames,
+    into coarse levels that are reused from frame to frame instead of being
+    allocated for every frame. The levels are kept for the shape and dtype of
+    the latest frame, in numBuffers sets that are used in turn, since a
+    pyramid is still being displayed while the next one is built. A pyramid
+    returned by build is therefore overwritten numBuffers builds later. """
+
+    def __init__(self, minSize=512, numBuffers=2):
+        self._minSize = minSize
+        self._numBuffers = numBuffers
+        self._key = None
+        self._bufferSets = []
+        self._nextBufferSet = 0
+
+    def build(self, image):
+        """ Returns the display pyramid of a 2D image, like displayPyramid.
+        """
+        key = image.shape, image.dtype
+        if key != self._key:
+            shapes = list(_pyramidShapes(image.shape, self._minSize))
+            self._bufferSets = [[np.empty(shape, dtype=np.float32) for shape in shapes]
+                                for _ in range(self._numBuffers)]
+            self._nextBufferSet = 0
+            self._key = key
+
+        buffers = self._bufferSets[self._nextBufferSet]
+        self._nextBufferSet = (self._nextBufferSet + 1) % self._numBuffers
+
+        levels = [image]
+        for buffer in buffers:
+            levels.append(_halveImage(levels[-1], out=buffer))
+        return levels
+
+
+def _pyramidShapes(shape, minSize):
+    """ Yields the shapes of the coarse levels of the display pyramid of an
+    image with the specified shape. """
+    while max(shape) > minSize and min(shape) >= 2:
+        shape = shape[0] // 2, shape[1] // 2
+        yield shape
+
+
+def _halveImage(image, out=None):
+    height, width = image.shape[0] // 2 * 2, image.shape[1] // 2 * 2
+    if out is None:
+        out = np.empty((height // 2, width // 2), dtype=np.float32)
+    np.copyto(out, image[0:height:2, 0:width:2], casting='unsafe')
+    out += image[1:height:2, 0:width:2]
+    out += image[0:height:2, 1:width:2]
+    out += image[1:height:2, 1:width:2]
+    out *= 0.25
+    return out
+
+
 # Copyright (C) 2017 Federico Barabas
 # This file is part of Tormenta.
 #
@@ -8,7 +8,7 @@ from vispy.color import Color
 from vispy.scene.visuals import Compound, Line, Markers
 from vispy.visuals.transforms import STTransform
 
-from .imagetools import minmaxLevels
+from .imagetools import minmaxLevels, sampleImage
 
 
 def addNapariGrayclipColormap():
@@ -113,7 +113,9 @@ class NapariBaseWidget(QtWidgets.QWidget):
 
 class NapariUpdateLevelsWidget(NapariBaseWidget):
     """ Napari widget for auto-levelling the currently selected layer with a
-    single click. """
+    single click, and for toggling continuous auto-levelling. """
+
+    sigContinuousToggled = QtCore.Signal(bool)  # (enabled)
 
     @property
     def name(self):
@@ -126,9 +128,14 @@ class NapariUpdateLevelsWidget(NapariBaseWidget):
         self.updateLevelsButton = QtWidgets.QPushButton('Update levels')
         self.updateLevelsButton.clicked.connect(self._on_update_levels)
 
+        # Continuous levels checkbox
+        self.continuousCheck = QtWidgets.QCheckBox('Continuous')
+        self.continuousCheck.toggled.connect(self.sigContinuousToggled)
+
         # Layout
         self.setLayout(QtWidgets.QVBoxLayout())
         self.layout().addWidget(self.updateLevelsButton)
+        self.layout().addWidget(self.continuousCheck)
 
         # Make sure widget isn't too big
         self.setSizePolicy(QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding,
@@ -136,7 +143,8 @@ class NapariUpdateLevelsWidget(NapariBaseWidget):
 
     def _on_update_levels(self):
         for layer in self.viewer.layers.selected:
-            layer.contrast_limits = minmaxLevels(layer.data)
+            data = layer.data[0] if layer.multiscale else layer.data
+            layer.contrast_limits = minmaxLevels(np.asarray(sampleImage(data)))
 
 
 class NapariShiftWidget(NapariBaseWidget):
@@ -79,6 +79,41 @@ detectorInfosNonSquare = {
     )
 }
 
+detectorInfosSynthetic = {
+    'CAM': DetectorInfo(
+        analogChannel=None,
+        digitalLine=None,
+        managerName='SyntheticCameraManager',
+        managerProperties={
+            'width': 256,
+            'height': 128,
+            'fps': 2000,
+            'pattern': 'beads',
+            'bankSize': 128
+        },
+        forAcquisition=True
+    )
+}
+
+detectorInfosSyntheticMulti = {
+    'Camera 1': detectorInfosSynthetic['CAM'],
+    'Camera 2': DetectorInfo(
+        analogChannel=None,
+        digitalLine=None,
+        managerName='SyntheticCameraManager',
+        managerProperties={
+            'width': 256,
+            'height': 128,
+            'fps': 2000,
+            'pattern': 'noise',
+            'bankSize': 128,
+            'dropProbability': 0.1,
+            'seed': 0  # Keeps the first frames, which index alignment counts from
+        },
+        forAcquisition=True
+    )
+}
+
 
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
@@ -1,8 +1,13 @@
+import time
+
 import numpy as np
 import pytest
 
 from imswitch.imcontrol.model import DetectorsManager
-from . import detectorInfosBasic, detectorInfosMulti, detectorInfosNonSquare
+from . import (
+    detectorInfosBasic, detectorInfosMulti, detectorInfosNonSquare, detectorInfosSynthetic,
+    detectorInfosSyntheticMulti
+)
 
 
 def getImage(qtbot, detectorsManager):
@@ -55,6 +60,233 @@ def test_acquisition_liveview_multi(qtbot, currentDetector):
     assert not np.all(receivedImage == receivedImage[0, 0])  # Assert that not all pixels are same
 
 
+def test_acquisition_liveview_display_rate(qtbot):
+    detectorsManager = DetectorsManager(detectorInfosBasic, updatePeriod=10, maxDisplayRate=2)
+    numImagesReceived = 0
+
+    def imageUpdated(*_):
+        nonlocal numImagesReceived
+        numImagesReceived += 1
+
+    detectorsManager.sigImageUpdated.connect(imageUpdated)
+    handle = detectorsManager.startAcquisition(liveView=True)
+    qtbot.wait(2000)
+    detectorsManager.stopAcquisition(handle, liveView=True)
+
+    # Mock camera runs at 10 fps, so most frames should have been skipped for display
+    assert 1 <= numImagesReceived <= 6
+    assert detectorsManager.getNumFramesSkippedForDisplay('CAM') > 0
+
+
+def test_acquisition_liveview_frame_arrival(qtbot):
+    # The worker's own poll never fires, so only frames pulled by getChunk can be displayed
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=60000,
+                                        maxDisplayRate=None)
+    detector = detectorsManager['CAM']
+    numImagesReceived = 0
+
+    def imageUpdated(*_):
+        nonlocal numImagesReceived
+        numImagesReceived += 1
+
+    detectorsManager.sigImageUpdated.connect(imageUpdated)
+    handle = detectorsManager.startAcquisition(liveView=True)
+    for _ in range(20):
+        detector.getChunk()
+        qtbot.wait(10)
+    detectorsManager.stopAcquisition(handle, liveView=True)
+
+    assert numImagesReceived > 5
+
+
+@pytest.mark.parametrize('acknowledge', [False, True])
+def test_acquisition_liveview_wait_for_display(qtbot, acknowledge):
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=10,
+                                        maxDisplayRate=None)
+    detectorsManager.setWaitForDisplay(True)
+    numImagesReceived = 0
+
+    def imageUpdated(detectorName, *_):
+        nonlocal numImagesReceived
+        numImagesReceived += 1
+        if acknowledge:
+            detectorsManager.imageDisplayed(detectorName)
+
+    detectorsManager.sigImageUpdated.connect(imageUpdated)
+    handle = detectorsManager.startAcquisition(liveView=True)
+    qtbot.wait(500)
+    detectorsManager.stopAcquisition(handle, liveView=True)
+
+    if acknowledge:
+        assert numImagesReceived > 5
+    else:
+        assert numImagesReceived == 1  # Held back until the first one is reported displayed
+
+
+def test_acquisition_chunk_metadata(qtbot):
+    detectorsManager = DetectorsManager(detectorInfosBasic, updatePeriod=100)
+    detector = detectorsManager['CAM']
+
+    handle = detectorsManager.startAcquisition()
+    detector.getChunk()
+    qtbot.wait(1000)
+    frames, metadata = detector.getChunk(withMetadata=True)
+    detectorsManager.stopAcquisition(handle)
+
+    assert len(frames) > 0
+    assert len(metadata) == len(frames)
+    assert np.all(np.diff(metadata['frameNumber']) == 1)
+    assert np.all(np.isfinite(metadata['timestamp']))
+    assert detector.droppedFrames == 0
+
+
+def test_acquisition_synthetic_high_rate(qtbot):
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=10)
+    detector = detectorsManager['CAM']
+
+    handle = detectorsManager.startAcquisition()
+    numFrames = 0
+    for _ in range(50):
+        qtbot.wait(10)
+        frames, metadata = detector.getChunk(withMetadata=True)
+        assert frames.shape[1:] == (128, 256)
+        numFrames += len(frames)
+    detectorsManager.stopAcquisition(handle)
+
+    assert numFrames >= 1000  # At least 0.5 s at 2000 fps
+    assert detector.droppedFrames == 0
+
+
+def test_acquisition_software_binning(qtbot):
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=10)
+    detector = detectorsManager['CAM']
+    assert detector.supportedBinnings == [1, 2, 4]
+
+    detector.setBinning(4)
+    assert detector.softwareBinning == 4
+    assert detector.shape == (64, 32)
+    assert detector.pixelSizeUm == [1, 4, 4]
+
+    handle = detectorsManager.startAcquisition()
+    detector.getChunk()
+    qtbot.wait(50)
+    frames = detector.getChunk()
+    detectorsManager.stopAcquisition(handle)
+
+    assert len(frames) > 0
+    assert frames.shape[1:] == (32, 64)
+    assert frames.dtype == np.uint16
+
+    frame = np.arange(4 * 6, dtype=np.uint16).reshape(4, 6)
+    detector.setBinning(2)
+    assert np.array_equal(detector.binFrames(frame), [[3, 5, 7], [15, 17, 19]])
+
+
+def test_acquisition_frame_bundles(qtbot):
+    detectorsManager = DetectorsManager(detectorInfosSyntheticMulti, updatePeriod=10)
+    aggregator = detectorsManager.createFrameAggregator(alignBy='index')
+
+    handle = detectorsManager.startAcquisition()
+    bundles = []
+    for _ in range(20):
+        qtbot.wait(10)
+        bundles += aggregator.poll()
+    detectorsManager.stopAcquisition(handle)
+
+    assert len(bundles) > 0
+    for bundle in bundles:
+        assert set(bundle.frames.keys()) == {'Camera 1', 'Camera 2'}
+        assert (bundle.metadata['Camera 1']['frameNumber'] ==
+                bundle.metadata['Camera 2']['frameNumber'])
+    # Camera 2 drops frames, so the corresponding frames from camera 1 are stragglers
+    assert aggregator.numStragglers['Camera 1'] > 0
+
+
+def test_acquisition_start_readiness(qtbot):
+    detectorsManager = DetectorsManager(detectorInfosSyntheticMulti, updatePeriod=10)
+
+    startTime = time.monotonic()
+    handle = detectorsManager.startAcquisition(liveView=True)
+    startDuration = time.monotonic() - startTime
+    try:
+        # Both cameras run at 2000 fps, so they are ready long before the timeout
+        assert startDuration < 0.3
+        assert detectorsManager.waitUntilReady(timeout=0)
+        for detectorName in ['Camera 1', 'Camera 2']:
+            assert detectorsManager[detectorName].frameBuffer.writeCount > 0
+    finally:
+        detectorsManager.stopAcquisition(handle, liveView=True)
+
+
+def test_acquisition_without_liveview(qtbot):
+    # Nothing reads the frames, so only the acquisition worker can pull them from the detector
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=10)
+    detector = detectorsManager['CAM']
+    reader = detector.frameBuffer.createReader()
+    numNewFrames = 0
+    numImagesReceived = 0
+
+    def newFrames(numFrames):
+        nonlocal numNewFrames
+        numNewFrames += numFrames
+
+    def imageUpdated(*_):
+        nonlocal numImagesReceived
+        numImagesReceived += 1
+
+    detector.sigNewFrames.connect(newFrames)
+    detectorsManager.sigImageUpdated.connect(imageUpdated)
+    handle = detectorsManager.startAcquisition()
+    qtbot.wait(500)
+    detectorsManager.stopAcquisition(handle)
+    qtbot.wait(50)  # Deliver the remaining sigNewFrames emissions from the worker thread
+
+    assert numNewFrames > 0
+    assert numNewFrames == detector.frameBuffer.writeCount
+    assert 0 < reader.numAvailable <= numNewFrames
+    _, metadata = reader.readMetadata()
+    assert np.all(np.diff(metadata['timestamp']) > 0)
+    assert numImagesReceived == 0  # Nothing is displayed without live view
+
+
+def test_acquisition_worker_lifecycle(qtbot):
+    detectorsManager = DetectorsManager(detectorInfosSyntheticMulti, updatePeriod=10)
+    acqThreads = detectorsManager._acqThreads.values()
+    numImagesReceived = 0
+
+    def imageUpdated(*_):
+        nonlocal numImagesReceived
+        numImagesReceived += 1
+
+    detectorsManager.sigImageUpdated.connect(imageUpdated)
+
+    # The workers run whenever acquisition is running, with or without live view
+    handle = detectorsManager.startAcquisition()
+    assert all(acqThread.isRunning() for acqThread in acqThreads)
+    qtbot.wait(100)
+    assert numImagesReceived == 0
+
+    lvHandle = detectorsManager.startAcquisition(liveView=True)
+    qtbot.waitUntil(lambda: numImagesReceived > 2, timeout=5000)
+
+    # Stopping live view stops the display, but not the workers
+    detectorsManager.stopAcquisition(lvHandle, liveView=True)
+    assert all(acqThread.isRunning() for acqThread in acqThreads)
+    qtbot.wait(50)
+    numImagesReceivedAfterLV = numImagesReceived
+    qtbot.wait(100)
+    assert numImagesReceived == numImagesReceivedAfterLV
+
+    # The threads are joined when acquisition stops, and when the manager is finalized
+    detectorsManager.stopAcquisition(handle)
+    assert all(acqThread.isFinished() for acqThread in acqThreads)
+
+    detectorsManager.startAcquisition(liveView=True)
+    assert all(acqThread.isRunning() for acqThread in acqThreads)
+    detectorsManager.finalize()
+    assert all(acqThread.isFinished() for acqThread in acqThreads)
+
+
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
 #
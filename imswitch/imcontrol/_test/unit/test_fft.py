@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from imswitch.imcontrol.controller.controllers.FFTController import FFTController
+
+
+def expectedFFTImage(image, binning, cropSize, window):
+    """ The full-spectrum reference that the worker's half-spectrum computation must match. """
+    image = image.astype(np.float64)
+    if binning > 1:
+        height = image.shape[0] // binning
+        width = image.shape[1] // binning
+        image = np.array([[image[y * binning:(y + 1) * binning,
+                                 x * binning:(x + 1) * binning].sum()
+                           for x in range(width)] for y in range(height)])
+    if cropSize is not None:
+        top = max((image.shape[0] - cropSize) // 2, 0)
+        left = max((image.shape[1] - cropSize) // 2, 0)
+        image = image[top:top + cropSize, left:left + cropSize]
+    if window:
+        image = image * np.outer(np.hanning(image.shape[0]), np.hanning(image.shape[1]))
+    return np.fft.fftshift(np.log10(1 + np.abs(np.fft.fft2(image))))
+
+
+def computeFFTImage(worker, image):
+    computed = []
+    worker.sigFftImageComputed.connect(computed.append)
+    try:
+        worker.prepareForNewImage(image)
+        worker.computeFFTImage()
+    finally:
+        worker.sigFftImageComputed.disconnect(computed.append)
+    assert len(computed) == 1
+    return computed[0].copy()
+
+
+@pytest.mark.parametrize('binning, cropSize, window', [
+    (1, None, False), (1, None, True), (2, None, True), (3, None, False), (1, 20, True),
+    (1, 21, False), (2, 15, True), (3, 200, True)
+])
+def test_fft_worker_matches_full_fft(qtbot, binning, cropSize, window):
+    worker = FFTController.FFTImageComputationWorker()
+    worker.binning = binning
+    worker.cropSize = cropSize
+    worker.window = window
+
+    rng = np.random.default_rng(0)
+    # Even and odd widths and heights, computed in turn so that the buffers are reallocated
+    for shape in [(64, 64), (63, 63), (64, 63), (63, 64), (48, 70), (47, 71), (64, 64)]:
+        image = rng.integers(0, 4096, size=shape).astype(np.uint16)
+        expected = expectedFFTImage(image, binning, cropSize, window)
+        fftImage = computeFFTImage(worker, image)
+        assert fftImage.shape == expected.shape, shape
+        np.testing.assert_allclose(fftImage, expected, rtol=1e-4, atol=1e-4,
+                                   err_msg=f'shape {shape}')
+
+
+def test_fft_worker_alternates_output_buffers(qtbot):
+    worker = FFTController.FFTImageComputationWorker()
+    image = np.random.default_rng(0).integers(0, 4096, size=(32, 33)).astype(np.uint16)
+
+    outputs = []
+    worker.sigFftImageComputed.connect(outputs.append)
+    for _ in range(3):
+        worker.prepareForNewImage(image)
+        worker.computeFFTImage()
+
+    assert outputs[0] is not outputs[1]  # One can be displayed while the other is filled
+    assert outputs[0] is outputs[2]
+    np.testing.assert_allclose(outputs[1], expectedFFTImage(image, 1, None, True),
+                               rtol=1e-4, atol=1e-4)
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,141 @@
+import os
+
+import numpy as np
+
+from imswitch.imcontrol.model.managers.detectors.FrameAggregator import FrameAggregator
+from imswitch.imcontrol.model.managers.detectors.FrameBuffer import (
+    FrameBuffer, frameMetadataDtype
+)
+from imswitch.imcontrol.model.managers.detectors.SharedFrameRing import (
+    SharedFrameRingReader, SharedFrameRingWriter
+)
+
+
+def makeFrames(start, num, shape=(4, 6)):
+    return np.stack([np.full(shape, i, dtype=np.uint16) for i in range(start, start + num)])
+
+
+def test_framebuffer_read_is_view():
+    frameBuffer = FrameBuffer(8)
+    reader = frameBuffer.createReader()
+    frameBuffer.push(makeFrames(0, 3))
+
+    chunk = reader.read()
+    assert chunk.shape == (3, 4, 6)
+    assert chunk.dtype == np.uint16
+    assert np.shares_memory(chunk, frameBuffer.latest())
+    assert list(chunk[:, 0, 0]) == [0, 1, 2]
+    assert len(reader.read()) == 0
+
+
+def test_framebuffer_wraparound_and_overrun():
+    frameBuffer = FrameBuffer(4)
+    reader = frameBuffer.createReader()
+
+    frameBuffer.push(makeFrames(0, 3))
+    assert list(reader.read()[:, 0, 0]) == [0, 1, 2]
+
+    frameBuffer.push(makeFrames(3, 3))  # Wraps around the end of the buffer
+    assert list(reader.read()[:, 0, 0]) == [3, 4, 5]
+    assert reader.droppedFrames == 0
+
+    frameBuffer.push(list(makeFrames(6, 6)))  # More than the capacity
+    assert list(reader.read()[:, 0, 0]) == [8, 9, 10, 11]
+    assert reader.droppedFrames == 2
+    assert frameBuffer.overruns == 2
+
+
+def test_framebuffer_independent_readers():
+    frameBuffer = FrameBuffer(8)
+    reader1 = frameBuffer.createReader()
+    frameBuffer.push(makeFrames(0, 2))
+    reader2 = frameBuffer.createReader()
+    frameBuffer.push(makeFrames(2, 2)[0])  # A single 2D frame
+
+    assert list(reader1.read()[:, 0, 0]) == [0, 1, 2]
+    assert list(reader2.read()[:, 0, 0]) == [2]
+
+    frameBuffer.push(makeFrames(3, 1, shape=(2, 2)))  # Shape change reallocates
+    assert reader1.read().shape == (1, 2, 2)
+    assert frameBuffer.createReader(fromStart=True).read().shape == (1, 2, 2)
+
+
+class FakeDetector:
+    def __init__(self, capacity):
+        self.frameBuffer = FrameBuffer(capacity)
+
+    def pullFrames(self):
+        return 0
+
+    def push(self, start, num):
+        metadata = np.empty(num, dtype=frameMetadataDtype)
+        metadata['timestamp'] = np.arange(start, start + num)
+        metadata['frameNumber'] = np.arange(start, start + num)
+        metadata['exposure'] = np.nan
+        self.frameBuffer.push(makeFrames(start, num), metadata)
+
+
+def test_frame_aggregator_lagging_detector():
+    detectors = {'fast': FakeDetector(4), 'slow': FakeDetector(4)}
+    aggregator = FrameAggregator(detectors, alignBy='timestamp', tolerance=0.1)
+
+    # The fast detector gets more than its frame buffer capacity ahead of the slow one, so its
+    # earliest frames are overwritten before their counterparts arrive
+    bundles = []
+    for start in range(0, 8, 2):
+        detectors['fast'].push(start, 2)
+        bundles += aggregator.poll()
+    for start in range(0, 8, 2):
+        detectors['slow'].push(start, 2)
+        bundles += aggregator.poll()
+
+    assert [bundle.metadata['fast']['frameNumber'] for bundle in bundles] == [4, 5, 6, 7]
+    for bundle in bundles:
+        frameNumber = bundle.metadata['fast']['frameNumber']
+        assert np.all(bundle.frames['fast'] == frameNumber)
+        assert np.all(bundle.frames['slow'] == frameNumber)
+    assert aggregator.numStragglers == {'fast': 4, 'slow': 4}
+
+
+def test_shared_frame_ring():
+    writer = SharedFrameRingWriter(f'imswitch_test_{os.getpid()}', capacity=4)
+    try:
+        reader = SharedFrameRingReader(writer.name)  # Attaches on first read
+        writer.push(makeFrames(0, 3))
+        frames, metadata = reader.read()
+        assert frames.shape == (3, 4, 6)
+        assert list(frames[:, 0, 0]) == [0, 1, 2]
+        assert len(metadata) == 3
+
+        writer.push(makeFrames(3, 3))  # Wraps around the end of the ring
+        assert list(reader.read()[0][:, 0, 0]) == [3]
+        assert list(reader.read()[0][:, 0, 0]) == [4, 5]
+        assert reader.isValid()
+
+        writer.push(makeFrames(6, 6))  # More than the capacity
+        assert not reader.isValid()
+        assert list(reader.read()[0][:, 0, 0]) == [8, 9, 10, 11]
+        assert reader.droppedFrames == 2
+
+        writer.push(makeFrames(12, 1, shape=(2, 2)))  # Shape change recreates the ring
+        assert reader.read()[0].shape == (1, 2, 2)
+        reader.close()
+    finally:
+        writer.close()
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
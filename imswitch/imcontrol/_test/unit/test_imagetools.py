@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from imswitch.imcommon.view.guitools.imagetools import (
+    DisplayPyramidBuilder, LevelsEstimator, displayPyramid, sampleImage, _halveImage
+)
+
+
+def test_sample_image():
+    image = np.arange(1000 * 1000).reshape(1000, 1000)
+    sample = sampleImage(image, maxSamples=10000)
+    assert np.shares_memory(sample, image)  # A view
+    assert sample.shape == (100, 100)
+    assert np.array_equal(sample, image[::10, ::10])
+
+    small = image[:50, :50]
+    assert np.array_equal(sampleImage(small, maxSamples=10000), small)  # Not subsampled
+    assert sampleImage(np.zeros((0, 5)), maxSamples=10000).size == 0
+
+
+def test_levels_estimator_defaults():
+    image = np.arange(100 * 100, dtype=np.uint16).reshape(100, 100)
+    assert LevelsEstimator().update(image) == (0, 100 * 100 - 1)  # Minimum and maximum
+
+    levels = LevelsEstimator(percentiles=(1, 99)).update(image)
+    assert levels == pytest.approx(tuple(np.percentile(image, [1, 99])))
+
+
+def test_levels_estimator_hysteresis():
+    estimator = LevelsEstimator(smoothing=0.5, tolerance=0.02)
+    image = np.zeros((10, 10))
+    image[0, 0] = 1000
+    assert estimator.update(image) == (0, 1000)
+
+    image[0, 0] = 1010  # Within the tolerance of 2% of the range, so noise
+    assert estimator.update(image) is None
+
+    image[0, 0] = 2000  # Smoothed to halfway between the old and new levels
+    assert estimator.update(image) == pytest.approx((0, 1502.5))
+
+    estimator.reset()  # Reported as they are after a reset
+    image[0, 0] = 1010
+    assert estimator.update(image) == (0, 1010)
+
+
+def test_levels_estimator_constant_and_empty():
+    estimator = LevelsEstimator()
+    low, high = estimator.update(np.full((20, 30), 7, dtype=np.uint8))
+    assert low == 7 and high > low  # A valid display range
+    assert estimator.update(np.zeros((0, 30), dtype=np.uint8)) is None
+    assert LevelsEstimator().update(np.zeros((0, 0))) is None
+
+
+def halve(image):
+    height, width = image.shape[0] // 2 * 2, image.shape[1] // 2 * 2
+    blocks = image[:height, :width].astype(np.float64).reshape(height // 2, 2, width // 2, 2)
+    return blocks.mean(axis=(1, 3))
+
+
+@pytest.mark.parametrize('dtype', [np.uint8, np.uint16, np.int32, np.float32])
+@pytest.mark.parametrize('shape', [(7, 5), (8, 6), (3, 9)])
+def test_halve_image(dtype, shape):
+    rng = np.random.default_rng(0)
+    image = (rng.random(shape) * 200).astype(dtype)
+    halved = _halveImage(image)
+
+    assert halved.dtype == np.float32
+    assert halved.shape == (shape[0] // 2, shape[1] // 2)
+    assert np.allclose(halved, halve(image), rtol=1e-6)
+
+    out = np.full(halved.shape, np.nan, dtype=np.float32)
+    assert _halveImage(image, out=out) is out
+    assert np.array_equal(out, halved)
+
+
+@pytest.mark.parametrize('dtype', [np.uint8, np.uint16, np.float32])
+def test_display_pyramid(dtype):
+    image = np.arange(1025 * 1537, dtype=np.uint32).reshape(1025, 1537).astype(dtype)
+    pyramid = displayPyramid(image, minSize=512)
+
+    assert pyramid[0] is image
+    assert [level.shape for level in pyramid] == [(1025, 1537), (512, 768), (256, 384)]
+    assert all(level.dtype == np.float32 for level in pyramid[1:])
+    assert np.allclose(pyramid[1], halve(image), rtol=1e-6)
+    assert np.allclose(pyramid[2], halve(halve(image)), rtol=1e-5)
+    assert len(displayPyramid(image[:400, :300], minSize=512)) == 1  # Already small enough
+
+
+def test_display_pyramid_builder():
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 4096, (1023, 2049), dtype=np.uint16) for _ in range(3)]
+    builder = DisplayPyramidBuilder(minSize=512, numBuffers=2)
+    pyramids = [builder.build(image) for image in images]
+
+    for pyramid, image in zip(pyramids[1:], images[1:]):
+        expected = displayPyramid(image, minSize=512)
+        assert len(pyramid) == len(expected) == 3
+        assert all(np.array_equal(level, expectedLevel)
+                   for level, expectedLevel in zip(pyramid, expected))
+    # The buffers are used in turn, so the first pyramid was overwritten by the third
+    assert pyramids[2][1] is pyramids[0][1]
+    assert pyramids[1][1] is not pyramids[0][1]
+
+    # A new shape or dtype gets buffers of its own
+    smaller = builder.build(images[0][:600, :600])
+    assert [level.shape for level in smaller] == [(600, 600), (300, 300)]
+    floatPyramid = builder.build(images[0].astype(np.float32))
+    assert not any(level is previous
+                   for level, previous in zip(floatPyramid[1:], pyramids[2][1:]))
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -1,9 +1,37 @@
-import pytest
+import json
+import os
+import threading
+from io import BytesIO
 
 import h5py
+import numpy as np
+import pytest
+import tifffile
 
-from imswitch.imcontrol.model import DetectorsManager, RecordingManager, RecMode, SaveMode
-from . import detectorInfosBasic, detectorInfosMulti, detectorInfosNonSquare
+from imswitch.imcommon.controller import ModuleCommunicationChannel
+from imswitch.imcommon.model import VFileCollection, VFileItem
+from imswitch.imcontrol.model import DetectorsManager, RecordingManager, RecMode, SaveFormat, \
+    SaveMode
+from imswitch.imcontrol.model.SetupInfo import FrameBrokerInfo, RecordingInfo
+from imswitch.imcontrol.model.managers.detectors.FrameBuffer import frameMetadataDtype
+from imswitch.imcontrol.model.managers.detectors.SharedFrameRing import SharedFrameRingReader
+from imswitch.imcontrol.model.interfaces.syntheticcamera import SyntheticCamera
+from imswitch.imcontrol.model.managers.recording.Compression import ChunkCompressor
+from imswitch.imcontrol.model.managers.recording.HDF5Writer import HDF5Writer
+from imswitch.imcontrol.model.managers.recording.RawWriter import RawWriter
+from imswitch.imcontrol.model.managers.recording.RolloverWriter import RolloverWriter
+from imswitch.imcontrol.model.managers.recording.TIFFWriter import TIFFWriter
+from imswitch.imcontrol.model.managers.recording.WriteQueue import WriteQueue
+from imswitch.imcontrol.model.managers.recording.ZarrWriter import ZarrWriter
+from imswitch.imreconstruct.controller.CommunicationChannel import (
+    CommunicationChannel as ImRecCommunicationChannel
+)
+from imswitch.imreconstruct.controller.MultiDataFrameController import MultiDataFrameController
+from imswitch.imreconstruct.model import DataObj
+from imswitch.imreconstruct.view.MultiDataFrame import MultiDataFrame
+from . import (
+    detectorInfosBasic, detectorInfosMulti, detectorInfosNonSquare, detectorInfosSynthetic
+)
 
 
 def record(qtbot, detectorInfos, *args, **kwargs):
@@ -31,7 +59,8 @@ def record(qtbot, detectorInfos, *args, **kwargs):
 
 
 @pytest.mark.parametrize('detectorInfos,numFrames',
-                         [(detectorInfosBasic, 10), (detectorInfosNonSquare, 53)])
+                         [(detectorInfosBasic, 10), (detectorInfosNonSquare, 53),
+                          (detectorInfosSynthetic, 200)])
 def test_recording_spec_frames(qtbot, detectorInfos, numFrames):
     filePerDetector, savedToDiskPerDetector = record(
         qtbot,
@@ -54,12 +83,45 @@ def test_recording_spec_frames(qtbot, detectorInfos, numFrames):
         h5pyFile = h5py.File(file)
         dataset = h5pyFile.get(detectorName)
         assert dataset.shape[0] == numFrames
+        assert dataset.dtype == np.uint16  # Native dtype of the detectors
         h5pyFile.close()  # Otherwise we can get segfaults
         file.close()  # Otherwise we can get segfaults
     for savedToDisk in savedToDiskPerDetector.values():
         assert savedToDisk is False
 
 
+def test_recording_memory_reconstruction_data(qtbot):
+    filePerDetector, _ = record(
+        qtbot,
+        detectorInfosMulti,
+        detectorNames=list(detectorInfosMulti.keys()),
+        recMode=RecMode.SpecFrames,
+        savename='test_memory_reconstruction',
+        saveMode=SaveMode.RAM,
+        attrs={detectorName: {} for detectorName in detectorInfosMulti.keys()},
+        recFrames=10
+    )
+
+    moduleCommChannel = ModuleCommunicationChannel()
+    widget = MultiDataFrame()
+    controller = MultiDataFrameController(ImRecCommunicationChannel(None), widget=widget,
+                                          factory=None, moduleCommChannel=moduleCommChannel)
+    for detectorName, file in filePerDetector.items():
+        moduleCommChannel.memoryRecordings[detectorName] = VFileItem(
+            data=file, filePath=f'{detectorName}.hdf5', savedToDisk=False
+        )
+
+    # The frame_metadata group stored next to each recording is not an image dataset
+    dataObjs = list(widget.getAllDataObjs())
+    assert sorted(dataObj.datasetName for dataObj in dataObjs) == sorted(detectorInfosMulti)
+    for dataObj in dataObjs:
+        assert dataObj.data.shape[0] == 10
+        dataObj.checkAndUnloadData()
+    for detectorName in detectorInfosMulti:
+        del moduleCommChannel.memoryRecordings[detectorName]
+    del controller
+
+
 @pytest.mark.parametrize('detectorInfos',
                          [detectorInfosBasic, detectorInfosMulti, detectorInfosNonSquare])
 def test_recording_spec_time(qtbot, detectorInfos):
@@ -90,6 +152,456 @@ def test_recording_spec_time(qtbot, detectorInfos):
         assert savedToDisk is False
 
 
+def test_recording_pre_trigger(qtbot, tmp_path):
+    numPreTriggerFrames = 300
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=100)
+    recordingManager = RecordingManager(detectorsManager)
+    recordingManager.startRecording(['CAM'], RecMode.PreTrigger, str(tmp_path / 'rec'),
+                                    SaveMode.Disk, {'CAM': {}},
+                                    preTriggerFrames=numPreTriggerFrames)
+    qtbot.wait(500)  # Much longer than it takes the detector to fill the buffer
+    assert not list(tmp_path.iterdir())  # Nothing is saved before the trigger
+
+    recordingManager.trigger()
+    qtbot.wait(200)
+    with qtbot.waitSignal(recordingManager.sigRecordingEnded, timeout=10000):
+        recordingManager.endRecording(wait=True)
+
+    with h5py.File(tmp_path / 'rec_CAM.hdf5', 'r') as file:
+        frameNumbers = file['frame_metadata/CAM']['frameNumber']
+        assert file['CAM'].shape[0] > numPreTriggerFrames
+        assert frameNumbers[0] > 0  # Older frames were discarded
+        assert np.array_equal(np.diff(frameNumbers), np.ones(len(frameNumbers) - 1))
+
+
+def test_recording_pre_trigger_time(qtbot, tmp_path):
+    preTriggerTime = 0.2
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=100)
+    recordingManager = RecordingManager(detectorsManager)
+    recordingManager.startRecording(['CAM'], RecMode.PreTrigger, str(tmp_path / 'rec'),
+                                    SaveMode.Disk, {'CAM': {}}, preTriggerTime=preTriggerTime)
+    qtbot.wait(1500)  # Longer than the rate measurement and the time span together
+
+    recordingManager.trigger()
+    with qtbot.waitSignal(recordingManager.sigRecordingEnded, timeout=10000):
+        recordingManager.endRecording(wait=True)  # So that nearly all frames are from before
+
+    with h5py.File(tmp_path / 'rec_CAM.hdf5', 'r') as file:
+        timestamps = file['frame_metadata/CAM']['timestamp']
+    assert np.all(np.diff(timestamps) > 0)
+    frameInterval = np.median(np.diff(timestamps))
+    # The frames kept before the trigger cover the requested time span
+    assert preTriggerTime - 2 * frameInterval <= timestamps[-1] - timestamps[0]
+    assert timestamps[-1] - timestamps[0] < preTriggerTime + 0.1
+
+
+def test_recording_frame_broker(qtbot, tmp_path):
+    numFrames = 200
+    frameBrokerInfo = FrameBrokerInfo(sharedMemoryPrefix=f'imswitch_test_{os.getpid()}',
+                                      capacity=1024)
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=100,
+                                        frameBrokerInfo=frameBrokerInfo)
+    try:
+        # No live view; the frames are only pulled from the detector by the recording
+        recordingManager = RecordingManager(detectorsManager)
+        with qtbot.waitSignal(recordingManager.sigRecordingEnded, timeout=10000):
+            recordingManager.startRecording(['CAM'], RecMode.SpecFrames, str(tmp_path / 'rec'),
+                                            SaveMode.Disk, {'CAM': {}}, recFrames=numFrames)
+
+        with h5py.File(tmp_path / 'rec_CAM.hdf5', 'r') as file:
+            recordedFrames = file['CAM'][:]
+            recordedFrameNumbers = file['frame_metadata/CAM']['frameNumber']
+
+        reader = SharedFrameRingReader(f'{frameBrokerInfo.sharedMemoryPrefix}_CAM',
+                                       fromStart=True)
+        publishedFrames, publishedMetadata = [], []
+
+        def allPublished():
+            frames, metadata = reader.read()
+            publishedFrames.extend(frames.copy())
+            publishedMetadata.extend(metadata['frameNumber'])
+            return recordedFrameNumbers[-1] in publishedMetadata
+
+        qtbot.waitUntil(allPublished, timeout=5000)
+        reader.close()
+
+        publishedFrameNumbers = list(publishedMetadata)
+        for frame, frameNumber in zip(recordedFrames, recordedFrameNumbers):
+            assert np.array_equal(
+                publishedFrames[publishedFrameNumbers.index(frameNumber)], frame
+            )
+    finally:
+        detectorsManager.finalize()
+
+
+@pytest.mark.parametrize('singleLapseFile', [False, True])
+def test_recording_timelapse(qtbot, tmp_path, singleLapseFile):
+    lapseTotal, lapsePeriod = 3, 0.4
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=100)
+    recordingManager = RecordingManager(detectorsManager)
+    lapses = []
+    recordingManager.sigRecordingLapseStarted.connect(lambda *args: lapses.append(args))
+    with qtbot.waitSignal(recordingManager.sigRecordingEnded, timeout=10000):
+        recordingManager.startRecording(['CAM'], RecMode.ScanLapse, str(tmp_path / 'rec'),
+                                        SaveMode.Disk, {'CAM': {}}, recFrames=5,
+                                        singleLapseFile=singleLapseFile,
+                                        lapseTotal=lapseTotal, lapsePeriod=lapsePeriod)
+    qtbot.waitUntil(lambda: not recordingManager.record)
+    recordingManager.endRecording(emitSignal=False, wait=True)
+
+    assert [lapseNum for lapseNum, _ in lapses] == list(range(lapseTotal))
+    assert all(0 <= jitter < lapsePeriod / 2 for jitter in recordingManager.lapseStartJitters)
+    if singleLapseFile:
+        with h5py.File(tmp_path / 'rec_CAM.hdf5', 'r') as file:
+            assert all(file[f'CAM_scan{i}'].shape[0] == 5 for i in range(lapseTotal))
+    else:
+        for i in range(lapseTotal):
+            with h5py.File(tmp_path / f'rec_scan{i}_CAM.hdf5', 'r') as file:
+                assert file['CAM'].shape[0] == 5
+
+
+def test_recording_rollover(qtbot, tmp_path):
+    detectorsManager = DetectorsManager(detectorInfosMulti, updatePeriod=100)
+    recordingManager = RecordingManager(detectorsManager, RecordingInfo(maxFileFrames=10))
+    detectorNames = list(detectorInfosMulti.keys())
+    with qtbot.waitSignal(recordingManager.sigRecordingEnded, timeout=30000):
+        recordingManager.startRecording(detectorNames, RecMode.SpecFrames, str(tmp_path / 'rec'),
+                                        SaveMode.Disk, {name: {} for name in detectorNames},
+                                        singleMultiDetectorFile=True, recFrames=25)
+    qtbot.waitUntil(lambda: not recordingManager.record)
+    recordingManager.endRecording(emitSignal=False, wait=True)
+
+    for detectorName in detectorNames:  # Written to separate files, each on its own thread
+        for suffix, firstFrame, numFrames in [('', 0, 10), ('_1', 10, 10), ('_2', 20, 5)]:
+            with h5py.File(tmp_path / f'rec_{detectorName}{suffix}.hdf5', 'r') as file:
+                assert file[detectorName].shape[0] == numFrames
+                assert file[detectorName].attrs['detector_name'] == detectorName
+                metadataAttrs = file[f'frame_metadata/{detectorName}'].attrs
+                assert metadataAttrs['first_frame'] == firstFrame
+
+
+def test_recording_statistics(qtbot, tmp_path):
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=100)
+    recordingManager = RecordingManager(detectorsManager)
+    reports = []
+    recordingManager.sigRecordingStatisticsUpdated.connect(reports.append)
+    with qtbot.waitSignal(recordingManager.sigRecordingEnded, timeout=10000):
+        recordingManager.startRecording(['CAM'], RecMode.SpecTime, str(tmp_path / 'rec'),
+                                        SaveMode.Disk, {'CAM': {}}, recTime=1.5)
+    qtbot.waitUntil(lambda: not recordingManager.record)
+    recordingManager.endRecording(emitSignal=False, wait=True)
+
+    assert len(reports) >= 2  # At least one report during the recording, and the final one
+    assert reports[-1] is recordingManager.statistics
+    camStatistics = reports[0].detectors['CAM']
+    assert camStatistics.framesPerSecond > 0 and camStatistics.megabytesPerSecond > 0
+    assert 0 < camStatistics.writeLatencyP50 <= camStatistics.writeLatencyP99
+    assert 0 < camStatistics.bufferOccupancy <= 1
+    finalCamStatistics = reports[-1].detectors['CAM']
+    assert finalCamStatistics.numFramesWritten == finalCamStatistics.numFramesCollected
+    assert reports[-1].queuedFrames == 0
+
+
+def test_recording_snap_async(tmp_path):
+    numSnaps = 6
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=100)
+    recordingManager = RecordingManager(detectorsManager)
+    futures = [recordingManager.snapAsync(['CAM'], str(tmp_path / 'snap'), SaveMode.Disk,
+                                          SaveFormat.HDF5, {'CAM': {'index': i}})
+               for i in range(numSnaps)]
+    assert recordingManager.waitForSnaps(timeout=10)
+    assert all(future.done() for future in futures)
+
+    filePaths = [future.result()['CAM'] for future in futures]
+    assert len(set(filePaths)) == numSnaps  # Snaps taken before earlier ones were saved
+    for i, filePath in enumerate(filePaths):
+        with h5py.File(filePath, 'r') as file:
+            assert file['data'].attrs['index'] == i
+
+
+def test_recording_snap_async_error(tmp_path):
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=100)
+    recordingManager = RecordingManager(detectorsManager)
+    failingFuture = recordingManager.snapAsync(['CAM'], str(tmp_path / 'missing' / 'snap'),
+                                               SaveMode.Disk, SaveFormat.HDF5, {'CAM': {}})
+    future = recordingManager.snapAsync(['CAM'], str(tmp_path / 'snap'), SaveMode.Disk,
+                                        SaveFormat.HDF5, {'CAM': {}})
+    assert recordingManager.waitForSnaps(timeout=10)
+
+    assert failingFuture.exception() is not None
+    with pytest.raises(RuntimeError) as excInfo:
+        future.result()
+    assert excInfo.value.__cause__ is failingFuture.exception()
+    assert os.path.exists(tmp_path / 'snap_CAM.hdf5')  # Saved, though an earlier snap failed
+
+
+@pytest.mark.parametrize('chunkFrames,expectedFrames', [(1, None), (3, None), (4, 100)])
+def test_recording_hdf5_writer(chunkFrames, expectedFrames):
+    file = h5py.File(BytesIO(), 'w')
+    writer = HDF5Writer(file, 'data', (5, 7), np.uint16, expectedFrames=expectedFrames,
+                        chunkFrames=chunkFrames)
+
+    rng = np.random.default_rng(0)
+    writtenFrames = []
+    for n in [1, 2, 4, 0, 7, 3, 40]:  # Partial chunks, whole chunks and growth past capacity
+        frames = rng.integers(0, 1000, (n, 5, 7), dtype=np.uint16)
+        metadata = np.zeros(n, dtype=frameMetadataDtype)
+        metadata['frameNumber'] = np.arange(writer.numFrames, writer.numFrames + n)
+        writer.write(frames, metadata)
+        writtenFrames.append(frames)
+    writer.close()
+
+    writtenFrames = np.concatenate(writtenFrames)
+    assert np.array_equal(file['data'][:], writtenFrames)
+    assert np.array_equal(file['frame_metadata/data']['frameNumber'],
+                          np.arange(len(writtenFrames)))
+    file.close()
+
+
+@pytest.mark.parametrize('codec', ChunkCompressor.codecs)
+def test_recording_hdf5_writer_compressed(codec):
+    if codec != 'gzip':
+        pytest.importorskip('hdf5plugin')
+        pytest.importorskip({'lz4': 'lz4', 'zstd': 'zstandard', 'blosc': 'blosc'}[codec])
+
+    # Scaled down to the range of a camera with few significant bits, so that the frames compress
+    frames = SyntheticCamera(width=64, height=32, bankSize=10, seed=0)._bank // 256
+    fileBuffer = BytesIO()
+    with h5py.File(fileBuffer, 'w') as file:
+        writer = HDF5Writer(file, 'data', (32, 64), np.uint16, chunkFrames=3,
+                            compressor=ChunkCompressor(codec), compressionThreads=2)
+        writer.write(frames[:4])
+        writer.write(frames[4:])  # Leaves a partial chunk, which is written on close
+        writer.close()
+
+    with h5py.File(fileBuffer, 'r') as file:
+        assert np.array_equal(file['data'][:], frames)
+        assert file['data'].id.get_storage_size() < frames.nbytes
+
+
+@pytest.mark.parametrize('codec', [None, 'gzip'])
+def test_recording_zarr_writer(tmp_path, codec):
+    zarr = pytest.importorskip('zarr')
+
+    frames = SyntheticCamera(width=64, height=32, bankSize=10, seed=0)._bank // 256
+    metadata = np.zeros(len(frames), dtype=frameMetadataDtype)
+    metadata['frameNumber'] = np.arange(len(frames))
+    compressor = ChunkCompressor(codec) if codec is not None else None
+    writer = ZarrWriter(str(tmp_path / 'test.zarr'), 'CAM', (32, 64), np.uint16,
+                        pixelSizeUm=[1, 0.1, 0.2], chunkFrames=3, compressor=compressor,
+                        writeThreads=2)
+    writer.write(frames[:4], metadata[:4])
+    writer.write(frames[4:], metadata[4:])  # Leaves a partial chunk, which is written on close
+    writer.attrs['detector_name'] = 'CAM'
+    writer.attrs['exposure'] = [np.float32('nan'), float('nan'), np.float64(0.01)]  # Unknown ones
+    writer.close()
+
+    def rejectNonStandard(constant):
+        raise ValueError(f'{constant} is not valid JSON')
+
+    with open(tmp_path / 'test.zarr' / 'CAM' / '.zattrs') as attrsFile:
+        attrs = json.load(attrsFile, parse_constant=rejectNonStandard)
+    assert attrs['exposure'] == [None, None, 0.01]
+
+    group = zarr.open_group(str(tmp_path / 'test.zarr'), mode='r')
+    assert np.array_equal(group['CAM/0'][:], frames)
+    assert np.array_equal(group['CAM/frame_metadata/frameNumber'][:], np.arange(len(frames)))
+    assert group['CAM'].attrs['detector_name'] == 'CAM'
+    scale = group['CAM'].attrs['multiscales'][0]['datasets'][0]['coordinateTransformations']
+    assert scale[0]['scale'] == [1.0, 0.1, 0.2]
+
+
+def test_recording_tiff_writer_rollover(tmp_path):
+    frames = np.arange(7 * 4 * 6, dtype=np.uint16).reshape(7, 4, 6)
+    metadata = np.zeros(len(frames), dtype=frameMetadataDtype)
+    metadata['frameNumber'] = np.arange(len(frames))
+    filePaths = []
+
+    def createWriter(filePath, numFrames):
+        filePaths.append(filePath)
+        return TIFFWriter(filePath, (4, 6), np.uint16), None
+
+    writer = RolloverWriter(str(tmp_path / 'rec.tif'), createWriter, frames[0].nbytes,
+                            maxFileBytes=3 * frames[0].nbytes)
+    writer.attrs['detector_name'] = 'CAM'
+    writer.write(frames[:2], metadata[:2])
+    writer.write(frames[2:], metadata[2:])
+    writer.close()
+
+    assert [os.path.basename(path) for path in filePaths] == ['rec.tif', 'rec_1.tif', 'rec_2.tif']
+    assert np.array_equal(
+        np.concatenate([tifffile.memmap(path, mode='r').reshape(-1, 4, 6)
+                        for path in filePaths]),
+        frames
+    )
+    with open(tmp_path / 'rec_1.tif.json') as sidecarFile:
+        sidecar = json.load(sidecarFile)
+    assert sidecar['attrs']['detector_name'] == 'CAM'
+    assert sidecar['frame_metadata_attrs']['first_frame'] == 3
+    assert sidecar['frame_metadata']['frameNumber'] == [3, 4, 5]
+
+
+def test_recording_tiff_rollover_existing_files(qtbot, tmp_path):
+    (tmp_path / 'rec_CAM_1.tif').write_bytes(b'existing')
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=100)
+    recordingManager = RecordingManager(detectorsManager, RecordingInfo(maxFileFrames=10))
+    with qtbot.waitSignal(recordingManager.sigRecordingEnded, timeout=10000):
+        recordingManager.startRecording(['CAM'], RecMode.SpecFrames, str(tmp_path / 'rec'),
+                                        SaveMode.Disk, {'CAM': {}}, saveFormat=SaveFormat.TIFF,
+                                        recFrames=15)
+    qtbot.waitUntil(lambda: not recordingManager.record)
+    recordingManager.endRecording(emitSignal=False, wait=True)
+
+    assert (tmp_path / 'rec_CAM_1.tif').read_bytes() == b'existing'
+    assert tifffile.memmap(tmp_path / 'rec_CAM.tif', mode='r').shape[0] == 10
+    assert tifffile.memmap(tmp_path / 'rec_CAM_1_1.tif', mode='r').shape[0] == 5
+
+
+def test_recording_raw_writer(tmp_path):
+    frames = SyntheticCamera(width=50, height=30, bankSize=9, seed=0)._bank
+    metadata = np.zeros(len(frames), dtype=frameMetadataDtype)
+    metadata['frameNumber'] = np.arange(len(frames))
+    writer = RawWriter(str(tmp_path / 'rec.raw'), (30, 50), np.uint16, blockBytes=1)
+    writer.attrs['detector_name'] = 'CAM'
+    writer.write(frames[:1], metadata[:1])  # Only fills part of a block
+    writer.flush()
+    writer.write(frames[1:], metadata[1:])  # Completes it, then writes whole blocks
+    writer.close()
+
+    dataObj = DataObj('rec', 'default', path=str(tmp_path / 'rec.raw'))
+    dataObj.checkAndLoadData()
+    assert isinstance(dataObj.data, np.memmap)
+    assert np.array_equal(dataObj.data, frames)
+    assert dataObj.attrs['detector_name'] == 'CAM'
+    with open(tmp_path / 'rec.raw.json') as file:
+        assert json.load(file)['frame_metadata']['frameNumber'] == list(range(len(frames)))
+    dataObj.checkAndUnloadData()
+
+
+def test_recording_formats_same_savename(qtbot, tmp_path):
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=100)
+    recordingManager = RecordingManager(detectorsManager)
+    numFrames = {SaveFormat.TIFF: 7, SaveFormat.Raw: 12}
+    extensions = {SaveFormat.TIFF: 'tif', SaveFormat.Raw: 'raw'}
+    for saveFormat, recFrames in numFrames.items():
+        with qtbot.waitSignal(recordingManager.sigRecordingEnded, timeout=10000):
+            recordingManager.startRecording(['CAM'], RecMode.SpecFrames, str(tmp_path / 'rec'),
+                                            SaveMode.Disk, {'CAM': {'format': saveFormat.name}},
+                                            saveFormat=saveFormat, recFrames=recFrames)
+        qtbot.waitUntil(lambda: not recordingManager.record)
+        recordingManager.endRecording(emitSignal=False, wait=True)
+
+    # Each recording keeps a sidecar of its own
+    assert sorted(path.name for path in tmp_path.glob('*.json')) == [
+        'rec_CAM.raw.json', 'rec_CAM.tif.json'
+    ]
+    for saveFormat, recFrames in numFrames.items():
+        path = str(tmp_path / f'rec_CAM.{extensions[saveFormat]}')
+        dataObj = DataObj('rec', 'default', path=path)
+        dataObj.checkAndLoadData()
+        assert len(dataObj.data) == recFrames
+        assert dataObj.attrs['format'] == saveFormat.name
+        dataObj.checkAndUnloadData()
+
+
+def test_recording_memory_budget(tmp_path):
+    frames = np.arange(10 * 32 * 32, dtype=np.uint16).reshape(10, 32, 32)
+    memoryRecordings = VFileCollection()
+    evicted = []
+    memoryRecordings.sigDataWillEvict.connect(evicted.append)
+    for name in ['rec0', 'rec1', 'rec2']:
+        buffer = BytesIO()
+        with h5py.File(buffer, 'w') as file:
+            file.create_dataset('CAM', data=frames)
+        memoryRecordings[name] = VFileItem(data=buffer, filePath=str(tmp_path / f'{name}.hdf5'),
+                                           savedToDisk=False)
+        memoryBudget = 2 * buffer.getbuffer().nbytes
+
+    memoryRecordings['rec1']  # Use, so that rec0 is the least recently used
+    memoryRecordings.memoryBudget = memoryBudget
+
+    assert evicted == ['rec0']
+    assert 'rec0' not in memoryRecordings and 'rec1' in memoryRecordings
+    assert memoryRecordings.memoryUsage <= memoryBudget
+    with h5py.File(tmp_path / 'rec0.hdf5', 'r') as file:
+        assert np.array_equal(file['CAM'][:], frames)
+
+    memoryRecordings.reservedMemory = memoryBudget // 2  # A recording in progress
+    assert evicted == ['rec0', 'rec2']  # rec1 was used more recently
+    assert memoryRecordings.memoryUsage <= memoryBudget
+
+
+def test_recording_memory_budget_in_progress(qtbot):
+    detectorsManager = DetectorsManager(detectorInfosSynthetic, updatePeriod=100)
+    frameBytes = int(np.prod(detectorsManager['CAM'].shape)) * 2
+    recordingManager = RecordingManager(detectorsManager,
+                                        RecordingInfo(memoryRecordingsBytes=50 * frameBytes))
+    inProgressBytes = []
+    recordingManager.sigMemoryRecordingBytesUpdated.connect(inProgressBytes.append)
+    with qtbot.waitSignal(recordingManager.sigMemoryRecordingAvailable,
+                          timeout=10000) as blocker:
+        recordingManager.startRecording(['CAM'], RecMode.UntilStop, 'rec', SaveMode.RAM,
+                                        {'CAM': {}})  # Ends by itself at the budget
+    qtbot.waitUntil(lambda: not recordingManager.record)
+    recordingManager.endRecording(emitSignal=False, wait=True)
+
+    with h5py.File(blocker.args[1], 'r') as file:
+        assert 0 < file['CAM'].shape[0] <= 50
+    assert 0 < max(inProgressBytes) <= 50 * frameBytes
+    assert inProgressBytes[-1] == 0  # Released once the recording was passed on
+
+
+@pytest.mark.parametrize('policy', ['drop', 'spill'])
+def test_recording_write_queue_full(tmp_path, policy):
+    frames = np.arange(4 * 8 * 8, dtype=np.uint16).reshape(4, 8, 8)
+    queue = WriteQueue(maxBytes=frames.nbytes, policy=policy, spillDir=str(tmp_path))
+
+    assert queue.put('CAM', frames)
+    frames[:] = 0  # The queue must hold a copy
+    assert queue.put('CAM', frames[:2]) == (policy == 'spill')
+    assert queue.numBytes == queue.highWaterMark == frames.nbytes
+    queue.close()
+
+    key, receivedFrames, _ = queue.get()
+    assert key == 'CAM'
+    assert receivedFrames.sum() > 0
+    if policy == 'spill':
+        assert queue.numSpilled == 2
+        assert np.array_equal(queue.get()[1], frames[:2])
+    else:
+        assert queue.numDropped('CAM') == 2
+    assert queue.get() is None
+    queue.cleanUp()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_recording_write_queue_block():
+    frames = np.arange(4 * 8 * 8, dtype=np.uint16).reshape(4, 8, 8)
+    metadata = np.zeros(len(frames), dtype=frameMetadataDtype)
+    metadata['frameNumber'] = np.arange(len(frames))
+    source = frames.copy()  # Stands in for the frame buffer that the frames are views into
+    sourceMetadata = metadata.copy()
+    queue = WriteQueue(maxBytes=frames.nbytes, policy='block')
+    assert queue.put('CAM', np.zeros_like(frames))
+
+    producer = threading.Thread(target=queue.put, args=('CAM', source[:2], sourceMetadata[:2]))
+    producer.start()
+    producer.join(timeout=0.2)
+    assert producer.is_alive()  # Blocked, since the queue is full
+    source[:] = 0  # Overwritten by newer frames while the producer waits
+    sourceMetadata['frameNumber'] = -1
+
+    queue.get()  # Makes room
+    producer.join(timeout=5)
+    assert not producer.is_alive()
+    queue.close()
+
+    _, receivedFrames, receivedMetadata = queue.get()
+    assert np.array_equal(receivedFrames, frames[:2])
+    assert np.array_equal(receivedMetadata['frameNumber'], [0, 1])
+    assert queue.get() is None
+
+
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
 #
@@ -36,10 +36,14 @@ class CommunicationChannel(SignalInterface):
 
     sigRecordingEnded = Signal()
 
+    sigRecordingLapseStarted = Signal(int, float)  # (lapseNum, jitterSeconds)
+
     sigUpdateRecFrameNum = Signal(int)  # (frameNumber)
 
     sigUpdateRecTime = Signal(int)  # (recTime)
 
+    sigUpdateRecStatistics = Signal(object)  # (RecordingStatistics)
+
     sigMemorySnapAvailable = Signal(
         str, np.ndarray, object, bool
     )  # (name, image, filePath, savedToDisk)
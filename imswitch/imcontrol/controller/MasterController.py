@@ -27,7 +27,11 @@ class MasterController:
             'rs232sManager': self.rs232sManager
         }
 
-        self.detectorsManager = DetectorsManager(self.__setupInfo.detectors, updatePeriod=100,
+        liveViewInfo = self.__setupInfo.liveView
+        self.detectorsManager = DetectorsManager(self.__setupInfo.detectors,
+                                                 updatePeriod=liveViewInfo.pollPeriod,
+                                                 maxDisplayRate=liveViewInfo.maxDisplayRate,
+                                                 frameBrokerInfo=self.__setupInfo.frameBroker,
                                                  **lowLevelManagers)
         self.lasersManager = LasersManager(self.__setupInfo.lasers,
                                            **lowLevelManagers)
@@ -35,7 +39,10 @@ class MasterController:
                                                      **lowLevelManagers)
 
         self.scanManager = ScanManager(self.__setupInfo)
-        self.recordingManager = RecordingManager(self.detectorsManager)
+        self.recordingManager = RecordingManager(self.detectorsManager,
+                                                 self.__setupInfo.recording)
+        self.__moduleCommChannel.memoryRecordings.memoryBudget = \
+            self.__setupInfo.recording.memoryRecordingsBytes
         self.slmManager = SLMManager(self.__setupInfo.slm)
 
         # Connect signals
@@ -48,10 +55,15 @@ class MasterController:
 
         self.recordingManager.sigRecordingStarted.connect(cc.sigRecordingStarted)
         self.recordingManager.sigRecordingEnded.connect(cc.sigRecordingEnded)
+        self.recordingManager.sigRecordingLapseStarted.connect(cc.sigRecordingLapseStarted)
         self.recordingManager.sigRecordingFrameNumUpdated.connect(cc.sigUpdateRecFrameNum)
         self.recordingManager.sigRecordingTimeUpdated.connect(cc.sigUpdateRecTime)
+        self.recordingManager.sigRecordingStatisticsUpdated.connect(cc.sigUpdateRecStatistics)
         self.recordingManager.sigMemorySnapAvailable.connect(cc.sigMemorySnapAvailable)
         self.recordingManager.sigMemoryRecordingAvailable.connect(self.memoryRecordingAvailable)
+        self.recordingManager.sigMemoryRecordingBytesUpdated.connect(
+            self.memoryRecordingBytesUpdated
+        )
 
         self.slmManager.sigSLMMaskUpdated.connect(cc.sigSLMMaskUpdated)
 
@@ -60,8 +72,12 @@ class MasterController:
             data=file, filePath=filePath, savedToDisk=savedToDisk
         )
 
+    def memoryRecordingBytesUpdated(self, inProgressBytes):
+        self.__moduleCommChannel.memoryRecordings.reservedMemory = inProgressBytes
+
     def closeEvent(self):
         self.recordingManager.endRecording(emitSignal=False, wait=True)
+        self.recordingManager.waitForSnaps()
 
         for attrName in dir(self):
             attr = getattr(self, attrName)
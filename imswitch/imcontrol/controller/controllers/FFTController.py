@@ -1,4 +1,7 @@
+import os
+
 import numpy as np
+import scipy.fft
 
 from imswitch.imcommon.framework import Signal, Thread, Worker, Mutex
 from imswitch.imcontrol.view import guitools
@@ -99,19 +102,50 @@ class FFTController(LiveUpdatedController):
             if im is None:
                 return
 
-            pos = float(1 / pos)
+            # The FFT is taken of the binned image, in which periods are shorter
+            pos = float(self.imageComputationWorker.binning / pos)
             imgWidth = im.shape[1]
             imgHeight = im.shape[0]
             self._widget.updatePosLines(pos, imgWidth, imgHeight)
             self._widget.setPosLinesVisible(True)
 
     class FFTImageComputationWorker(Worker):
+        """ Computes the log-magnitude spectra of images for display.
+
+        Since the images are real, only half of the spectrum is computed, with
+        a real-input FFT in single precision on several threads, and the other
+        half is mirrored from it. The image can optionally be binned and
+        cropped around its center first, to reduce the work further, and is
+        multiplied by a Hann window to suppress the artifacts from its edges.
+        The buffers and the FFT plans are reused for as long as the image
+        shape stays the same. """
+
         sigFftImageComputed = Signal(np.ndarray)
 
         def __init__(self):
             super().__init__()
+            self.binning = 1
+            """ The number of pixels in each direction to sum before the FFT.
+            """
+
+            self.cropSize = None
+            """ The largest width and height, in binned pixels, of the center
+            part of the image to take the FFT of, or None to use the whole
+            image. """
+
+            self.window = True
+            """ Whether to multiply the image by a Hann window before the FFT.
+            """
+
             self._numQueuedImages = 0
             self._numQueuedImagesMutex = Mutex()
+            self._shape = None
+            self._windowArray = None
+            self._inputBuffer = None
+            self._magnitudeBuffer = None
+            self._displayIndices = None
+            self._outputBuffers = []
+            self._nextOutputBuffer = 0
 
         def computeFFTImage(self):
             """ Compute FFT of an image. """
@@ -119,7 +153,25 @@ class FFTController(LiveUpdatedController):
                 if self._numQueuedImages > 1:
                     return  # Skip this frame in order to catch up
 
-                fftImage = np.fft.fftshift(np.log10(abs(np.fft.fft2(self._image))))
+                image = self._prepareInput(self._image)
+                if image.shape != self._shape:
+                    self._allocate(image.shape)
+
+                if self.window:
+                    np.multiply(image, self._windowArray, out=self._inputBuffer)
+                else:
+                    self._inputBuffer[...] = image
+
+                halfSpectrum = scipy.fft.rfft2(self._inputBuffer, overwrite_x=True,
+                                               workers=_fftWorkers)
+                np.abs(halfSpectrum, out=self._magnitudeBuffer)
+                self._magnitudeBuffer += 1  # Keeps the logarithm finite
+                np.log10(self._magnitudeBuffer, out=self._magnitudeBuffer)
+
+                # Mirror the half spectrum into the full, shifted spectrum
+                fftImage = self._outputBuffers[self._nextOutputBuffer]
+                self._nextOutputBuffer = (self._nextOutputBuffer + 1) % len(self._outputBuffers)
+                np.take(self._magnitudeBuffer.ravel(), self._displayIndices, out=fftImage)
                 self.sigFftImageComputed.emit(fftImage)
             finally:
                 self._numQueuedImagesMutex.lock()
@@ -133,6 +185,49 @@ class FFTController(LiveUpdatedController):
             self._numQueuedImages += 1
             self._numQueuedImagesMutex.unlock()
 
+        def _prepareInput(self, image):
+            if self.binning > 1:
+                height = image.shape[0] // self.binning
+                width = image.shape[1] // self.binning
+                image = image[:height * self.binning, :width * self.binning].reshape(
+                    height, self.binning, width, self.binning
+                ).sum(axis=(1, 3), dtype=np.float32)
+
+            if self.cropSize is not None:
+                top = max((image.shape[0] - self.cropSize) // 2, 0)
+                left = max((image.shape[1] - self.cropSize) // 2, 0)
+                image = image[top:top + self.cropSize, left:left + self.cropSize]
+
+            return image
+
+        def _allocate(self, shape):
+            height, width = shape
+            halfWidth = width // 2 + 1
+
+            self._shape = shape
+            self._windowArray = np.outer(np.hanning(height),
+                                         np.hanning(width)).astype(np.float32)
+            self._inputBuffer = np.empty(shape, dtype=np.float32)
+            self._magnitudeBuffer = np.empty((height, halfWidth), dtype=np.float32)
+
+            # Index into the half spectrum for each pixel of the shifted full spectrum. The
+            # missing half follows from the symmetry of the spectra of real images, in which
+            # the magnitude at (-y, -x) equals that at (y, x).
+            y = (np.arange(height) - height // 2) % height
+            x = (np.arange(width) - width // 2) % width
+            mirrored = x >= halfWidth
+            sourceY = np.where(mirrored[np.newaxis, :], (-y[:, np.newaxis]) % height,
+                               y[:, np.newaxis])
+            sourceX = np.where(mirrored, width - x, x)[np.newaxis, :]
+            self._displayIndices = sourceY * halfWidth + sourceX
+
+            # Two output buffers, so that one can be displayed while the other is filled
+            self._outputBuffers = [np.empty(shape, dtype=np.float32) for _ in range(2)]
+            self._nextOutputBuffer = 0
+
+
+_fftWorkers = max((os.cpu_count() or 1) // 2, 1)  # Leave the other cores for acquisition
+
 
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
@@ -183,7 +183,7 @@ class ProcessDataThread(Thread):
 
     def grabCameraFrame(self):
         detectorManager = self._controller._master.detectorsManager[self._controller.camera]
-        self.latestimg = detectorManager.getLatestFrame()
+        self.latestimg = detectorManager.binFrames(detectorManager.getLatestFrame())
         return self.latestimg
 
     def update(self, twoFociVar):
@@ -1,3 +1,4 @@
+from imswitch.imcommon.framework import Signal, Thread, Worker, Mutex
 from imswitch.imcontrol.view import guitools
 from ..basecontrollers import LiveUpdatedController
 import numpy as np
@@ -5,6 +6,8 @@ import numpy as np
 class ImageController(LiveUpdatedController):
     """ Linked to ImageWidget."""
 
+    sigImageReceived = Signal(str)  # (detectorName)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -18,6 +21,14 @@ class ImageController(LiveUpdatedController):
             self._master.detectorsManager.getAllDeviceNames(lambda c: c.forAcquisition)
         )
 
+        # Prepare frames for display in a separate thread
+        self.displayPreparationWorker = self.DisplayPreparationWorker()
+        self.displayPreparationWorker.sigImagePrepared.connect(self.displayImage)
+        self.displayPreparationThread = Thread()
+        self.displayPreparationWorker.moveToThread(self.displayPreparationThread)
+        self.sigImageReceived.connect(self.displayPreparationWorker.prepareImage)
+        self.displayPreparationThread.start()
+
         # Connect CommunicationChannel signals
         self._commChannel.sigUpdateImage.connect(self.update)
         self._commChannel.sigAdjustFrame.connect(self.adjustFrame)
@@ -27,6 +38,19 @@ class ImageController(LiveUpdatedController):
         self._commChannel.sigRemoveItemFromVb.connect(self.removeItemFromVb)
         self._commChannel.sigMemorySnapAvailable.connect(self.memorySnapAvailable)
 
+        # Connect ImageWidget signals
+        self._widget.sigContinuousLevelsToggled.connect(self.setContinuousLevels)
+
+        # Have frames held back for display until the previous one has been displayed
+        self._master.detectorsManager.setWaitForDisplay(True)
+
+    def __del__(self):
+        if hasattr(self, 'displayPreparationThread'):
+            self.displayPreparationThread.quit()
+            self.displayPreparationThread.wait()
+        if hasattr(super(), '__del__'):
+            super().__del__()
+
     def autoLevels(self, detectorNames=None, im=None):
         """ Set histogram levels automatically with current detector image."""
         if detectorNames is None:
@@ -39,7 +63,13 @@ class ImageController(LiveUpdatedController):
                 im = self._widget.getImage(detectorName)
 
             # self._widget.setImageDisplayLevels(detectorName, *guitools.bestLevels(im))
-            self._widget.setImageDisplayLevels(detectorName, *guitools.minmaxLevels(im))
+            self._widget.setImageDisplayLevels(detectorName,
+                                               *guitools.minmaxLevels(guitools.sampleImage(im)))
+
+    def setContinuousLevels(self, enabled):
+        """ Sets whether the histogram levels should follow the detector
+        images, rather than only be set when live view starts. """
+        self.displayPreparationWorker.continuousLevels = enabled
 
     def addItemToVb(self, item):
         """ Add item from communication channel to viewbox."""
@@ -51,16 +81,26 @@ class ImageController(LiveUpdatedController):
         self._widget.removeItem(item)
 
     def update(self, detectorName, im, init, isCurrentDetector):
-        """ Update new image in the viewbox. """
+        """ Update new image in the viewbox. The image is downsampled for
+        display in a separate thread, and shown when that is done. """
         if np.prod(im.shape)>1: # TODO: This seems weird!
-            print(np.shape(im))
-            if not init:
-                self.autoLevels([detectorName], im)
+            self.displayPreparationWorker.prepareForNewImage(detectorName, im, init)
+            self.sigImageReceived.emit(detectorName)
+        else:
+            self._master.detectorsManager.imageDisplayed(detectorName)
 
-            self._widget.setImage(detectorName, im)
+    def displayImage(self, detectorName, pyramid, levels, init):
+        """ Displays an image that has been prepared for display, as a list of
+        increasingly downsampled versions of it. levels are the histogram
+        levels to apply, or None to keep the current ones. """
+        if levels is not None:
+            self._widget.setImageDisplayLevels(detectorName, *levels)
 
-            if not init or self._shouldResetView:
-                self.adjustFrame(instantResetView=True)
+        self._widget.setImage(detectorName, pyramid)
+        self._master.detectorsManager.imageDisplayed(detectorName)
+
+        if not init or self._shouldResetView:
+            self.adjustFrame(instantResetView=True)
 
     def adjustFrame(self, shape=None, instantResetView=False):
         """ Adjusts the viewbox to a new width and height. """
@@ -95,6 +135,60 @@ class ImageController(LiveUpdatedController):
         if self._shouldResetView:
             self.adjustFrame(image.shape, instantResetView=True)
 
+    class DisplayPreparationWorker(Worker):
+        sigImagePrepared = Signal(str, list, object, bool)  # (detectorName, pyramid, levels, init)
+
+        def __init__(self):
+            super().__init__()
+            self.continuousLevels = False
+            self._images = {}
+            self._imagesMutex = Mutex()
+            self._levelsEstimators = {}
+            self._pyramidBuilders = {}
+
+        def prepareImage(self, detectorName):
+            """ Downsamples the latest image of a detector for display, and
+            estimates its histogram levels when live view has just started or
+            continuous levels are enabled. """
+            self._imagesMutex.lock()
+            try:
+                image, init = self._images.pop(detectorName, (None, True))
+            finally:
+                self._imagesMutex.unlock()
+
+            if image is None:
+                return  # Already prepared, skipped in order to catch up
+
+            pyramid = self._pyramidBuilders.setdefault(
+                detectorName, guitools.DisplayPyramidBuilder(_displayMinSize)
+            ).build(image)
+
+            levels = None
+            if not init or self.continuousLevels:
+                levelsEstimator = self._levelsEstimators.setdefault(
+                    detectorName, guitools.LevelsEstimator()
+                )
+                if not init:
+                    levelsEstimator.reset()
+                levels = levelsEstimator.update(image)
+
+            self.sigImagePrepared.emit(detectorName, pyramid, levels, init)
+
+        def prepareForNewImage(self, detectorName, image, init):
+            """ Must always be called before the worker receives a new image.
+            Replaces any image of the detector that hasn't been prepared yet.
+            """
+            self._imagesMutex.lock()
+            try:
+                # Keep the request to reset the levels and view if the replaced image had it
+                _, previousInit = self._images.get(detectorName, (None, True))
+                self._images[detectorName] = image, init and previousInit
+            finally:
+                self._imagesMutex.unlock()
+
+
+_displayMinSize = 512  # Size in pixels of the coarsest displayed version of a frame
+
 
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
@@ -1,8 +1,8 @@
+import dataclasses
 import os
 import time
-from typing import Optional, Union, List
+from typing import Any, Dict, Optional, Union, List
 
-from imswitch.imcommon.framework import Timer
 from imswitch.imcommon.model import ostools, APIExport
 from imswitch.imcontrol.model import RecMode, SaveMode, SaveFormat
 from ..basecontrollers import ImConWidgetController
@@ -29,6 +29,7 @@ class RecordingController(ImConWidgetController):
         self._widget.setSnapSaveMode(SaveMode.Disk.value)
         self._widget.setSnapSaveModeVisible(self._setupInfo.hasWidget('Image'))
 
+        self._widget.setRecSaveFormat(SaveFormat.HDF5.value)
         self._widget.setRecSaveMode(SaveMode.Disk.value)
         self._widget.setRecSaveModeVisible(
             self._moduleCommChannel.isModuleRegistered('imreconstruct')
@@ -39,9 +40,11 @@ class RecordingController(ImConWidgetController):
         # Connect CommunicationChannel signals
         self._commChannel.sigRecordingStarted.connect(self.recordingStarted)
         self._commChannel.sigRecordingEnded.connect(self.recordingEnded)
+        self._commChannel.sigRecordingLapseStarted.connect(self.recordingLapseStarted)
         self._commChannel.sigScanDone.connect(self.scanDone)
         self._commChannel.sigUpdateRecFrameNum.connect(self.updateRecFrameNum)
         self._commChannel.sigUpdateRecTime.connect(self.updateRecTime)
+        self._commChannel.sigUpdateRecStatistics.connect(self.updateRecStatistics)
         self._commChannel.sharedAttrs.sigAttributeSet.connect(self.attrChanged)
 
         # Connect RecordingWidget signals
@@ -51,15 +54,18 @@ class RecordingController(ImConWidgetController):
         self._widget.sigSpecFileToggled.connect(self._widget.setCustomFilenameEnabled)
 
         self._widget.sigSnapSaveModeChanged.connect(self.snapSaveModeChanged)
+        self._widget.sigRecSaveModeChanged.connect(self.recSaveModeChanged)
 
         self._widget.sigSpecFramesPicked.connect(self.specFrames)
         self._widget.sigSpecTimePicked.connect(self.specTime)
         self._widget.sigScanOncePicked.connect(self.recScanOnce)
         self._widget.sigScanLapsePicked.connect(self.recScanLapse)
         self._widget.sigUntilStopPicked.connect(self.untilStop)
+        self._widget.sigPreTriggerPicked.connect(self.preTrigger)
 
         self._widget.sigSnapRequested.connect(self.snap)
         self._widget.sigRecToggled.connect(self.toggleREC)
+        self._widget.sigTriggerRequested.connect(self.trigger)
 
     def openFolder(self):
         """ Opens current folder in File Explorer. """
@@ -74,8 +80,15 @@ class RecordingController(ImConWidgetController):
         if saveMode == SaveMode.RAM:
             self._widget.setSnapSaveFormat(SaveFormat.TIFF.value)
 
-    def snap(self):
-        """ Take a snap and save it to a .tiff file. """
+    def recSaveModeChanged(self):
+        saveMode = SaveMode(self._widget.getRecSaveMode())
+        self._widget.setRecSaveFormatEnabled(saveMode == SaveMode.Disk)
+        if saveMode != SaveMode.Disk:
+            self._widget.setRecSaveFormat(SaveFormat.HDF5.value)  # Only HDF5 can be kept in RAM
+
+    def snap(self, wait=False):
+        """ Take a snap and save it to a .tiff file. The frames are saved in
+        the background unless wait is True. """
         self.updateRecAttrs(isSnapping=True)
 
         folder = self._widget.getRecFolder()
@@ -88,11 +101,15 @@ class RecordingController(ImConWidgetController):
         attrs = {detectorName: self._commChannel.sharedAttrs.getHDF5Attributes()
                  for detectorName in detectorNames}
 
-        self._master.recordingManager.snap(detectorNames,
-                                           savename,
-                                           SaveMode(self._widget.getSnapSaveMode()),
-                                           SaveFormat(self._widget.getSnapSaveFormat()),
-                                           attrs)
+        future = self._master.recordingManager.snapAsync(
+            detectorNames,
+            savename,
+            SaveMode(self._widget.getSnapSaveMode()),
+            SaveFormat(self._widget.getSnapSaveFormat()),
+            attrs
+        )
+        if wait:
+            future.result()
 
     def toggleREC(self, checked):
         """ Start or end recording. """
@@ -105,7 +122,7 @@ class RecordingController(ImConWidgetController):
             time.sleep(0.01)
             self.savename = os.path.join(folder, self.getFileName()) + '_rec'
 
-            if self.recMode == RecMode.ScanOnce:
+            if self.recMode == RecMode.ScanOnce or self.recMode == RecMode.ScanLapse:
                 self._commChannel.sigScanStarting.emit()  # To get correct values from sharedAttrs
 
             detectorsBeingCaptured = self.getDetectorNamesToCapture()
@@ -115,6 +132,7 @@ class RecordingController(ImConWidgetController):
                 'recMode': self.recMode,
                 'savename': self.savename,
                 'saveMode': SaveMode(self._widget.getRecSaveMode()),
+                'saveFormat': SaveFormat(self._widget.getRecSaveFormat()),
                 'attrs': {detectorName: self._commChannel.sharedAttrs.getHDF5Attributes()
                           for detectorName in detectorsBeingCaptured},
                 'singleMultiDetectorFile': (len(detectorsBeingCaptured) > 1 and
@@ -133,10 +151,19 @@ class RecordingController(ImConWidgetController):
                 time.sleep(0.3)
                 self._commChannel.sigRunScan.emit(True, False)
             elif self.recMode == RecMode.ScanLapse:
-                self.recordingArgs['singleLapseFile'] = self._widget.getTimelapseSingleFile()
                 self.lapseTotal = self._widget.getTimelapseTime()
                 self.lapseCurrent = 0
-                self.nextLapse()
+                self.recordingArgs['recFrames'] = self._commChannel.getNumScanPositions()
+                self.recordingArgs['singleLapseFile'] = self._widget.getTimelapseSingleFile()
+                self.recordingArgs['lapseTotal'] = self.lapseTotal
+                self.recordingArgs['lapsePeriod'] = self._widget.getTimelapseFreq()
+                self.endedRecording = False
+                self.doneScan = True  # Until the first lapse starts its scan
+                self._master.recordingManager.startRecording(**self.recordingArgs)
+            elif self.recMode == RecMode.PreTrigger:
+                self.recordingArgs['preTriggerTime'] = self._widget.getPreTriggerTime()
+                self._master.recordingManager.startRecording(**self.recordingArgs)
+                self._widget.setTriggerButtonEnabled(True)
             else:
                 self._master.recordingManager.startRecording(**self.recordingArgs)
 
@@ -146,49 +173,30 @@ class RecordingController(ImConWidgetController):
                 self._commChannel.sigAbortScan.emit()
             self._master.recordingManager.endRecording()
 
-    def nextLapse(self):
-        self.endedRecording = False
-        self.doneScan = False
-
-        isFirstLapse = self.lapseCurrent == 0
-        isFinalLapse = self.lapseCurrent + 1 == self.lapseTotal
-
-        if not self.recordingArgs['singleLapseFile']:
-            lapseCurrentStr = str(self.lapseCurrent).zfill(len(str(self.lapseTotal)))
-            self.recordingArgs['savename'] = f'{self.savename}_scan{lapseCurrentStr}'
-
-        if isFirstLapse:
-            self._commChannel.sigScanStarting.emit()  # To get updated values from sharedAttrs
-            self.recordingArgs['attrs'] = {  # Update
-                detectorName: self._commChannel.sharedAttrs.getHDF5Attributes()
-                for detectorName in self.recordingArgs['detectorNames']
-            }
-            self.recordingArgs['recFrames'] = self._commChannel.getNumScanPositions()  # Update
-
-        self._master.recordingManager.startRecording(**self.recordingArgs)
-        time.sleep(0.3)
+    def trigger(self):
+        """ Trigger a pre-trigger recording. """
+        self._widget.setTriggerButtonEnabled(False)
+        self._master.recordingManager.trigger()
 
-        self._commChannel.sigRunScan.emit(isFirstLapse, not isFinalLapse)
+    def recordingLapseStarted(self, lapseNum, jitter):
+        self.lapseCurrent = lapseNum
+        self._widget.updateRecLapseNum(lapseNum)
+        self.doneScan = False
+        self._commChannel.sigRunScan.emit(lapseNum == 0, lapseNum + 1 < self.lapseTotal)
 
     def recordingStarted(self):
         self._widget.setFieldsEnabled(False)
+        self._widget.setRecStatisticsText('')
 
     def recordingCycleEnded(self):
-        if (self._widget.isRecButtonChecked() and self.recMode == RecMode.ScanLapse and
-                0 < self.lapseCurrent + 1 < self.lapseTotal):
-            self.lapseCurrent += 1
-            self._widget.updateRecLapseNum(self.lapseCurrent)
-            self.timer = Timer(singleShot=True)
-            self.timer.timeout.connect(self.nextLapse)
-            self.timer.start(int(self._widget.getTimelapseFreq() * 1000))
-        else:
-            self.recording = False
-            self.lapseCurrent = -1
-            self._widget.updateRecFrameNum(0)
-            self._widget.updateRecTime(0)
-            self._widget.updateRecLapseNum(0)
-            self._widget.setRecButtonChecked(False)
-            self._widget.setFieldsEnabled(True)
+        self.recording = False
+        self.lapseCurrent = -1
+        self._widget.updateRecFrameNum(0)
+        self._widget.updateRecTime(0)
+        self._widget.updateRecLapseNum(0)
+        self._widget.setRecButtonChecked(False)
+        self._widget.setTriggerButtonEnabled(False)
+        self._widget.setFieldsEnabled(True)
 
     def scanDone(self):
         self.doneScan = True
@@ -210,6 +218,19 @@ class RecordingController(ImConWidgetController):
         if self.recMode == RecMode.SpecTime:
             self._widget.updateRecTime(recTime)
 
+    def updateRecStatistics(self, statistics):
+        lines = []
+        for detectorName, detectorStatistics in statistics.detectors.items():
+            lines.append(
+                f'{detectorName}: {detectorStatistics.framesPerSecond:.0f} fps,'
+                f' {detectorStatistics.megabytesPerSecond:.0f} MB/s written,'
+                f' buffer {detectorStatistics.bufferOccupancy:.0%} full,'
+                f' {detectorStatistics.droppedFrames} dropped'
+            )
+        lines.append(f'Write queue: {statistics.queuedFrames} frames'
+                     f' ({statistics.queuedBytes / 1024 ** 2:.0f} MiB)')
+        self._widget.setRecStatisticsText('\n'.join(lines))
+
     def specFrames(self):
         self._widget.checkSpecFrames()
         self._widget.setEnabledParams(specFrames=True)
@@ -235,6 +256,11 @@ class RecordingController(ImConWidgetController):
         self._widget.setEnabledParams()
         self.recMode = RecMode.UntilStop
 
+    def preTrigger(self):
+        self._widget.checkPreTrigger()
+        self._widget.setEnabledParams(preTrigger=True)
+        self.recMode = RecMode.PreTrigger
+
     def setRecMode(self, recMode):
         if recMode == RecMode.SpecFrames:
             self.specFrames()
@@ -246,6 +272,8 @@ class RecordingController(ImConWidgetController):
             self.recScanLapse()
         elif recMode == RecMode.UntilStop:
             self.untilStop()
+        elif recMode == RecMode.PreTrigger:
+            self.preTrigger()
         else:
             raise ValueError(f'Invalid RecMode {recMode} specified')
 
@@ -288,6 +316,8 @@ class RecordingController(ImConWidgetController):
             self._widget.setNumExpositions(value)
         elif key[1] == _timeAttr:
             self._widget.setTimeToRec(value)
+        elif key[1] == _preTriggerTimeAttr:
+            self._widget.setPreTriggerTime(value)
         elif key[1] == _lapseTimeAttr:
             self._widget.setTimelapseTime(value)
         elif key[1] == _freqAttr:
@@ -303,6 +333,7 @@ class RecordingController(ImConWidgetController):
     def updateRecAttrs(self, *, isSnapping):
         self.setSharedAttr(_framesAttr, 'null')
         self.setSharedAttr(_timeAttr, 'null')
+        self.setSharedAttr(_preTriggerTimeAttr, 'null')
         self.setSharedAttr(_lapseTimeAttr, 'null')
         self.setSharedAttr(_freqAttr, 'null')
 
@@ -314,14 +345,25 @@ class RecordingController(ImConWidgetController):
                 self.setSharedAttr(_framesAttr, self._widget.getNumExpositions())
             elif self.recMode == RecMode.SpecTime:
                 self.setSharedAttr(_timeAttr, self._widget.getTimeToRec())
+            elif self.recMode == RecMode.PreTrigger:
+                self.setSharedAttr(_preTriggerTimeAttr, self._widget.getPreTriggerTime())
             elif self.recMode == RecMode.ScanLapse:
                 self.setSharedAttr(_lapseTimeAttr, self._widget.getTimelapseTime())
                 self.setSharedAttr(_freqAttr, self._widget.getTimelapseFreq())
 
     @APIExport(runOnUIThread=True)
-    def snapImage(self) -> None:
-        """ Take a snap and save it to a .tiff file at the set file path. """
-        self.snap()
+    def snapImage(self, wait: bool = True) -> None:
+        """ Take a snap and save it to a .tiff file at the set file path. If
+        wait is False, this returns as soon as the frames have been captured,
+        and they are saved in the background, in the order they were taken;
+        use waitForSnaps to wait until they have all been saved. """
+        self.snap(wait=wait)
+
+    @APIExport()
+    def waitForSnaps(self, timeout: Optional[float] = None) -> bool:
+        """ Waits until all snaps have been saved. Returns False if the timeout
+        (in seconds) expired first. """
+        return self._master.recordingManager.waitForSnaps(timeout)
 
     @APIExport(runOnUIThread=True)
     def startRecording(self) -> None:
@@ -333,6 +375,15 @@ class RecordingController(ImConWidgetController):
         """ Stops recording. """
         self._widget.setRecButtonChecked(False)
 
+    @APIExport()
+    def getRecordingStatistics(self) -> Optional[Dict[str, Any]]:
+        """ Returns the throughput and health statistics that were last
+        reported for the current (or latest) recording, or None if none have
+        been reported. They are updated about once per second while
+        recording. """
+        statistics = self._master.recordingManager.statistics
+        return dataclasses.asdict(statistics) if statistics is not None else None
+
     @APIExport(runOnUIThread=True)
     def setRecModeSpecFrames(self, numFrames: int) -> None:
         """ Sets the recording mode to record a specific number of frames. """
@@ -354,7 +405,8 @@ class RecordingController(ImConWidgetController):
     @APIExport(runOnUIThread=True)
     def setRecModeScanTimelapse(self, lapsesToRec: int, freqSeconds: float,
                                 timelapseSingleFile: bool = False) -> None:
-        """ Sets the recording mode to record a timelapse of scans. """
+        """ Sets the recording mode to record a timelapse of scans, starting
+        a scan every freqSeconds seconds. """
         self.recScanLapse()
         self._widget.setTimelapseTime(lapsesToRec)
         self._widget.setTimelapseFreq(freqSeconds)
@@ -366,6 +418,20 @@ class RecordingController(ImConWidgetController):
         stopped. """
         self.untilStop()
 
+    @APIExport(runOnUIThread=True)
+    def setRecModePreTrigger(self, secondsBefore: Union[int, float]) -> None:
+        """ Sets the recording mode to keep the frames from the specified
+        number of seconds back once recording has started, and save them
+        along with the frames that follow once the recording is triggered,
+        until recording is manually stopped. """
+        self.preTrigger()
+        self._widget.setPreTriggerTime(secondsBefore)
+
+    @APIExport(runOnUIThread=True)
+    def triggerRecording(self) -> None:
+        """ Triggers a recording in pre-trigger mode. """
+        self.trigger()
+
     @APIExport(runOnUIThread=True)
     def setDetectorToRecord(self, detectorName: Union[List[str], str, int],
                             multiDetectorSingleFile: bool = False) -> None:
@@ -401,6 +467,7 @@ _attrCategory = 'Rec'
 _recModeAttr = 'Mode'
 _framesAttr = 'Frames'
 _timeAttr = 'Time'
+_preTriggerTimeAttr = 'PreTriggerTime'
 _lapseTimeAttr = 'LapseTime'
 _freqAttr = 'LapseFreq'
 
@@ -45,6 +45,18 @@ class DetectorInfo(DeviceInfo):
     forFocusLock: bool = False
     """ Whether the detector is used for focus lock. """
 
+    frameBufferSize: Optional[int] = None
+    """ Number of frames that the detector's frame buffer holds. If ``null``,
+    the number is chosen so that the buffer takes up about 256 MB. """
+
+    softwareBinningMode: str = 'mean'
+    """ How pixels are combined when binning is done in software (for
+    binnings that the detector doesn't support in hardware, offered by the
+    managers of cameras without hardware binning, such as Basler, Daheng,
+    ESP32, Jetson and Raspberry Pi cameras). ``mean`` keeps the
+    intensity range of the detector, while ``sum`` adds up the pixel values,
+    saturating at the maximum value of the detector's data type. """
+
 
 @dataclass(frozen=True)
 class LaserInfo(DeviceInfo):
@@ -186,6 +198,93 @@ class NidaqInfo:
             return self.timerCounterChannel
 
 
+@dataclass(frozen=True)
+class LiveViewInfo:
+    pollPeriod: int = 20
+    """ How often the detectors are checked for new frames while acquisition
+    is running, with or without live view, in milliseconds. Live view
+    displays frames as soon as they have been pulled from the detector, which
+    happens at least this often, and sooner if e.g. a recording pulls them
+    first. Most detectors can't notify about new frames themselves, so this
+    is effectively the live view latency. """
+
+    maxDisplayRate: float = 20
+    """ Maximum rate at which new frames are displayed, in frames per second.
+    Frames that arrive faster than this, or while the previous frame is still
+    being displayed, are skipped for display (but not for recording). """
+
+
+@dataclass(frozen=True)
+class FrameBrokerInfo:
+    sharedMemoryPrefix: str = 'imswitch'
+    """ Prefix of the names of the shared memory blocks that frames are
+    published in. Each acquisition detector gets its own block, named
+    ``{sharedMemoryPrefix}_{detectorName}`` with spaces in the detector name
+    replaced by underscores. """
+
+    capacity: int = 32
+    """ Number of frames that each shared memory block holds. """
+
+
+@dataclass(frozen=True)
+class RecordingInfo:
+    writeQueueBytes: int = 512 * 1024 ** 2
+    """ Memory budget, in bytes, for frames that have been collected from the
+    detectors but not yet written to file during a recording. """
+
+    writeQueueFullPolicy: str = 'block'
+    """ What to do with new frames when the memory budget is used up:
+    ``block`` to stop collecting frames until there is room (the frames then
+    wait in the detectors' frame buffers), ``drop`` to discard them, or
+    ``spill`` to store them in temporary files until they can be written. """
+
+    spillDir: Optional[str] = None
+    """ Directory for the temporary files that frames are spilled to. If not
+    specified, the system's temporary directory is used. """
+
+    compression: Optional[str] = None
+    """ Codec to compress recordings with: ``gzip``, ``lz4``, ``zstd`` or
+    ``blosc``. If not specified, recordings are not compressed. All codecs
+    except gzip require the ``hdf5plugin`` package, both for recording and
+    for reading the files, as well as a package for the codec itself
+    (``lz4``, ``zstandard`` or ``blosc``). """
+
+    compressionLevel: Optional[int] = None
+    """ Compression level. If not specified, a level that favors speed is
+    used. """
+
+    compressionThreads: Optional[int] = None
+    """ Number of threads to compress recordings on, per detector. If not
+    specified, one per CPU core is used. """
+
+    maxFileBytes: Optional[int] = None
+    """ Size, in bytes, at which recordings saved on disk in the HDF5, TIFF or
+    raw format roll over to a new file. If neither this nor maxFileFrames is
+    specified, each detector's recording is written to a single file. Such
+    recordings are always saved in one file per detector. """
+
+    maxFileFrames: Optional[int] = None
+    """ Number of frames at which recordings saved on disk in the HDF5, TIFF
+    or raw format roll over to a new file. """
+
+    preTriggerBufferBytes: int = 1024 ** 3
+    """ Memory budget, in bytes, per detector, for the frames that are kept
+    before the trigger in PreTrigger mode recordings that keep a time span of
+    frames. The frames of the time span are kept, at the frame rate measured
+    when the recording starts, but at most as many as fit in the budget. """
+
+    memoryRecordingsBytes: Optional[int] = None
+    """ Memory budget, in bytes, for recordings kept in memory for
+    reconstruction, including those still being recorded. When it is
+    exceeded, the least recently used recordings are saved to disk and
+    released from memory, and a recording that would exceed it by itself is
+    stopped. If not specified, there is no limit. """
+
+    snapWriterThreads: int = 2
+    """ Number of background threads that snaps are encoded and saved to file
+    on. """
+
+
 @dataclass(frozen=True)
 class PulseStreamerInfo:
     ipAddress: Optional[str] = None
@@ -232,6 +331,18 @@ class SetupInfo:
     pulseStreamer: PulseStreamerInfo = field(default_factory=PulseStreamerInfo)
     """ Pulse Streamer settings. """
 
+    liveView: LiveViewInfo = field(default_factory=LiveViewInfo)
+    """ Live view settings. """
+
+    recording: RecordingInfo = field(default_factory=RecordingInfo)
+    """ Recording settings. """
+
+    frameBroker: Optional[FrameBrokerInfo] = field(default_factory=lambda: None)
+    """ Frame broker settings. If defined, frames from the acquisition
+    detectors are published in shared memory as they are pulled from the
+    detectors, during live view as well as recordings, so that they can be
+    read by other processes using ``SharedFrameRingReader``. """
+
     _catchAll: CatchAll = None
 
     def getDevice(self, deviceName):
@@ -18,7 +18,7 @@ class HMockCamData:
     # @param size The size of the data object in bytes.
     #
     def __init__(self, size, max_value):
-        self.np_array = np.random.randint(1, max_value, int(size))
+        self.np_array = np.random.randint(1, max_value, int(size), dtype=np.uint16)
         self.size = size
 
     # __getitem__
@@ -0,0 +1,188 @@
+import time
+
+import numpy as np
+
+
+class SyntheticCamera:
+    """ Software camera that produces synthetic frames at a fixed frame rate,
+    for benchmarking the acquisition pipeline without hardware.
+
+    Frames are not generated on the fly; a bank of frames is rendered once
+    and cycled through, so that producing a frame costs no more than
+    indexing the bank. Which frames are available is derived from the time
+    elapsed since the acquisition started, so the frame rate is exact
+    regardless of how often the camera is polled. Frames can optionally be
+    dropped at random, and their timestamps jittered, to exercise the
+    dropped-frame detection further down the pipeline. """
+
+    patterns = ['beads', 'moving', 'noise']
+
+    def __init__(self, width=512, height=512, dtype='uint16', fps=100, pattern='beads',
+                 bankSize=64, dropProbability=0, jitter=0, seed=None):
+        """
+        Args:
+            width: Frame width, in pixels.
+            height: Frame height, in pixels.
+            dtype: Frame data type.
+            fps: Frame rate, in frames per second.
+            pattern: What the frames show; one of "beads" (blinking
+              diffraction-limited spots), "moving" (a structure that drifts
+              across the frame) and "noise" (camera noise only).
+            bankSize: Number of distinct frames to pregenerate.
+            dropProbability: Probability that a frame is dropped.
+            jitter: Standard deviation of the timestamp jitter, in seconds.
+            seed: Seed for the random number generator.
+        """
+        if pattern not in self.patterns:
+            raise ValueError(f'Unsupported pattern "{pattern}"; supported patterns are'
+                             f' {", ".join(self.patterns)}')
+
+        self.model = 'Synthetic camera'
+        self.width = width
+        self.height = height
+        self.dtype = np.dtype(dtype)
+        self.fps = fps
+        self.pattern = pattern
+        self.bankSize = bankSize
+        self.dropProbability = dropProbability
+        self.jitter = jitter
+
+        self._rng = np.random.default_rng(seed)
+        self._bank = None
+        self._running = False
+        self._startTime = 0
+        self._startWallTime = 0
+        self._nextFrameNumber = 0
+
+        self.generateBank()
+
+    @property
+    def running(self):
+        return self._running
+
+    def generateBank(self):
+        """ Renders the frame bank. Called automatically on initialization;
+        must be called again after changing the frame size, dtype or pattern.
+        """
+        if self.pattern == 'beads':
+            renderSignal = self._getBeadsRenderer()
+        elif self.pattern == 'moving':
+            renderSignal = self._getMovingRenderer()
+        else:
+            def renderSignal(_):
+                return 0
+
+        maxValue = np.iinfo(self.dtype).max if self.dtype.kind in 'ui' else 1
+        self._bank = np.empty((self.bankSize, self.height, self.width), dtype=self.dtype)
+        for i in range(self.bankSize):
+            # Rendered one frame at a time to keep the memory use down for large frames
+            frame = self._rng.normal(0.05 * maxValue, 0.01 * maxValue,
+                                     (self.height, self.width)).astype(np.float32)
+            frame += renderSignal(i) * (0.8 * maxValue)
+            if self.dtype.kind in 'ui':
+                np.clip(frame, 0, maxValue, out=frame)
+            self._bank[i] = frame
+
+    def startAcquisition(self):
+        self._startTime = time.perf_counter()
+        self._startWallTime = time.time()
+        self._nextFrameNumber = 0
+        self._running = True
+
+    def stopAcquisition(self):
+        self._running = False
+
+    def flush(self):
+        """ Discards the frames that have been produced but not yet grabbed.
+        """
+        if self._running:
+            self._nextFrameNumber = self._getNumFramesProduced()
+
+    def grabFrames(self):
+        """ Returns a tuple ``(frames, frameNumbers, timestamps)`` with the
+        frames produced since the last call, except for those that were
+        dropped. At most bankSize frames are returned; older frames are
+        considered lost, like on a camera whose buffer has overflowed. """
+
+        empty = np.empty((0, self.height, self.width), dtype=self.dtype)
+        if not self._running:
+            return empty, np.empty(0, dtype=np.int64), np.empty(0)
+
+        numProduced = self._getNumFramesProduced()
+        start = max(self._nextFrameNumber, numProduced - self.bankSize)
+        frameNumbers = np.arange(start, numProduced, dtype=np.int64)
+        self._nextFrameNumber = numProduced
+
+        if self.dropProbability > 0 and len(frameNumbers) > 0:
+            frameNumbers = frameNumbers[
+                self._rng.random(len(frameNumbers)) >= self.dropProbability
+            ]
+        if len(frameNumbers) < 1:
+            return empty, frameNumbers, np.empty(0)
+
+        timestamps = self._startWallTime + frameNumbers / self.fps
+        if self.jitter > 0:
+            timestamps += self._rng.normal(0, self.jitter, len(frameNumbers))
+
+        bankStart = frameNumbers[0] % self.bankSize
+        if frameNumbers[-1] - frameNumbers[0] == len(frameNumbers) - 1 and \
+                bankStart + len(frameNumbers) <= self.bankSize:
+            # Consecutive frames that don't wrap around the bank; return a view
+            frames = self._bank[bankStart:bankStart + len(frameNumbers)]
+        else:
+            frames = self._bank[frameNumbers % self.bankSize]
+
+        return frames, frameNumbers, timestamps
+
+    def getLast(self):
+        numProduced = self._getNumFramesProduced() if self._running else 1
+        return self._bank[(numProduced - 1) % self.bankSize]
+
+    def _getNumFramesProduced(self):
+        return int((time.perf_counter() - self._startTime) * self.fps)
+
+    def _getBeadsRenderer(self, numBeads=200, sigma=1.5):
+        radius = int(np.ceil(3 * sigma))
+        yy, xx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+        spot = np.exp(-(xx ** 2 + yy ** 2) / (2 * sigma ** 2)).astype(np.float32)
+
+        ys = self._rng.integers(0, max(self.height - 2 * radius, 1), numBeads)
+        xs = self._rng.integers(0, max(self.width - 2 * radius, 1), numBeads)
+        # Each bead is on in a random subset of frames, so that the beads blink
+        onStates = self._rng.random((self.bankSize, numBeads)) < 0.7
+
+        def render(i):
+            signal = np.zeros((self.height, self.width), dtype=np.float32)
+            for y, x in zip(ys[onStates[i]], xs[onStates[i]]):
+                window = signal[y:y + 2 * radius + 1, x:x + 2 * radius + 1]
+                np.maximum(window, spot[:window.shape[0], :window.shape[1]], out=window)
+            return signal
+
+        return render
+
+    def _getMovingRenderer(self, period=32):
+        yy, xx = np.mgrid[0:self.height, 0:self.width].astype(np.float32)
+        basePhases = 2 * np.pi * (xx + yy) / period
+
+        def render(i):
+            # The pattern moves by one period over the course of the bank, so that it loops
+            return 0.5 + 0.5 * np.cos(basePhases + 2 * np.pi * i / self.bankSize)
+
+        return render
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
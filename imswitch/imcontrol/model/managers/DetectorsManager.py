@@ -1,9 +1,12 @@
-from time import sleep
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
 from imswitch.imcommon.framework import Mutex, Signal, SignalInterface, Thread, Timer, Worker
+from imswitch.imcommon.model import initLogger
 from .MultiManager import MultiManager
+from .detectors.FrameAggregator import FrameAggregator
 
 
 class DetectorsManager(MultiManager, SignalInterface):
@@ -17,9 +20,11 @@ class DetectorsManager(MultiManager, SignalInterface):
         str, np.ndarray, bool, bool
     )  # (detectorName, image, init, isCurrentDetector)
 
-    def __init__(self, detectorInfos, updatePeriod, **lowLevelManagers):
+    def __init__(self, detectorInfos, updatePeriod, maxDisplayRate=None, frameBrokerInfo=None,
+                 **lowLevelManagers):
         MultiManager.__init__(self, detectorInfos, 'detectors', **lowLevelManagers)
         SignalInterface.__init__(self)
+        self.__logger = initLogger(self)
 
         self._activeAcqHandles = []
         self._activeAcqLVHandles = []
@@ -31,8 +36,8 @@ class DetectorsManager(MultiManager, SignalInterface):
                 continue
             # Connect signals
             self._subManagers[detectorName].sigImageUpdated.connect(
-                lambda image, init, detectorName=detectorName: self.sigImageUpdated.emit(
-                    detectorName, image, init, detectorName == self._currentDetectorName
+                lambda image, init, detectorName=detectorName: self._imageUpdated(
+                    detectorName, image, init
                 )
             )
 
@@ -40,19 +45,68 @@ class DetectorsManager(MultiManager, SignalInterface):
             if self._currentDetectorName is None:
                 self._currentDetectorName = detectorName
 
-        # A timer will collect the new frame and update it through the communication channel
-        self._lvWorker = LVWorker(self, updatePeriod)
-        self._thread = Thread()
-        self._lvWorker.moveToThread(self._thread)
-        self._thread.started.connect(self._lvWorker.run)
-        self._thread.finished.connect(self._lvWorker.stop)
+        # Each acquisition detector gets its own worker and thread that collects new frames while
+        # acquisition is running, and updates them through the communication channel when they
+        # arrive during live view, so that a slow detector doesn't stall the others
+        self._acqWorkers = {}
+        self._acqThreads = {}
+        self._lvRunning = False
+        for detectorName, detector in self._subManagers.items():
+            if not detector.forAcquisition:
+                continue
+
+            acqWorker = AcquisitionWorker(detector, updatePeriod, maxDisplayRate)
+            acqThread = Thread()
+            acqWorker.moveToThread(acqThread)
+            acqThread.started.connect(acqWorker.run)
+            acqThread.finished.connect(acqWorker.stop)
+            self._acqWorkers[detectorName] = acqWorker
+            self._acqThreads[detectorName] = acqThread
+
+        # Frames are published for other processes whenever they are pulled from the detectors,
+        # whether for live view, recording or anything else
+        self._framePublishers = {}
+        self._framePublisherThread = None
+        if frameBrokerInfo is not None:
+            # Only imported when used, since shared memory requires Python 3.8
+            from .detectors.SharedFrameRing import SharedFrameRingWriter
+            self._framePublisherThread = Thread()
+            for detectorName, detector in self._subManagers.items():
+                if not detector.forAcquisition:
+                    continue
+
+                framePublisher = FramePublisher(detector, SharedFrameRingWriter(
+                    f'{frameBrokerInfo.sharedMemoryPrefix}_{detectorName.replace(" ", "_")}',
+                    frameBrokerInfo.capacity
+                ))
+                framePublisher.moveToThread(self._framePublisherThread)
+                detector.sigNewFrames.connect(framePublisher.publish)
+                self._framePublishers[detectorName] = framePublisher
+            self._framePublisherThread.start()
+
+        # Detectors are started and stopped concurrently, since each of them can take a while
+        self._acqDetectorNames = list(self._acqWorkers.keys())
+        self._startWriteCounts = {}
+        self._startExecutor = (
+            ThreadPoolExecutor(len(self._acqDetectorNames), thread_name_prefix='DetectorStart')
+            if len(self._acqDetectorNames) > 1 else None
+        )
 
     def __del__(self):
-        self._thread.quit()
-        self._thread.wait()
+        self._stopAcquisitionThreads()
+        self._stopFramePublisherThread()
         if hasattr(super(), '__del__'):
             super().__del__()
 
+    def finalize(self):
+        self._stopAcquisitionThreads()
+        self._stopFramePublisherThread()
+        for framePublisher in self._framePublishers.values():
+            framePublisher.close()
+        if self._startExecutor is not None:
+            self._startExecutor.shutdown()
+        super().finalize()
+
     def getCurrentDetectorName(self):
         """ Returns the name of the current detector. """
 
@@ -78,9 +132,68 @@ class DetectorsManager(MultiManager, SignalInterface):
         self._currentDetectorName = detectorName
         self.sigDetectorSwitched.emit(detectorName, oldDetectorName)
 
-        if self._thread.isRunning():
+        if self._lvRunning:
             self.execOnCurrent(lambda c: c.updateLatestFrame(True))
 
+    def getNumFramesSkippedForDisplay(self, detectorName):
+        """ Returns the number of frames from the specified detector that have
+        been captured but not displayed, because they arrived faster than the
+        maximum display rate or while the previous frame was being displayed.
+        """
+        self._validateManagedDeviceName(detectorName)
+        return self._acqWorkers[detectorName].numFramesSkipped
+
+    def setWaitForDisplay(self, enabled):
+        """ Sets whether images are held back for display until the previous
+        image of the same detector has been displayed, which the display must
+        report by calling imageDisplayed. Disabled by default. """
+        for acqWorker in self._acqWorkers.values():
+            acqWorker.waitForDisplay = enabled
+
+    def imageDisplayed(self, detectorName):
+        """ Reports that the image last emitted through sigImageUpdated for
+        the specified detector has been displayed, so that the next one can be
+        passed on for display; see setWaitForDisplay. """
+        self._validateManagedDeviceName(detectorName)
+        self._acqWorkers[detectorName].imageDisplayed()
+
+    def createFrameAggregator(self, detectorNames=None, alignBy='timestamp', tolerance=0.001,
+                              maxPending=64):
+        """ Returns a FrameAggregator that groups frames from the specified
+        detectors (all acquisition detectors by default) into bundles of
+        frames that were captured at the same time. See FrameAggregator for
+        the meaning of the other arguments. """
+        if detectorNames is None:
+            detectorNames = self.getAllDeviceNames(lambda c: c.forAcquisition)
+        for detectorName in detectorNames:
+            self._validateManagedDeviceName(detectorName)
+
+        return FrameAggregator({detectorName: self._subManagers[detectorName]
+                                for detectorName in detectorNames},
+                               alignBy=alignBy, tolerance=tolerance, maxPending=maxPending)
+
+    def waitUntilReady(self, detectorNames=None, timeout=None):
+        """ Blocks until the specified detectors (all acquisition detectors by
+        default) have captured their first frame since acquisition was
+        started, or until timeout seconds have passed. Returns whether all of
+        them are ready. """
+        if detectorNames is None:
+            detectorNames = self._acqDetectorNames
+        if timeout is None:
+            timeout = _maxReadyWait
+
+        def waitForFirstFrame(detectorName):
+            detector = self._subManagers[detectorName]
+            return detector.waitForFrames(self._startWriteCounts.get(detectorName, 0) + 1,
+                                          timeout)
+
+        ready = self._execConcurrently(waitForFirstFrame, detectorNames)
+        notReady = [detectorName for detectorName, isReady in ready.items() if not isReady]
+        if notReady:
+            self.__logger.debug(f'No frames from {", ".join(notReady)} within {timeout} s of'
+                                f' starting acquisition')
+        return not notReady
+
     def execOnCurrent(self, func):
         """ Executes a function on the current detector and returns the result. """
         if not self.hasDevices():
@@ -112,11 +225,12 @@ class DetectorsManager(MultiManager, SignalInterface):
 
         # Do actual enabling
         if enableAcq:
-            self.execOnAll(lambda c: c.startAcquisition(), condition=lambda c: c.forAcquisition)
+            self._execConcurrently(self._startDetector, self._acqDetectorNames)
+            self._startAcquisitionThreads()
             self.sigAcquisitionStarted.emit()
         if enableLV:
-            sleep(0.3)
-            self._thread.start()
+            self.waitUntilReady()
+            self._setLiveView(True)
 
         return handle
 
@@ -145,33 +259,195 @@ class DetectorsManager(MultiManager, SignalInterface):
 
         # Do actual disabling
         if disableLV:
-            self._thread.quit()
-            self._thread.wait()
+            self._setLiveView(False)
         if disableAcq:
-            self.execOnAll(lambda c: c.stopAcquisition(), condition=lambda c: c.forAcquisition)
+            self._stopAcquisitionThreads()
+            self._execConcurrently(lambda detectorName: self._subManagers[detectorName]
+                                   .stopAcquisition(), self._acqDetectorNames)
             self.sigAcquisitionStopped.emit()
 
-
-class LVWorker(Worker):
-    def __init__(self, detectorsManager, updatePeriod):
+    def _startDetector(self, detectorName):
+        detector = self._subManagers[detectorName]
+        # Frames counted after this are from the new acquisition; see waitUntilReady
+        self._startWriteCounts[detectorName] = detector.frameBuffer.writeCount
+        detector.startAcquisition()
+
+    def _execConcurrently(self, func, detectorNames):
+        """ Calls func with each of the specified detector names, on separate
+        threads if there are several, and returns the results as a map from
+        detector names. Exceptions raised by func are re-raised. """
+        if self._startExecutor is None or len(detectorNames) < 2:
+            return {detectorName: func(detectorName) for detectorName in detectorNames}
+
+        futures = {detectorName: self._startExecutor.submit(func, detectorName)
+                   for detectorName in detectorNames}
+        return {detectorName: future.result() for detectorName, future in futures.items()}
+
+    def _imageUpdated(self, detectorName, image, init):
+        self.sigImageUpdated.emit(detectorName, image, init,
+                                  detectorName == self._currentDetectorName)
+
+    def _setLiveView(self, enabled):
+        self._lvRunning = enabled
+        for acqWorker in self._acqWorkers.values():
+            acqWorker.setLiveView(enabled)
+
+    def _startAcquisitionThreads(self):
+        for acqThread in self._acqThreads.values():
+            acqThread.start()
+
+    def _stopAcquisitionThreads(self):
+        for acqThread in self._acqThreads.values():
+            acqThread.quit()
+        for acqThread in self._acqThreads.values():
+            acqThread.wait()
+
+    def _stopFramePublisherThread(self):
+        if self._framePublisherThread is not None:
+            self._framePublisherThread.quit()
+            self._framePublisherThread.wait()
+
+
+class AcquisitionWorker(Worker):
+    """ Collects the frames of a single detector for as long as acquisition
+    is running, on the thread that it has been moved to, and passes the
+    latest frame on for display when new frames arrive during live view.
+    Frames that arrive faster than maxDisplayRate, or while the previous
+    frame is still being displayed, are coalesced so that only the latest one
+    is displayed.
+
+    Most detectors can only be asked for new frames, not notify about them,
+    so the worker pulls frames every pollPeriod milliseconds, with or without
+    live view. This keeps the detector's frame buffer filled, and the frame
+    timestamps and frame number checks tied to frame arrival, however rarely
+    a recording or other consumer reads the frames. Frame arrival is
+    signalled by the detector's sigNewFrames, which is emitted whenever
+    frames are pulled from the detector, whether by this worker or by
+    someone else. Detectors that don't provide their frames through grabChunk
+    have their latest frame fetched once per display interval instead. """
+
+    _sigLiveViewStarted = Signal()
+
+    def __init__(self, detector, pollPeriod, maxDisplayRate=None):
         super().__init__()
-        self._detectorsManager = detectorsManager
-        self._updatePeriod = updatePeriod
-        self._vtimer = None
+        self._detector = detector
+        self._pollPeriod = pollPeriod
+        self._minDisplayInterval = 1 / maxDisplayRate if maxDisplayRate else 0
+        self._pollTimer = None
+        self._lastDisplayTime = 0
+        self._displayBusy = False
+        self._numUndisplayedFrames = 0
+        self._numFramesSkipped = 0
+        self._liveView = False
+        self._initialDisplayPending = False
+        self.waitForDisplay = False
+
+    @property
+    def numFramesSkipped(self):
+        """ The number of captured frames that have not been displayed. """
+        return self._numFramesSkipped
 
     def run(self):
-        self._detectorsManager.execOnAll(lambda c: c.updateLatestFrame(False),
-                                         condition=lambda c: c.forAcquisition)
-        self._vtimer = Timer()
-        self._vtimer.timeout.connect(
-            lambda: self._detectorsManager.execOnAll(lambda c: c.updateLatestFrame(True),
-                                                     condition=lambda c: c.forAcquisition)
-        )
-        self._vtimer.start(self._updatePeriod)
+        self._numUndisplayedFrames = 0
+        self._detector.sigNewFrames.connect(self._framesArrived)
+        self._sigLiveViewStarted.connect(self._liveViewStarted)
+        self._pollTimer = Timer()
+        self._pollTimer.timeout.connect(self._poll)
+        self._pollTimer.start(self._pollPeriod)
+        self._liveViewStarted()  # In case live view was enabled before the connection was made
 
     def stop(self):
-        if self._vtimer is not None:
-            self._vtimer.stop()
+        if self._pollTimer is not None:
+            self._pollTimer.stop()
+            self._pollTimer = None
+            self._detector.sigNewFrames.disconnect(self._framesArrived)
+            self._sigLiveViewStarted.disconnect(self._liveViewStarted)
+
+    def setLiveView(self, enabled):
+        """ Sets whether new frames are passed on for display. May be called
+        from any thread. """
+        if enabled:
+            self._initialDisplayPending = True
+        self._liveView = enabled
+        if enabled:
+            self._sigLiveViewStarted.emit()
+
+    def imageDisplayed(self):
+        """ Must be called when the previously emitted frame has been
+        displayed, if waitForDisplay is set. """
+        self._displayBusy = False
+
+    def _liveViewStarted(self):
+        if not self._liveView or not self._initialDisplayPending or self._pollTimer is None:
+            return
+
+        self._initialDisplayPending = False
+        self._numUndisplayedFrames = 0
+        self._display(init=False)
+
+    def _poll(self):
+        # Frames pulled here are counted by _framesArrived, which sigNewFrames calls directly
+        numNewFrames = self._detector.pullFrames()
+        if numNewFrames is None:
+            # The detector doesn't provide its frames through the frame buffer, so we can't tell
+            # when new frames arrive; fetch its latest frame once per display interval instead
+            self._numUndisplayedFrames = max(self._numUndisplayedFrames, 1)
+
+        # Also displays frames that were held back when they arrived
+        self._displayIfDue()
+
+    def _framesArrived(self, numFrames):
+        self._numUndisplayedFrames += numFrames
+        self._displayIfDue()
+
+    def _displayIfDue(self):
+        if not self._liveView or self._initialDisplayPending:
+            # Nothing is displayed before live view has been started by _liveViewStarted
+            self._numUndisplayedFrames = 0
+            return
+        if self._numUndisplayedFrames < 1:
+            return
+
+        timeSinceDisplay = time.monotonic() - self._lastDisplayTime
+        if (timeSinceDisplay < self._minDisplayInterval or
+                (self._displayBusy and timeSinceDisplay < _maxDisplayWait)):
+            return  # Coalesce with the frames that arrive before the next display
+
+        self._numFramesSkipped += self._numUndisplayedFrames - 1
+        self._numUndisplayedFrames = 0
+        self._display(init=True)
+
+    def _display(self, init):
+        self._displayBusy = self.waitForDisplay
+        self._lastDisplayTime = time.monotonic()
+        if not self._detector.updateLatestFrame(init):
+            self._displayBusy = False
+
+
+class FramePublisher(Worker):
+    """ Publishes the frames of a single detector in shared memory, through a
+    SharedFrameRingWriter, on the thread that it has been moved to. It reads
+    the detector's frame buffer with a reader of its own, and publish is
+    called whenever frames have been pulled from the detector, so frames are
+    published whether they are pulled for live view, a recording or anything
+    else. """
+
+    def __init__(self, detector, sharedFrameRing):
+        super().__init__()
+        self._sharedFrameRing = sharedFrameRing
+        self._frameBufferReader = detector.frameBuffer.createReader()
+
+    def publish(self, numNewFrames=None):
+        """ Publishes the frames that have been pulled since the last call. """
+        self._sharedFrameRing.push(*self._frameBufferReader.read(withMetadata=True))
+
+    def close(self):
+        """ Closes and removes the shared memory. """
+        self._sharedFrameRing.close()
+
+
+_maxDisplayWait = 1  # Seconds to wait for a frame to be displayed before sending the next one
+_maxReadyWait = 1  # Seconds to wait for the first frame before starting live view without it
 
 
 class NoDetectorsError(RuntimeError):
@@ -1,6 +1,10 @@
 import enum
+import functools
+import inspect
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from io import BytesIO
 
 import h5py
@@ -9,6 +13,16 @@ import tifffile as tiff
 
 from imswitch.imcommon.framework import Signal, SignalInterface, Thread, Worker
 from imswitch.imcommon.model import initLogger
+from ..SetupInfo import RecordingInfo
+from .detectors.FrameBuffer import FrameBuffer
+from .recording.Compression import ChunkCompressor
+from .recording.HDF5Writer import HDF5Writer
+from .recording.RawWriter import RawWriter
+from .recording.RolloverWriter import RolloverWriter
+from .recording.Statistics import RecordingStatisticsTracker
+from .recording.TIFFWriter import TIFFWriter
+from .recording.WriteQueue import WriteQueue
+from .recording.ZarrWriter import ZarrWriter
 
 
 class RecordingManager(SignalInterface):
@@ -19,20 +33,39 @@ class RecordingManager(SignalInterface):
     sigRecordingEnded = Signal()
     sigRecordingFrameNumUpdated = Signal(int)  # (frameNumber)
     sigRecordingTimeUpdated = Signal(int)  # (recTime)
+    sigRecordingLapseStarted = Signal(int, float)  # (lapseNum, jitterSeconds)
+    sigRecordingWriteQueueUpdated = Signal(
+        int, int, int
+    )  # (queuedFrames, queuedBytes, highWaterMarkBytes)
+    sigRecordingStatisticsUpdated = Signal(object)  # (RecordingStatistics)
     sigMemorySnapAvailable = Signal(
         str, np.ndarray, object, bool
     )  # (name, image, filePath, savedToDisk)
     sigMemoryRecordingAvailable = Signal(
         str, object, object, bool
     )  # (name, file, filePath, savedToDisk)
+    sigMemoryRecordingBytesUpdated = Signal(int)  # (inProgressBytes)
 
-    def __init__(self, detectorsManager):
+    def __init__(self, detectorsManager, recordingInfo=None):
         super().__init__()
         self.__logger = initLogger(self)
 
+        if recordingInfo is None:
+            recordingInfo = RecordingInfo()
+
         self._memRecordings = {}  # { filePath: bytesIO }
+        self._statistics = None
+        self._lapseStartJitters = []
+        self.__snapExecutor = None
+        self.__snapLock = threading.Lock()
+        self.__lastSnapFuture = None
+        self.__pendingSnapPaths = set()
         self.__detectorsManager = detectorsManager
+        self.__recordingInfo = recordingInfo
+        self.__compression = recordingInfo.compression
+        self.__compressionLevel = recordingInfo.compressionLevel
         self.__record = False
+        self.__triggered = False
         self.__recordingWorker = RecordingWorker(self)
         self.__thread = Thread()
         self.__recordingWorker.moveToThread(self.__thread)
@@ -40,6 +73,8 @@ class RecordingManager(SignalInterface):
 
     def __del__(self):
         self.endRecording(emitSignal=False, wait=True)
+        if self.__snapExecutor is not None:
+            self.__snapExecutor.shutdown(wait=True)
         if hasattr(super(), '__del__'):
             super().__del__()
 
@@ -48,34 +83,131 @@ class RecordingManager(SignalInterface):
         """ Whether a recording is currently being recorded. """
         return self.__record
 
+    @property
+    def statistics(self):
+        """ The RecordingStatistics that were last reported for the current
+        (or latest) recording, or None if none have been reported. They are
+        reported about once per second with sigRecordingStatisticsUpdated. """
+        return self._statistics
+
+    @property
+    def lapseStartJitters(self):
+        """ For each lapse of the current (or latest) time-lapse recording that
+        has started, how many seconds after its scheduled time it started. """
+        return list(self._lapseStartJitters)
+
+    @property
+    def triggered(self):
+        """ Whether the current PreTrigger mode recording has been triggered.
+        """
+        return self.__triggered
+
     @property
     def detectorsManager(self):
         return self.__detectorsManager
 
+    @property
+    def recordingInfo(self):
+        return self.__recordingInfo
+
+    @property
+    def compression(self):
+        """ The codec that recordings are compressed with (see
+        ChunkCompressor.codecs), or None if they are not compressed. Defaults
+        to the codec specified in the setup file. """
+        return self.__compression
+
+    @compression.setter
+    def compression(self, codec):
+        if codec is not None and codec not in ChunkCompressor.codecs:
+            raise ValueError(f'Unsupported compression codec "{codec}"')
+        self.__compression = codec
+
+    @property
+    def compressionLevel(self):
+        """ The compression level, or None for the codec's default. """
+        return self.__compressionLevel
+
+    @compressionLevel.setter
+    def compressionLevel(self, level):
+        self.__compressionLevel = level
+
     def startRecording(self, detectorNames, recMode, savename, saveMode, attrs,
                        singleMultiDetectorFile=False, singleLapseFile=False,
-                       recFrames=None, recTime=None):
+                       recFrames=None, recTime=None, saveFormat=None,
+                       preTriggerFrames=None, preTriggerTime=None,
+                       lapseTotal=None, lapsePeriod=None):
         """ Starts a recording with the specified detectors, recording mode,
         file name prefix and attributes to save to the recording per detector.
         In SpecFrames mode, recFrames (the number of frames) must be specified,
         and in SpecTime mode, recTime (the recording time in seconds) must be
-        specified. """
+        specified.
+
+        In PreTrigger mode, either preTriggerFrames (the number of frames) or
+        preTriggerTime (the time span in seconds) of the most recent frames of
+        each detector are kept in memory, without saving anything, until
+        trigger is called. The kept frames are then saved along with the
+        frames that follow, until the recording is ended.
+
+        In ScanLapse mode, each call records a single lapse of recFrames
+        frames, unless lapseTotal (the number of lapses) and lapsePeriod (the
+        time in seconds from the start of one lapse to the start of the next)
+        are specified, in which case the whole time-lapse is recorded. The
+        lapses are then scheduled on a monotonic clock, their files are opened
+        ahead of time, and sigRecordingLapseStarted is emitted as each lapse
+        starts, with how late it started (see also lapseStartJitters).
+
+        saveFormat may be HDF5 (the default), TIFF, Zarr or Raw; recordings
+        in formats other than HDF5 can only be saved on disk, and TIFF and Raw
+        recordings are always saved in one file per detector and scan. The
+        same goes for HDF5 recordings saved on disk if maxFileBytes or
+        maxFileFrames is set in the recording info, in which case recordings
+        in all formats but Zarr roll over to new files at that size. """
+
+        if saveFormat is None:
+            saveFormat = SaveFormat.HDF5
+        if saveFormat != SaveFormat.HDF5 and saveMode != SaveMode.Disk:
+            raise ValueError(f'{saveFormat.name} recordings can only be saved on disk')
+        if (saveFormat == SaveFormat.TIFF or saveFormat == SaveFormat.Raw or
+                self._rollsOver(saveFormat, saveMode)):
+            singleMultiDetectorFile = False
+            singleLapseFile = False
+        if (recMode == RecMode.PreTrigger and
+                (preTriggerFrames is None) == (preTriggerTime is None)):
+            raise ValueError('Either preTriggerFrames or preTriggerTime must be specified in'
+                             ' PreTrigger mode')
+        if (lapseTotal is None) != (lapsePeriod is None):
+            raise ValueError('lapseTotal and lapsePeriod must be specified together')
 
         self.__logger.info('Starting recording')
         self.__record = True
+        self.__triggered = False
+        self._lapseStartJitters = []
         self.__recordingWorker.detectorNames = detectorNames
         self.__recordingWorker.recMode = recMode
         self.__recordingWorker.savename = savename
         self.__recordingWorker.saveMode = saveMode
+        self.__recordingWorker.saveFormat = saveFormat
         self.__recordingWorker.attrs = attrs
         self.__recordingWorker.recFrames = recFrames
         self.__recordingWorker.recTime = recTime
+        self.__recordingWorker.preTriggerFrames = preTriggerFrames
+        self.__recordingWorker.preTriggerTime = preTriggerTime
         self.__recordingWorker.singleMultiDetectorFile = singleMultiDetectorFile
         self.__recordingWorker.singleLapseFile = singleLapseFile
+        self.__recordingWorker.lapseTotal = lapseTotal
+        self.__recordingWorker.lapsePeriod = lapsePeriod
         self.__detectorsManager.execOnAll(lambda c: c.flushBuffers(),
                                           condition=lambda c: c.forAcquisition)
         self.__thread.start()
 
+    def trigger(self):
+        """ Triggers the current PreTrigger mode recording, i.e. starts saving
+        the kept frames and the frames that follow. """
+        if self.__record and not self.__triggered:
+            self.__logger.info('Recording triggered')
+        self.__triggered = True
+
     def endRecording(self, emitSignal=True, wait=True):
         """ Ends the current recording. Unless emitSignal is false, the
         sigRecordingEnded signal will be emitted. Unless wait is False, this
@@ -94,55 +226,142 @@ class RecordingManager(SignalInterface):
         """ Saves a single frame capture with the specified detectors to a file
         with the specified name prefix, save mode, file format and attributes
         to save to the capture per detector. """
-        acqHandle = self.__detectorsManager.startAcquisition()
-        try:
-            images = {}
-            for detectorName in detectorNames:
-                images[detectorName] = self.__detectorsManager[detectorName].getLatestFrame(is_save=True)
+        self.snapAsync(detectorNames, savename, saveMode, saveFormat, attrs).result()
+
+    def snapAsync(self, detectorNames, savename, saveMode, saveFormat, attrs):
+        """ Like snap, but only captures the frames before returning; they are
+        encoded and saved on a pool of background writer threads. Returns a
+        concurrent.futures.Future that resolves to the path of the saved file
+        per detector once the capture has been saved. Captures complete in the
+        order they were taken, though their files may be written out of
+        order, and the future of a capture fails if an earlier capture failed
+        to save; use waitForSnaps to wait for all of them. """
+        images = self._captureSnapImages(detectorNames)
 
+        filePaths = {}
+        with self.__snapLock:
             for detectorName in detectorNames:
-                image = images[detectorName]
                 fileExtension = str(saveFormat.name).lower()
-                filePath = self.getSaveFilePath(f'{savename}_{detectorName}.{fileExtension}')
-
+                filePaths[detectorName] = self.getSaveFilePath(
+                    f'{savename}_{detectorName}.{fileExtension}'
+                )
                 if saveMode != SaveMode.RAM:
-                    # Write file
-                    if saveFormat == SaveFormat.HDF5:
-                        file = h5py.File(filePath, 'w')
-
-                        shape = self.__detectorsManager[detectorName].shape
-                        dataset = file.create_dataset('data', tuple(reversed(shape)), dtype='i2')
-
-                        for key, value in attrs[detectorName].items():
-                            dataset.attrs[key] = value
-
-                        dataset.attrs['detector_name'] = detectorName
-
-                        # For ImageJ compatibility
-                        dataset.attrs['element_size_um'] =\
-                            self.__detectorsManager[detectorName].pixelSizeUm
-
-                        dataset[:, :] = image
-                        file.close()
-                    elif saveFormat == SaveFormat.TIFF:
-                        tiff.imwrite(filePath, image)
-                    else:
-                        raise ValueError(f'Unsupported save format "{saveFormat}"')
-
-                # Handle memory snaps
-                if saveMode == SaveMode.RAM or saveMode == SaveMode.DiskAndRAM:
-                    name = os.path.basename(f'{savename}_{detectorName}')
-                    self.sigMemorySnapAvailable.emit(name, image, filePath,
-                                                     saveMode == SaveMode.DiskAndRAM)
+                    self.__pendingSnapPaths.add(filePaths[detectorName])
+
+            pixelSizes = {detectorName: self.__detectorsManager[detectorName].pixelSizeUm
+                          for detectorName in detectorNames}
+            if self.__snapExecutor is None:
+                self.__snapExecutor = ThreadPoolExecutor(self.__recordingInfo.snapWriterThreads,
+                                                         thread_name_prefix='SnapWriter')
+            future = self.__snapExecutor.submit(
+                self._saveSnap, self.__lastSnapFuture, images, filePaths, savename, saveMode,
+                saveFormat, attrs, pixelSizes
+            )
+            self.__lastSnapFuture = future
+        return future
+
+    def waitForSnaps(self, timeout=None):
+        """ Waits until all captures taken with snapAsync have been saved.
+        Returns False if the timeout (in seconds) expired first. """
+        future = self.__lastSnapFuture
+        if future is None:
+            return True
+
+        try:
+            future.exception(timeout)
+        except FutureTimeoutError:
+            return False
+        return True
+
+    def _captureSnapImages(self, detectorNames):
+        acqHandle = self.__detectorsManager.startAcquisition()
+        try:
+            self.__detectorsManager.waitUntilReady(detectorNames)
+
+            images = {}
+            for detectorName in detectorNames:
+                detector = self.__detectorsManager[detectorName]
+                if 'is_save' in inspect.signature(detector.getLatestFrame).parameters:
+                    frame = detector.getLatestFrame(is_save=True)  # May be a full-resolution still
+                else:
+                    frame = detector.getLatestFrame()
+                # Copied, since the frame may be a view into a buffer that is reused
+                images[detectorName] = np.array(detector.binFrames(frame))
+            return images
         finally:
             self.__detectorsManager.stopAcquisition(acqHandle)
 
+    def _saveSnap(self, previousFuture, images, filePaths, savename, saveMode, saveFormat,
+                  attrs, pixelSizes):
+        """ Saves a capture taken with snapAsync. The capture is written
+        before waiting for the previous one (previousFuture) to complete, so
+        that the files of consecutive captures are encoded and written in
+        parallel, and may be written out of order; it is only completed,
+        and made available as a memory snap, in order. If the previous capture
+        failed to save, so does this one, so that the future of a capture only
+        resolves once it and all captures before it have been saved. """
+        error = None
+        try:
+            if saveMode != SaveMode.RAM:
+                for detectorName, image in images.items():
+                    self._writeSnapFile(filePaths[detectorName], image, saveFormat,
+                                        detectorName, attrs[detectorName],
+                                        pixelSizes[detectorName])
+        except Exception as e:
+            error = e
+        finally:
+            with self.__snapLock:
+                self.__pendingSnapPaths.difference_update(filePaths.values())
+
+        previousError = None
+        if previousFuture is not None:
+            previousError = previousFuture.exception()  # Completes after the previous capture
+        if error is not None:
+            self.__logger.error(f'Failed to save snap: {error}')
+            raise error
+        if previousError is not None:
+            raise RuntimeError('An earlier snap failed to save') from previousError
+
+        # Handle memory snaps
+        if saveMode == SaveMode.RAM or saveMode == SaveMode.DiskAndRAM:
+            for detectorName, image in images.items():
+                name = os.path.basename(f'{savename}_{detectorName}')
+                self.sigMemorySnapAvailable.emit(name, image, filePaths[detectorName],
+                                                 saveMode == SaveMode.DiskAndRAM)
+        return filePaths
+
+    @staticmethod
+    def _writeSnapFile(filePath, image, saveFormat, detectorName, attrs, pixelSizeUm):
+        if saveFormat == SaveFormat.HDF5:
+            with h5py.File(filePath, 'w') as file:
+                dataset = file.create_dataset('data', data=image)
+
+                for key, value in attrs.items():
+                    dataset.attrs[key] = value
+
+                dataset.attrs['detector_name'] = detectorName
+
+                # For ImageJ compatibility
+                dataset.attrs['element_size_um'] = pixelSizeUm
+        elif saveFormat == SaveFormat.TIFF:
+            tiff.imwrite(filePath, image)
+        else:
+            raise ValueError(f'Unsupported save format "{saveFormat}"')
+
+    def _rollsOver(self, saveFormat, saveMode):
+        """ Whether recordings with the specified format and save mode are
+        split across files of at most maxFileBytes or maxFileFrames. """
+        return (saveMode == SaveMode.Disk and saveFormat != SaveFormat.Zarr and
+                (self.__recordingInfo.maxFileBytes is not None or
+                 self.__recordingInfo.maxFileFrames is not None))
+
     def getSaveFilePath(self, path, allowOverwriteDisk=False, allowOverwriteMem=False):
         newPath = path
         numExisting = 0
 
         def existsFunc(pathToCheck):
-            if not allowOverwriteDisk and os.path.exists(pathToCheck):
+            if not allowOverwriteDisk and (os.path.exists(pathToCheck) or
+                                           pathToCheck in self.__pendingSnapPaths):
                 return True
             if not allowOverwriteMem and pathToCheck in self._memRecordings:
                 return True
@@ -156,9 +375,24 @@ class RecordingManager(SignalInterface):
 
 
 class RecordingWorker(Worker):
+    """ Collects frames from the detectors during a recording and passes them
+    on to RecordingWriterWorkers through bounded write queues. Each file (or
+    set of files, if it rolls over) that is being written has a writer worker
+    and a write queue of its own, so that files are written in parallel, and
+    slow writes don't hold up the collection of frames. """
+
     def __init__(self, recordingManager):
         super().__init__()
+        self.__logger = initLogger(self)
         self.__recordingManager = recordingManager
+        self.__writeQueues = {}  # Detectors that share a file share a write queue
+        self.__writerThreads = []
+        self.__statistics = None
+        self.__droppedFramesAtStart = {}
+        self.__lastQueueReportTime = 0
+        self.__lastStatisticsReportTime = 0
+        self.__lastProgressReportTime = 0
+        self.__memRecordingBytes = 0
 
     def run(self):
         acqHandle = self.__recordingManager.detectorsManager.startAcquisition()
@@ -168,84 +402,37 @@ class RecordingWorker(Worker):
             self.__recordingManager.detectorsManager.stopAcquisition(acqHandle)
 
     def _record(self):
-        files, fileDests, filePaths = self._getFiles()
-
-        shapes = {detectorName: self.__recordingManager.detectorsManager[detectorName].shape
-                  for detectorName in self.detectorNames}
-
-        currentFrame = {}
-        datasets = {}
-        for detectorName in self.detectorNames:
-            currentFrame[detectorName] = 0
-
-            datasetName = detectorName
-            if self.recMode == RecMode.ScanLapse and self.singleLapseFile:
-                # Add scan number to dataset name
-                scanNum = 0
-                datasetNameWithScan = f'{datasetName}_scan{scanNum}'
-                while datasetNameWithScan in files[detectorName]:
-                    scanNum += 1
-                    datasetNameWithScan = f'{datasetName}_scan{scanNum}'
-                datasetName = datasetNameWithScan
-
-            # Initial number of frames must not be 0; otherwise, too much disk space may get
-            # allocated. We remove this default frame later on if no frames are captured.
-            datasets[detectorName] = files[detectorName].create_dataset(
-                datasetName, (1, *reversed(shapes[detectorName])),
-                maxshape=(None, *reversed(shapes[detectorName])),
-                dtype='i2'
-            )
-
-            for key, value in self.attrs[detectorName].items():
-                datasets[detectorName].attrs[key] = value
-
-            datasets[detectorName].attrs['detector_name'] = detectorName
-
-            # For ImageJ compatibility
-            datasets[detectorName].attrs['element_size_um'] \
-                = self.__recordingManager.detectorsManager[detectorName].pixelSizeUm
-
-        self.__recordingManager.sigRecordingStarted.emit()
+        self.__statistics = None
+        self.__recordingManager._statistics = None
+        preTriggerFrames = None
+        if self.recMode == RecMode.PreTrigger:
+            self.__recordingManager.sigRecordingStarted.emit()
+            preTriggerFrames = self._bufferUntilTriggered()
+            if preTriggerFrames is None:
+                return  # Ended before it was triggered, so there is nothing to save
+
+        if self.recMode == RecMode.ScanLapse and self.lapsePeriod is not None:
+            self._recordTimelapse()
+            return
+
+        files, fileDests, filePaths = self._getFiles(self.savename)
+        writers = self._createWriters(files)
+        self._startWriting(writers, files)
+
+        if self.recMode != RecMode.PreTrigger:
+            self.__recordingManager.sigRecordingStarted.emit()
         try:
             if len(self.detectorNames) < 1:
                 raise ValueError('No detectors to record specified')
 
-            if self.recMode in [RecMode.SpecFrames, RecMode.ScanOnce, RecMode.ScanLapse]:
-                recFrames = self.recFrames
-                if recFrames is None:
-                    raise ValueError('recFrames must be specified in SpecFrames, ScanOnce or'
-                                     ' ScanLapse mode')
-
-                while (self.__recordingManager.record and
-                       any([currentFrame[detectorName] < recFrames
-                            for detectorName in self.detectorNames])):
-                    for detectorName in self.detectorNames:
-                        if currentFrame[detectorName] >= recFrames:
-                            continue  # Reached requested number of frames with this detector, skip
-
-                        newFrames = self._getNewFrames(detectorName)
-                        n = len(newFrames)
-                        if n > 0:
-                            it = currentFrame[detectorName]
-                            dataset = datasets[detectorName]
-                            if (it + n) <= recFrames:
-                                dataset.resize(n + it, axis=0)
-                                dataset[it:it + n, :, :] = newFrames
-                                currentFrame[detectorName] += n
-                            else:
-                                dataset.resize(recFrames, axis=0)
-                                dataset[it:recFrames, :, :] = newFrames[0:recFrames - it]
-                                currentFrame[detectorName] = recFrames
-
-                            # Things get a bit weird if we have multiple detectors when we report
-                            # the current frame number, since the detectors may not be synchronized.
-                            # For now, we will report the lowest number.
-                            self.__recordingManager.sigRecordingFrameNumUpdated.emit(
-                                min(list(currentFrame.values()))
-                            )
-                    time.sleep(0.0001)  # Prevents freezing for some reason
+            currentFrame = dict.fromkeys(self.detectorNames, 0)
+            if preTriggerFrames is not None:
+                for detectorName, (frames, metadata) in preTriggerFrames.items():
+                    self._enqueueFrames(detectorName, frames, metadata)
+                    currentFrame[detectorName] += len(frames)
 
-                self.__recordingManager.sigRecordingFrameNumUpdated.emit(0)
+            if self.recMode in [RecMode.SpecFrames, RecMode.ScanOnce, RecMode.ScanLapse]:
+                self._recordFrames(currentFrame)
             elif self.recMode == RecMode.SpecTime:
                 recTime = self.recTime
                 if recTime is None:
@@ -256,15 +443,13 @@ class RecordingWorker(Worker):
                 shouldStop = False
                 while True:
                     for detectorName in self.detectorNames:
-                        newFrames = self._getNewFrames(detectorName)
+                        newFrames, newMetadata = self._getNewFrames(detectorName)
                         n = len(newFrames)
                         if n > 0:
-                            it = currentFrame[detectorName]
-                            dataset = datasets[detectorName]
-                            dataset.resize(n + it, axis=0)
-                            dataset[it:it + n, :, :] = newFrames
+                            self._enqueueFrames(detectorName, newFrames, newMetadata)
                             currentFrame[detectorName] += n
-                            self.__recordingManager.sigRecordingTimeUpdated.emit(
+                            self._reportProgress(
+                                self.__recordingManager.sigRecordingTimeUpdated,
                                 np.around(currentRecTime, decimals=2)
                             )
                             currentRecTime = time.time() - start
@@ -278,17 +463,14 @@ class RecordingWorker(Worker):
                     time.sleep(0.0001)  # Prevents freezing for some reason
 
                 self.__recordingManager.sigRecordingTimeUpdated.emit(0)
-            elif self.recMode == RecMode.UntilStop:
+            elif self.recMode in [RecMode.UntilStop, RecMode.PreTrigger]:
                 shouldStop = False
                 while True:
                     for detectorName in self.detectorNames:
-                        newFrames = self._getNewFrames(detectorName)
+                        newFrames, newMetadata = self._getNewFrames(detectorName)
                         n = len(newFrames)
                         if n > 0:
-                            it = currentFrame[detectorName]
-                            dataset = datasets[detectorName]
-                            dataset.resize(n + it, axis=0)
-                            dataset[it:it + n, :, :] = newFrames
+                            self._enqueueFrames(detectorName, newFrames, newMetadata)
                             currentFrame[detectorName] += n
 
                     if shouldStop:
@@ -301,42 +483,307 @@ class RecordingWorker(Worker):
             else:
                 raise ValueError('Unsupported recording mode specified')
         finally:
-            for detectorName, file in files.items():
-                # Remove default frame if no frames have been captured
-                if currentFrame[detectorName] < 1:
-                    datasets[detectorName].resize(0, axis=0)
-
-                # Handle memory recordings
-                if self.saveMode == SaveMode.RAM or self.saveMode == SaveMode.DiskAndRAM:
-                    filePath = filePaths[detectorName]
-                    name = os.path.basename(filePath)
-                    if self.saveMode == SaveMode.RAM:
-                        file.close()
-                        self.__recordingManager.sigMemoryRecordingAvailable.emit(
-                            name, fileDests[detectorName], filePath, False
-                        )
-                    else:
-                        file.flush()
-                        self.__recordingManager.sigMemoryRecordingAvailable.emit(
-                            name, file, filePath, True
-                        )
-                else:
-                    file.close()
+            self._stopWriting(writers)
+            self._closeFiles(files, fileDests, filePaths)
+            self.__recordingManager.endRecording(wait=False)
 
+    def _recordTimelapse(self):
+        """ Records lapseTotal lapses of recFrames frames each. The lapses are
+        scheduled lapsePeriod seconds apart on a monotonic clock, so that they
+        don't drift however long it takes to set each one up. The files (or,
+        with singleLapseFile, the datasets) of each lapse are opened while
+        waiting for it to start. """
+
+        if len(self.detectorNames) < 1:
+            raise ValueError('No detectors to record specified')
+
+        numDigits = len(str(self.lapseTotal))
+        files = None
+        startTime = None
+        self.__recordingManager.sigRecordingStarted.emit()
+        try:
+            for lapseNum in range(self.lapseTotal):
+                if files is None:
+                    savename = self.savename
+                    if not self.singleLapseFile:
+                        savename = f'{self.savename}_scan{str(lapseNum).zfill(numDigits)}'
+                    files, fileDests, filePaths = self._getFiles(savename)
+                writers = self._createWriters(files)
+
+                try:
+                    if startTime is None:
+                        startTime = time.monotonic()
+                    scheduledTime = startTime + lapseNum * self.lapsePeriod
+                    if not self._waitUntil(scheduledTime):
+                        break  # Ended while waiting for the lapse
+
+                    jitter = time.monotonic() - scheduledTime
+                    self.__logger.debug(f'Lapse {lapseNum} started {jitter * 1000:.1f} ms late')
+                    self.__recordingManager.detectorsManager.execOnAll(
+                        lambda c: c.flushBuffers(), condition=lambda c: c.forAcquisition
+                    )  # Discard the frames from between the lapses
+                    self._startWriting(writers, files)
+                    self.__recordingManager._lapseStartJitters.append(jitter)
+                    self.__recordingManager.sigRecordingLapseStarted.emit(lapseNum, jitter)
+                    self._recordFrames(dict.fromkeys(self.detectorNames, 0))
+                finally:
+                    self._stopWriting(writers)
+
+                if not self.singleLapseFile:
+                    self._closeFiles(files, fileDests, filePaths)
+                    files = None
+                if not self.__recordingManager.record:
+                    break
+        finally:
+            if files is not None:
+                self._closeFiles(files, fileDests, filePaths)
+
+            jitters = np.abs(self.__recordingManager._lapseStartJitters)
+            if len(jitters) > 0:
+                self.__logger.info(f'Lapse start jitter: mean {np.mean(jitters) * 1000:.1f} ms,'
+                                   f' max {np.max(jitters) * 1000:.1f} ms')
             self.__recordingManager.endRecording(wait=False)
 
-    def _getFiles(self):
+    def _waitUntil(self, targetTime):
+        """ Waits until the monotonic clock reaches targetTime. Returns False
+        if the recording was ended first. """
+        while self.__recordingManager.record:
+            remaining = targetTime - time.monotonic()
+            if remaining <= 0:
+                return True
+
+            # Sleep in short steps to notice the end of the recording, and spin through the
+            # final stretch, which is shorter than sleep's granularity can be relied on for
+            if remaining > _lapseSpinTime:
+                time.sleep(min(remaining - _lapseSpinTime, 0.05))
+        return False
+
+    def _recordFrames(self, currentFrame):
+        recFrames = self.recFrames
+        if recFrames is None:
+            raise ValueError('recFrames must be specified in SpecFrames, ScanOnce or'
+                             ' ScanLapse mode')
+
+        while (self.__recordingManager.record and
+               any([currentFrame[detectorName] < recFrames
+                    for detectorName in self.detectorNames])):
+            for detectorName in self.detectorNames:
+                if currentFrame[detectorName] >= recFrames:
+                    continue  # Reached requested number of frames with this detector, skip
+
+                newFrames, newMetadata = self._getNewFrames(detectorName)
+                n = len(newFrames)
+                if n > 0:
+                    n = min(n, recFrames - currentFrame[detectorName])
+                    self._enqueueFrames(detectorName, newFrames[:n], newMetadata[:n])
+                    currentFrame[detectorName] += n
+
+                    # Things get a bit weird if we have multiple detectors when we report
+                    # the current frame number, since the detectors may not be synchronized.
+                    # For now, we will report the lowest number.
+                    self._reportProgress(
+                        self.__recordingManager.sigRecordingFrameNumUpdated,
+                        min(list(currentFrame.values()))
+                    )
+            time.sleep(0.0001)  # Prevents freezing for some reason
+
+        self.__recordingManager.sigRecordingFrameNumUpdated.emit(0)
+
+    def _createWriters(self, files):
+        expectedFrames = None
+        if self.recMode in [RecMode.SpecFrames, RecMode.ScanOnce, RecMode.ScanLapse]:
+            expectedFrames = self.recFrames
+
+        compressor = None
+        if self.__recordingManager.compression is not None:
+            compressor = ChunkCompressor(self.__recordingManager.compression,
+                                         self.__recordingManager.compressionLevel)
+
+        recordingInfo = self.__recordingManager.recordingInfo
+        rollsOver = self.__recordingManager._rollsOver(self.saveFormat, self.saveMode)
+
+        writers = {}
+        for detectorName in self.detectorNames:
+            datasetName = detectorName
+            if self.recMode == RecMode.ScanLapse and self.singleLapseFile:
+                # Add scan number to dataset name
+                scanNum = 0
+                datasetNameWithScan = f'{datasetName}_scan{scanNum}'
+                while self._datasetExists(files[detectorName], datasetNameWithScan):
+                    scanNum += 1
+                    datasetNameWithScan = f'{datasetName}_scan{scanNum}'
+                datasetName = datasetNameWithScan
+
+            detector = self.__recordingManager.detectorsManager[detectorName]
+            if rollsOver:
+                writers[detectorName] = RolloverWriter(
+                    files[detectorName],
+                    functools.partial(self._openWriter, detectorName=detectorName,
+                                      datasetName=datasetName, expectedFrames=expectedFrames,
+                                      compressor=compressor),
+                    int(np.prod(detector.shape)) * np.dtype(detector.dtype).itemsize,
+                    maxFileBytes=recordingInfo.maxFileBytes,
+                    maxFileFrames=recordingInfo.maxFileFrames
+                )
+            else:
+                writers[detectorName] = self._createWriter(files[detectorName], detectorName,
+                                                           datasetName, expectedFrames,
+                                                           compressor)
+            datasetAttrs = writers[detectorName].attrs
+
+            for key, value in self.attrs[detectorName].items():
+                datasetAttrs[key] = value
+
+            datasetAttrs['detector_name'] = detectorName
+
+            # For ImageJ compatibility
+            datasetAttrs['element_size_um'] = detector.pixelSizeUm
+
+            writers[detectorName].metadataAttrs['detector_name'] = detectorName
+
+        return writers
+
+    def _createWriter(self, file, detectorName, datasetName, expectedFrames, compressor):
+        # Per-frame metadata is stored in a parallel dataset with one record per frame
+        detector = self.__recordingManager.detectorsManager[detectorName]
+        shape = tuple(reversed(detector.shape))
+        recordingInfo = self.__recordingManager.recordingInfo
+        if self.saveFormat == SaveFormat.TIFF:
+            return TIFFWriter(file, shape, detector.dtype, pixelSizeUm=detector.pixelSizeUm)
+        elif self.saveFormat == SaveFormat.Raw:
+            return RawWriter(file, shape, detector.dtype, pixelSizeUm=detector.pixelSizeUm)
+        elif self.saveFormat == SaveFormat.Zarr:
+            return ZarrWriter(file, datasetName, shape, detector.dtype,
+                              pixelSizeUm=detector.pixelSizeUm, compressor=compressor,
+                              writeThreads=recordingInfo.compressionThreads)
+        else:
+            return HDF5Writer(file, datasetName, shape, detector.dtype,
+                              expectedFrames=expectedFrames, compressor=compressor,
+                              compressionThreads=recordingInfo.compressionThreads)
+
+    def _openWriter(self, filePath, numFrames, *, detectorName, datasetName, expectedFrames,
+                    compressor):
+        """ Creates the file at filePath, or at a similar path if it would
+        overwrite another file, and a writer for it. For RolloverWriter. """
+        filePath = self.__recordingManager.getSaveFilePath(filePath)
+        expectedFrames = min(expectedFrames, numFrames) if expectedFrames else numFrames
+        if self.saveFormat == SaveFormat.HDF5:
+            file = h5py.File(filePath, 'w-')
+            return (self._createWriter(file, detectorName, datasetName, expectedFrames,
+                                       compressor),
+                    file.close)
+        return (self._createWriter(filePath, detectorName, datasetName, expectedFrames,
+                                   compressor),
+                None)
+
+    def _startWriting(self, writers, files):
+        self.__droppedFramesAtStart = {
+            detectorName: self.__recordingManager.detectorsManager[detectorName].droppedFrames
+            for detectorName in self.detectorNames
+        }
+        if self.__statistics is None:  # Kept across the lapses of a time-lapse
+            self.__statistics = RecordingStatisticsTracker(self.detectorNames)
+            self.__lastStatisticsReportTime = time.monotonic()
+
+        # Detectors that share a file are written on the same thread; h5py files can't be
+        # written from several threads at once
+        detectorsPerFile = {}
+        for detectorName in self.detectorNames:
+            detectorsPerFile.setdefault(id(files[detectorName]), []).append(detectorName)
+
+        recordingInfo = self.__recordingManager.recordingInfo
+        for detectorNames in detectorsPerFile.values():
+            writeQueue = WriteQueue(recordingInfo.writeQueueBytes // len(detectorsPerFile),
+                                    recordingInfo.writeQueueFullPolicy,
+                                    recordingInfo.spillDir)
+            writerWorker = RecordingWriterWorker()
+            writerWorker.writeQueue = writeQueue
+            writerWorker.writers = {detectorName: writers[detectorName]
+                                    for detectorName in detectorNames}
+            writerWorker.statistics = self.__statistics
+            writerThread = Thread()
+            writerWorker.moveToThread(writerThread)
+            writerThread.started.connect(writerWorker.run)
+
+            for detectorName in detectorNames:
+                self.__writeQueues[detectorName] = writeQueue
+            self.__writerThreads.append((writerWorker, writerThread))
+
+        for _, writerThread in self.__writerThreads:
+            writerThread.start()
+
+    def _stopWriting(self, writers):
+        """ Waits for the queued frames to be written, and closes the writers.
+        """
+        if self.__writeQueues:
+            writeQueues = self._getWriteQueues()
+            for writeQueue in writeQueues:
+                writeQueue.close()
+            for _, writerThread in self.__writerThreads:
+                writerThread.quit()
+                writerThread.wait()
+            for writeQueue in writeQueues:
+                writeQueue.cleanUp()
+            self._reportWriteQueue(force=True)
+            highWaterMark = sum(writeQueue.highWaterMark for writeQueue in writeQueues)
+            self.__logger.debug(f'Write queue high-water mark: {highWaterMark / 1024 ** 2:.1f} MiB')
+
+            self._reportStatistics(force=True)
+
+            for detectorName, writer in writers.items():
+                droppedFrames = self._getDroppedFrames(detectorName)
+                writer.metadataAttrs['dropped_frames'] = droppedFrames
+                if droppedFrames > 0:
+                    self.__logger.warning(f'{droppedFrames} frame(s) from detector'
+                                          f' "{detectorName}" were lost during recording')
+            self.__writeQueues = {}
+            self.__writerThreads = []
+
+        # Several detectors may share a file, so all writers must be closed before the files
+        for writer in writers.values():
+            writer.close()
+
+    def _closeFiles(self, files, fileDests, filePaths):
+        if self.__memRecordingBytes > 0:
+            # The recordings are passed on as finished files, so release their reservation first
+            self.__memRecordingBytes = 0
+            self.__recordingManager.sigMemoryRecordingBytesUpdated.emit(0)
+
+        for detectorName, file in files.items():
+            if not isinstance(file, h5py.File):
+                continue  # The writers close the files they create
+
+            # Handle memory recordings
+            if self.saveMode == SaveMode.RAM or self.saveMode == SaveMode.DiskAndRAM:
+                filePath = filePaths[detectorName]
+                name = os.path.basename(filePath)
+                if self.saveMode == SaveMode.RAM:
+                    file.close()
+                    self.__recordingManager.sigMemoryRecordingAvailable.emit(
+                        name, fileDests[detectorName], filePath, False
+                    )
+                else:
+                    file.flush()
+                    self.__recordingManager.sigMemoryRecordingAvailable.emit(
+                        name, file, filePath, True
+                    )
+            else:
+                file.close()
+
+    def _getFiles(self, savename):
         singleMultiDetectorFile = self.singleMultiDetectorFile
         singleLapseFile = self.recMode == RecMode.ScanLapse and self.singleLapseFile
 
         files = {}
         fileDests = {}
         filePaths = {}
+        fileExtension = {SaveFormat.HDF5: 'hdf5', SaveFormat.TIFF: 'tif',
+                         SaveFormat.Zarr: 'zarr', SaveFormat.Raw: 'raw'}[self.saveFormat]
         for detectorName in self.detectorNames:
             if singleMultiDetectorFile:
-                baseFilePath = f'{self.savename}.hdf5'
+                baseFilePath = f'{savename}.{fileExtension}'
             else:
-                baseFilePath = f'{self.savename}_{detectorName}.hdf5'
+                baseFilePath = f'{savename}_{detectorName}.{fileExtension}'
 
             filePaths[detectorName] = self.__recordingManager.getSaveFilePath(
                 baseFilePath,
@@ -356,16 +803,250 @@ class RecordingWorker(Worker):
 
             if singleMultiDetectorFile and len(files) > 0:
                 files[detectorName] = list(files.values())[0]
+            elif (self.saveFormat != SaveFormat.HDF5 or
+                  self.__recordingManager._rollsOver(self.saveFormat, self.saveMode)):
+                files[detectorName] = fileDests[detectorName]  # The writers create the files
             else:
                 files[detectorName] = h5py.File(fileDests[detectorName],
                                                 'a' if singleLapseFile else 'w-')
 
         return files, fileDests, filePaths
 
+    def _datasetExists(self, file, datasetName):
+        if self.saveFormat == SaveFormat.Zarr:
+            return os.path.exists(os.path.join(file, datasetName))
+        return datasetName in file
+
+    def _bufferUntilTriggered(self):
+        """ Keeps the most recent frames of each detector in a circular buffer
+        until the recording is triggered. Returns the buffered frames and
+        their metadata per detector, or None if the recording was ended
+        before it was triggered. """
+
+        # The buffers are allocated once; after that, frames are only copied into them
+        measuredFrames = {}
+        if self.preTriggerTime is not None:
+            measuredFrames = self._measureFrameIntervals()
+        buffers = {}
+        for detectorName in self.detectorNames:
+            frameInterval, frames, metadata = measuredFrames.get(detectorName, (None, None, None))
+            buffers[detectorName] = FrameBuffer(
+                capacity=self._getPreTriggerCapacity(detectorName, frameInterval)
+            )
+            buffers[detectorName].push(frames, metadata)
+
+        while True:
+            triggered = self.__recordingManager.triggered
+            for detectorName in self.detectorNames:
+                buffers[detectorName].push(*self._getNewFrames(detectorName))
+
+            if triggered:
+                break  # Pulled the frames up to the trigger one final time
+            if not self.__recordingManager.record:
+                return None
+
+            time.sleep(0.0001)
+
+        bufferedFrames = {}
+        for detectorName, buffer in buffers.items():
+            frames, metadata = buffer.createReader(fromStart=True).read(withMetadata=True)
+            if self.preTriggerTime is not None and len(metadata) > 0:
+                cutoff = metadata['timestamp'][-1] - self.preTriggerTime
+                numTooOld = np.count_nonzero(metadata['timestamp'] < cutoff)
+                if numTooOld < 1 and buffer.writeCount > buffer.capacity:
+                    self.__logger.warning(
+                        f'The pre-trigger buffer of detector "{detectorName}" only held'
+                        f' {metadata["timestamp"][-1] - metadata["timestamp"][0]:.2f} s of'
+                        f' frames; increase preTriggerBufferBytes to keep more'
+                    )
+                frames, metadata = frames[numTooOld:], metadata[numTooOld:]
+            bufferedFrames[detectorName] = frames, metadata
+        return bufferedFrames
+
+    def _measureFrameIntervals(self):
+        """ Collects frames from each detector until enough have arrived to
+        tell its frame rate, or for at most _rateMeasurementTime seconds.
+        Returns a map from detector names to tuples (frameInterval, frames,
+        metadata) of the measured time between frames in seconds and copies
+        of the collected frames. If fewer than two frames arrived, the
+        interval is taken to be the time that was waited, which is an
+        underestimate. """
+        startTime = time.monotonic()
+        collected = {detectorName: ([], []) for detectorName in self.detectorNames}
+        while True:
+            for detectorName, (framesList, metadataList) in collected.items():
+                frames, metadata = self._getNewFrames(detectorName)
+                if len(frames) > 0:
+                    framesList.append(np.array(frames))
+                    metadataList.append(np.array(metadata))
+
+            elapsed = time.monotonic() - startTime
+            if (elapsed >= _rateMeasurementTime or
+                    all(sum(len(metadata) for metadata in metadataList) >= _rateMeasurementFrames
+                        for _, metadataList in collected.values())):
+                break
+            time.sleep(0.001)
+
+        measured = {}
+        for detectorName, (framesList, metadataList) in collected.items():
+            if not framesList:
+                measured[detectorName] = elapsed, None, None
+                continue
+
+            frames, metadata = np.concatenate(framesList), np.concatenate(metadataList)
+            timestamps = metadata['timestamp']
+            frameInterval = elapsed
+            if len(timestamps) > 1 and timestamps[-1] > timestamps[0]:
+                frameInterval = (timestamps[-1] - timestamps[0]) / (len(timestamps) - 1)
+            measured[detectorName] = frameInterval, frames, metadata
+        return measured
+
+    def _getPreTriggerCapacity(self, detectorName, frameInterval=None):
+        """ Returns the number of frames that the pre-trigger buffer of a
+        detector should hold. In preTriggerTime mode, that is the number of
+        frames that arrive in preTriggerTime at the time between frames
+        frameInterval, with a margin, but at most what fits in
+        preTriggerBufferBytes. """
+        if self.preTriggerFrames is not None:
+            return max(self.preTriggerFrames, 1)
+
+        detector = self.__recordingManager.detectorsManager[detectorName]
+        frameBytes = int(np.prod(detector.shape)) * np.dtype(detector.dtype).itemsize
+        maxFrames = max(self.__recordingManager.recordingInfo.preTriggerBufferBytes // frameBytes,
+                        1)
+        if frameInterval is None:
+            return maxFrames
+
+        numFrames = int(np.ceil(_preTriggerRateMargin * self.preTriggerTime /
+                                max(frameInterval, 1e-6))) + 1
+        if numFrames > maxFrames:
+            self.__logger.warning(
+                f'The pre-trigger buffer of detector "{detectorName}" can only hold'
+                f' {maxFrames} frames, about {maxFrames * frameInterval:.2f} s at the current'
+                f' frame rate, of the requested {self.preTriggerTime:.2f} s; increase'
+                f' preTriggerBufferBytes to keep more'
+            )
+            return maxFrames
+        return numFrames
+
     def _getNewFrames(self, detectorName):
-        newFrames = self.__recordingManager.detectorsManager[detectorName].getChunk()
-        newFrames = np.array(newFrames)
-        return newFrames
+        detector = self.__recordingManager.detectorsManager[detectorName]
+        frames, metadata = detector.getChunk(withMetadata=True)
+        if self.__statistics is not None:
+            self.__statistics.framesCollected(detectorName, len(frames),
+                                              len(frames) / detector.frameBuffer.capacity)
+            self._reportStatistics()  # Called on every pass of the loops, so reports are on time
+        return frames, metadata
+
+    def _getDroppedFrames(self, detectorName):
+        return (self.__recordingManager.detectorsManager[detectorName].droppedFrames -
+                self.__droppedFramesAtStart[detectorName] +
+                self.__writeQueues[detectorName].numDropped(detectorName))
+
+    def _getWriteQueues(self):
+        return list({id(writeQueue): writeQueue
+                     for writeQueue in self.__writeQueues.values()}.values())
+
+    def _enqueueFrames(self, detectorName, frames, metadata):
+        if self.saveMode == SaveMode.RAM and not self._reserveMemory(frames.nbytes):
+            return
+
+        self.__writeQueues[detectorName].put(detectorName, frames, metadata)
+        self._reportWriteQueue()
+
+    def _reserveMemory(self, numBytes):
+        """ Counts numBytes more frame data towards the recordings being
+        kept in memory. The total is reported along with the write queue, so
+        that finished memory recordings can be evicted to make room. Ends the recording and returns
+        False if the recordings in progress alone would exceed the memory
+        budget for memory recordings. """
+        memoryBudget = self.__recordingManager.recordingInfo.memoryRecordingsBytes
+        if memoryBudget is not None and self.__memRecordingBytes + numBytes > memoryBudget:
+            if self.__recordingManager.record:
+                self.__logger.error(
+                    f'Stopped the recording, as it would no longer fit in the memory budget for'
+                    f' recordings kept in memory ({memoryBudget / 1024 ** 2:.1f} MiB, set by'
+                    f' memoryRecordingsBytes); save longer recordings to disk'
+                )
+                self.__recordingManager.endRecording(wait=False)
+            return False
+
+        self.__memRecordingBytes += numBytes
+        return True
+
+    def _reportWriteQueue(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.__lastQueueReportTime < _writeQueueReportInterval:
+            return
+
+        self.__lastQueueReportTime = now
+        writeQueues = self._getWriteQueues()
+        self.__recordingManager.sigRecordingWriteQueueUpdated.emit(
+            sum(writeQueue.numFrames for writeQueue in writeQueues),
+            sum(writeQueue.numBytes for writeQueue in writeQueues),
+            sum(writeQueue.highWaterMark for writeQueue in writeQueues)
+        )
+        if self.saveMode == SaveMode.RAM:
+            self.__recordingManager.sigMemoryRecordingBytesUpdated.emit(self.__memRecordingBytes)
+
+    def _reportStatistics(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.__lastStatisticsReportTime < _statisticsReportInterval:
+            return
+
+        self.__lastStatisticsReportTime = now
+        statistics = self.__statistics.snapshot(
+            {detectorName: self._getDroppedFrames(detectorName)
+             for detectorName in self.detectorNames},
+            self._getWriteQueues()
+        )
+        self.__recordingManager._statistics = statistics
+        self.__recordingManager.sigRecordingStatisticsUpdated.emit(statistics)
+
+    def _reportProgress(self, signal, value):
+        now = time.monotonic()
+        if now - self.__lastProgressReportTime < _progressReportInterval:
+            return
+
+        self.__lastProgressReportTime = now
+        signal.emit(value)
+
+
+class RecordingWriterWorker(Worker):
+    """ Writes the frames in a recording's write queue to the recording's
+    writers, until the queue is closed and empty. """
+
+    def __init__(self):
+        super().__init__()
+        self.__logger = initLogger(self)
+        self.writeQueue = None
+        self.writers = None
+        self.statistics = None
+
+    def run(self):
+        try:
+            while True:
+                item = self.writeQueue.get()
+                if item is None:
+                    break
+
+                detectorName, frames, metadata = item
+                startTime = time.perf_counter()
+                self.writers[detectorName].write(frames, metadata)
+                self.statistics.chunkWritten(detectorName, len(frames), frames.nbytes,
+                                             time.perf_counter() - startTime)
+        except Exception as e:
+            self.__logger.error(f'Failed to write recorded frames: {e}')
+            self.writeQueue.abort(e)
+
+
+_writeQueueReportInterval = 0.25  # Seconds between sigRecordingWriteQueueUpdated emissions
+_statisticsReportInterval = 1.0  # Seconds between sigRecordingStatisticsUpdated emissions
+_progressReportInterval = 0.1  # Minimum seconds between frame number and time updates
+_lapseSpinTime = 0.002  # Seconds before a lapse's scheduled start to stop sleeping
+_rateMeasurementTime = 1  # Maximum seconds to measure frame rates for the pre-trigger buffers
+_rateMeasurementFrames = 10  # Number of frames to measure frame rates from
+_preTriggerRateMargin = 1.25  # Pre-trigger buffers hold this much more than the time span
 
 
 class RecMode(enum.Enum):
@@ -374,6 +1055,7 @@ class RecMode(enum.Enum):
     ScanOnce = 3
     ScanLapse = 4
     UntilStop = 5
+    PreTrigger = 6
 
 
 class SaveMode(enum.Enum):
@@ -385,6 +1067,8 @@ class SaveMode(enum.Enum):
 class SaveFormat(enum.Enum):
     HDF5 = 1
     TIFF = 2
+    Zarr = 3
+    Raw = 4
 
 
 # Copyright (C) 2020-2021 ImSwitch developers
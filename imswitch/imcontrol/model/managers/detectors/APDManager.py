@@ -28,7 +28,7 @@ class APDManager(DetectorManager):
         # self.__pixelsizey = 1
         self.setPixelSize(1, 1)
         fullShape = (100, 100)
-        self._image = np.random.rand(fullShape[0], fullShape[1]) * 100
+        self._image = np.random.rand(fullShape[0], fullShape[1]).astype(np.float32) * 100
 
         # self._nidaq_clock_source = r'20MHzTimebase'
         # self._detection_samplerate = float(20e6)  # detection sampling rate for the Nidaq, in Hz
@@ -62,7 +62,8 @@ class APDManager(DetectorManager):
         self._nidaqManager.sigScanStarted.connect(self.startScan)
         self.__shape = fullShape
         super().__init__(detectorInfo, name, fullShape=fullShape, supportedBinnings=[1],
-                         model=model, parameters=parameters, croppable=False)
+                         model=model, parameters=parameters, croppable=False,
+                         dtype=np.float32)
 
     def __del__(self):
         if self._scanThread is not None:
@@ -113,7 +114,7 @@ class APDManager(DetectorManager):
 
     def initiateImage(self, lines, pixels_line):
         if np.shape(self._image) != (lines, pixels_line):
-            self._image = np.zeros((lines, pixels_line))
+            self._image = np.zeros((lines, pixels_line), dtype=np.float32)
             self.setShape(lines, pixels_line)
 
     def setParameter(self, name, value):
@@ -125,11 +126,11 @@ class APDManager(DetectorManager):
     def setBinning(self, binning):
         super().setBinning(binning)
 
-    def getChunk(self):
+    def grabChunk(self):
         pass
 
     def flushBuffers(self):
-        pass
+        super().flushBuffers()
 
     @property
     def shape(self):
@@ -139,7 +140,7 @@ class APDManager(DetectorManager):
         self.__shape = (xsize, ysize)
 
     @property
-    def pixelSizeUm(self):
+    def sensorPixelSizeUm(self):
         return [1, self.__pixelsize_ax2, self.__pixelsize_ax1]
 
     def setPixelSize(self, pixelsize_ax1, pixelsize_ax2):
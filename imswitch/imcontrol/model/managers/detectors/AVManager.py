@@ -92,11 +92,11 @@ class AVManager(DetectorManager):
     def setBinning(self, binning):
         super().setBinning(binning) 
         
-    def getChunk(self):        
+    def grabChunk(self):        
         return np.expand_dims(self._camera.getLastChunk(),0)
 
     def flushBuffers(self):
-        pass
+        super().flushBuffers()
 
     def startAcquisition(self):
         if not self._running:
@@ -121,7 +121,7 @@ class AVManager(DetectorManager):
         self._camera.close()
 
     @property
-    def pixelSizeUm(self):
+    def sensorPixelSizeUm(self):
         return [1, 1, 1]
 
     def crop(self, hpos, vpos, hsize, vsize):
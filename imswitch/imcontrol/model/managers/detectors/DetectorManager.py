@@ -1,3 +1,4 @@
+import time
 import traceback
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
@@ -5,8 +6,9 @@ from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 
-from imswitch.imcommon.framework import Signal, SignalInterface
+from imswitch.imcommon.framework import Mutex, Signal, SignalInterface
 from imswitch.imcommon.model import initLogger
+from .FrameBuffer import FrameBuffer, frameMetadataDtype
 
 
 @dataclass
@@ -64,24 +66,33 @@ class DetectorManager(SignalInterface):
     detector corresponds to a manager derived from this class. """
 
     sigImageUpdated = Signal(np.ndarray, bool)
+    sigNewFrames = Signal(int)  # (numFrames)
 
     @abstractmethod
     def __init__(self, detectorInfo, name: str, fullShape: Tuple[int, int],
                  supportedBinnings: List[int], model: str, *,
                  parameters: Optional[Dict[str, DetectorParameter]] = None,
                  actions: Optional[Dict[str, DetectorAction]] = None,
-                 croppable: bool = True) -> None:
+                 croppable: bool = True,
+                 softwareBinnings: Optional[List[int]] = None,
+                 dtype: Optional[np.dtype] = None) -> None:
         """
         Args:
             detectorInfo: See setup file documentation.
             name: The unique name that the device is identified with in the
               setup file.
             fullShape: Maximum image size as a tuple ``(width, height)``.
-            supportedBinnings: Supported binnings as a list.
+            supportedBinnings: Binnings supported by the detector hardware, as
+              a list.
             model: Detector device model name.
             parameters: Parameters to make available to the user to view/edit.
             actions: Actions to make available to the user to execute.
             croppable: Whether the detector image can be cropped.
+            softwareBinnings: Binnings to offer in addition to
+              supportedBinnings, which are then done in software. None (the
+              default) means no software binning.
+            dtype: The data type of the frames that the detector produces. If
+              None, it is determined from the captured frames.
         """
 
         super().__init__()
@@ -99,8 +110,24 @@ class DetectorManager(SignalInterface):
         self.__croppable = croppable
 
         self.__fullShape = fullShape
-        self.__supportedBinnings = supportedBinnings
+        self.__hardwareBinnings = supportedBinnings
+        self.__supportedBinnings = sorted(set(supportedBinnings).union(
+            softwareBinnings if softwareBinnings is not None else []
+        ))
+        self.__softwareBinning = 1
+        self.__softwareBinningMode = detectorInfo.softwareBinningMode
+        if self.__softwareBinningMode not in ['mean', 'sum']:
+            raise ValueError(f'Invalid software binning mode "{self.__softwareBinningMode}"')
         self.__image = np.array([])
+        self.__dtype = np.dtype(dtype) if dtype is not None else None
+
+        self.__frameBuffer = FrameBuffer(detectorInfo.frameBufferSize)
+        self.__chunkReader = self.__frameBuffer.createReader()
+        self.__grabMutex = Mutex()
+        self.__lastFrameNumber = None
+        self.__numFramesReceived = 0
+        self.__lostFrames = 0
+        self.__duplicateFrames = 0
 
         self.__forAcquisition = detectorInfo.forAcquisition
         self.__forFocusLock = detectorInfo.forFocusLock
@@ -111,13 +138,18 @@ class DetectorManager(SignalInterface):
         self.setBinning(supportedBinnings[0])
 
     def updateLatestFrame(self, init):
-        """ :meta private: """
+        """ Returns whether a new frame was emitted.
+
+        :meta private:
+        """
         try:
-            self.__image = self.getLatestFrame()
+            self.__image = self.binFrames(self.getLatestFrame())
         except Exception:
             self.__logger.error(traceback.format_exc())
+            return False
         else:
             self.sigImageUpdated.emit(self.__image, init)
+            return True
 
     def setParameter(self, name: str, value: Any) -> Dict[str, DetectorParameter]:
         """ Sets a parameter value and returns the updated list of parameters.
@@ -138,6 +170,47 @@ class DetectorManager(SignalInterface):
             raise ValueError(f'Specified binning value "{binning}" not supported by the detector')
 
         self._binning = binning
+        self.__softwareBinning = binning if binning not in self.__hardwareBinnings else 1
+
+    def binFrames(self, frames: np.ndarray) -> np.ndarray:
+        """ Applies the current software binning to a frame of shape
+        (height, width), or to frames of shape (numFrames, height, width), and
+        returns the result in the same dtype. Rows and columns that don't fill
+        a whole bin are discarded. Returns the frames unchanged if no software
+        binning is used. Frames returned by getChunk and emitted for display
+        have already been binned, but getLatestFrame returns frames as read
+        out by the detector, so code that calls it directly must pass its
+        result through this to get frames matching shape and pixelSizeUm. """
+
+        binning = self.__softwareBinning
+        if binning == 1 or frames is None or np.ndim(frames) < 2:
+            return frames
+
+        frames = np.asarray(frames)
+        height, width = frames.shape[-2] // binning, frames.shape[-1] // binning
+        binned = frames[..., :height * binning, :width * binning].reshape(
+            *frames.shape[:-2], height, binning, width, binning
+        )
+
+        dtype = frames.dtype
+        if dtype.kind == 'f':
+            accumulatorDtype = dtype
+        elif dtype.kind == 'u':
+            accumulatorDtype = np.uint64 if dtype.itemsize > 2 else np.uint32
+        else:
+            accumulatorDtype = np.int64 if dtype.itemsize > 2 else np.int32
+
+        # Summing the contiguous axis first is considerably faster than summing both at once
+        binned = binned.sum(axis=-1, dtype=accumulatorDtype).sum(axis=-2)
+        if self.__softwareBinningMode == 'mean':
+            if dtype.kind == 'f':
+                binned /= binning ** 2
+            else:
+                binned //= binning ** 2
+        elif dtype.kind != 'f':
+            # Saturate rather than overflow
+            np.minimum(binned, np.iinfo(dtype).max, out=binned)
+        return binned.astype(dtype, copy=False)
 
     @property
     def name(self) -> str:
@@ -156,9 +229,16 @@ class DetectorManager(SignalInterface):
 
     @property
     def supportedBinnings(self) -> List[int]:
-        """ Supported binnings as a list. """
+        """ Supported binnings as a list, including the ones that are done in
+        software. """
         return self.__supportedBinnings
 
+    @property
+    def softwareBinning(self) -> int:
+        """ The binning factor currently applied in software (1 if the binning
+        is done by the detector hardware or no binning is used). """
+        return self.__softwareBinning
+
     @property
     def frameStart(self) -> Tuple[int, int]:
         """ Position of the top left corner of the current frame as a tuple
@@ -167,19 +247,61 @@ class DetectorManager(SignalInterface):
 
     @property
     def shape(self) -> Tuple[int, int]:
-        """ Current image size as a tuple ``(width, height)``. """
-        return self._shape
+        """ Current image size as a tuple ``(width, height)``, after software
+        binning. """
+        return self._shape[0] // self.__softwareBinning, self._shape[1] // self.__softwareBinning
 
     @property
     def fullShape(self) -> Tuple[int, int]:
         """ Maximum image size as a tuple ``(width, height)``. """
         return self.__fullShape
 
+    @property
+    def dtype(self) -> np.dtype:
+        """ The data type of the frames that the detector produces. Frames are
+        kept in this type all the way to display and recording. If the
+        detector manager doesn't declare it, it is taken from the captured
+        frames, defaulting to uint16 if no frames have been captured yet. """
+        if self.__dtype is not None:
+            return self.__dtype
+        elif self.__frameBuffer.dtype is not None:
+            return self.__frameBuffer.dtype
+        elif self.__image.size > 0:
+            return self.__image.dtype
+        else:
+            return np.dtype(np.uint16)
+
     @property
     def image(self) -> np.ndarray:
         """ Latest LiveView image. """
         return self.__image
 
+    @property
+    def frameBuffer(self) -> FrameBuffer:
+        """ The ring buffer that frames captured by the detector are stored
+        in. Consumers that need their own read position can create a reader
+        with ``frameBuffer.createReader()``. """
+        return self.__frameBuffer
+
+    @property
+    def droppedFrames(self) -> int:
+        """ The total number of frames that were lost, either by the detector
+        (detected through gaps in the frame numbers) or because they were
+        overwritten in the frame buffer before getChunk returned them. """
+        return self.__lostFrames + self.__chunkReader.droppedFrames
+
+    @property
+    def duplicateFrames(self) -> int:
+        """ The number of frames that were received more than once from the
+        detector and therefore discarded. """
+        return self.__duplicateFrames
+
+    @property
+    def latestFrameMetadata(self) -> Optional[np.void]:
+        """ Metadata record (of type frameMetadataDtype) of the latest frame
+        in the frame buffer, or None if there is no such frame. """
+        return self.__frameBuffer.latestMetadata()
+
     @property
     def parameters(self) -> Dict[str, DetectorParameter]:
         """ Dictionary of available parameters. """
@@ -206,10 +328,17 @@ class DetectorManager(SignalInterface):
         return self.__forFocusLock
 
     @property
-    @abstractmethod
     def pixelSizeUm(self) -> List[int]:
-        """ The pixel size in micrometers, in the format ``[z, y, x]``. ``z``
-        is typically set to 1. """
+        """ The pixel size in micrometers, in the format ``[z, y, x]``, after
+        software binning. ``z`` is typically set to 1. """
+        z, y, x = self.sensorPixelSizeUm
+        return [z, y * self.__softwareBinning, x * self.__softwareBinning]
+
+    @property
+    @abstractmethod
+    def sensorPixelSizeUm(self) -> List[int]:
+        """ The pixel size in micrometers of the frames read out by the
+        detector, in the format ``[z, y, x]``. ``z`` is typically set to 1. """
         pass
 
     @abstractmethod
@@ -221,22 +350,161 @@ class DetectorManager(SignalInterface):
     def getLatestFrame(self) -> np.ndarray:
         """ Returns the frame that represents what the detector currently is
         capturing. The returned object is a numpy array of shape
-        (height, width). """
+        (height, width), before software binning; see binFrames. """
         pass
 
-    @abstractmethod
-    def getChunk(self) -> np.ndarray:
+    def getChunk(self, withMetadata: bool = False):
         """ Returns the frames captured by the detector since getChunk was last
         called, or since the buffers were last flushed (whichever happened
         last). The returned object is a numpy array of shape
-        (numFrames, height, width). """
+        (numFrames, height, width). It is a view into the detector's frame
+        buffer, so it should be consumed (or copied) before the frame buffer
+        has been refilled. If withMetadata is True, a tuple
+        ``(frames, metadata)`` is returned, where metadata is an array of type
+        frameMetadataDtype with one record per frame. """
+        self.pullFrames()
+        return self.__chunkReader.read(withMetadata=withMetadata)
+
+    def waitForFrames(self, minWriteCount: int, timeout: float) -> bool:
+        """ Blocks until the frame buffer has received at least minWriteCount
+        frames in total (see FrameBuffer.writeCount), pulling new frames from
+        the detector while waiting, or until timeout seconds have passed.
+        Returns whether the frames arrived. Detectors that don't provide
+        frames through grabChunk are considered to have them right away.
+
+        :meta private:
+        """
+        deadline = time.monotonic() + timeout
+        while self.__frameBuffer.writeCount < minWriteCount:
+            if self.pullFrames() is None:
+                return True
+            if self.__frameBuffer.writeCount >= minWriteCount:
+                break
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(_framePollInterval)
+        return True
+
+    def pullFrames(self) -> Optional[int]:
+        """ Moves newly captured frames from the detector into the frame
+        buffer and returns the number of frames moved, or None if the detector
+        doesn't provide frames through grabChunk. sigNewFrames is emitted, on
+        the calling thread, if any frames were moved. This is the frame
+        arrival event that live view and other consumers react to, whichever
+        consumer's read caused the frames to be pulled. Detector managers
+        whose device reports new frames through a callback may call this from
+        the callback.
+
+        :meta private:
+        """
+        self.__grabMutex.lock()
+        try:
+            numNewFrames = self._pullFramesLocked()
+        finally:
+            self.__grabMutex.unlock()
+
+        if numNewFrames:
+            self.sigNewFrames.emit(numNewFrames)
+        return numNewFrames
+
+    def _pullFramesLocked(self) -> Optional[int]:
+        newFrames, metadata = self.grabChunkWithMetadata()
+        if newFrames is None:
+            return None
+
+        if isinstance(newFrames, np.ndarray) and newFrames.ndim == 2:
+            newFrames = newFrames[np.newaxis]
+        if len(newFrames) < 1:
+            return 0
+
+        if self.__softwareBinning > 1:
+            if not isinstance(newFrames, np.ndarray):
+                newFrames = np.asarray(newFrames)
+            newFrames = self.binFrames(newFrames)
+
+        metadata = self._makeFrameMetadata(len(newFrames), metadata)
+        keep = self._checkFrameNumbers(metadata['frameNumber'])
+        if keep is not None:
+            if isinstance(newFrames, np.ndarray):
+                newFrames = newFrames[keep]
+            else:
+                newFrames = [frame for frame, k in zip(newFrames, keep) if k]
+            metadata = metadata[keep]
+
+        return self.__frameBuffer.push(newFrames, metadata)
+
+    def _makeFrameMetadata(self, numFrames: int,
+                           metadata: Optional[Dict[str, Any]]) -> np.ndarray:
+        """ Builds the metadata records for numFrames new frames from what the
+        detector provided, filling in the host time as timestamp and a running
+        count as frame number where the detector doesn't provide them. """
+        records = np.empty(numFrames, dtype=frameMetadataDtype)
+        metadata = metadata if metadata is not None else {}
+
+        records['timestamp'] = metadata.get('timestamp', time.time())
+        if 'frameNumber' in metadata:
+            records['frameNumber'] = metadata['frameNumber']
+        else:
+            records['frameNumber'] = np.arange(
+                self.__numFramesReceived, self.__numFramesReceived + numFrames
+            )
+        records['exposure'] = metadata.get('exposure', np.nan)
+
+        self.__numFramesReceived += numFrames
+        return records
+
+    def _checkFrameNumbers(self, frameNumbers: np.ndarray) -> Optional[np.ndarray]:
+        """ Updates the lost and duplicate frame counters from gaps and repeats
+        in the frame numbers. Returns a boolean mask of the frames to keep, or
+        None if all frames should be kept. A decreasing frame number is taken
+        to mean that the detector's counter was restarted. """
+        previous = np.empty(len(frameNumbers), dtype=frameNumbers.dtype)
+        previous[1:] = frameNumbers[:-1]
+        previous[0] = (self.__lastFrameNumber if self.__lastFrameNumber is not None
+                       else frameNumbers[0] - 1)
+        self.__lastFrameNumber = int(frameNumbers[-1])
+
+        steps = frameNumbers - previous
+        gaps = steps[steps > 1]
+        if len(gaps) > 0:
+            numLost = int(np.sum(gaps - 1))
+            self.__lostFrames += numLost
+            self.__logger.warning(f'{numLost} frame(s) lost by the detector')
+
+        duplicates = steps == 0
+        if not np.any(duplicates):
+            return None
+
+        self.__duplicateFrames += int(np.count_nonzero(duplicates))
+        return ~duplicates
+
+    def grabChunkWithMetadata(self) -> Tuple[np.ndarray, Optional[Dict[str, Any]]]:
+        """ Like grabChunk, but returns a tuple ``(frames, metadata)``, where
+        metadata is None or a dict that may contain the keys ``timestamp``
+        (s), ``frameNumber`` and ``exposure`` (s), each mapped to a scalar or
+        an array with one value per frame. Detectors that can report such
+        information should override this; the default implementation calls
+        grabChunk and returns no metadata. """
+        return self.grabChunk(), None
+
+    @abstractmethod
+    def grabChunk(self) -> np.ndarray:
+        """ Returns the frames captured by the detector since grabChunk was
+        last called, or since the buffers were last flushed (whichever
+        happened last). The returned object is a numpy array of shape
+        (numFrames, height, width), or a list of numpy arrays of shape
+        (height, width). This is called by the base class to fill the frame
+        buffer; other code should call getChunk instead. """
         pass
 
     @abstractmethod
     def flushBuffers(self) -> None:
         """ Flushes the detector buffers so that getChunk starts at the last
-        frame captured at the time that this function was called. """
-        pass
+        frame captured at the time that this function was called. Derived
+        classes must call ``super().flushBuffers()`` after flushing their
+        internal buffers. """
+        self.__chunkReader.skip()
+        self.__lastFrameNumber = None  # Frames discarded by flushing don't count as lost
 
     @abstractmethod
     def startAcquisition(self) -> None:
@@ -253,6 +521,9 @@ class DetectorManager(SignalInterface):
         pass
 
 
+_framePollInterval = 0.002  # Seconds between polls for new frames while waiting for them
+
+
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
 #
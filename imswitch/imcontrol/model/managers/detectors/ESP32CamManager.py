@@ -59,7 +59,8 @@ class ESP32CamManager(DetectorManager):
         }
 
         super().__init__(detectorInfo, name, fullShape=fullShape, supportedBinnings=[1],
-                         model=model, parameters=parameters, actions=actions, croppable=True)
+                         model=model, parameters=parameters, actions=actions, croppable=True,
+                         softwareBinnings=[2, 4])
 
     def getLatestFrame(self, is_save=False):
         if is_save:
@@ -97,11 +98,11 @@ class ESP32CamManager(DetectorManager):
         super().setBinning(binning) 
         
 
-    def getChunk(self):
+    def grabChunk(self):
         return self._camera.getLastChunk()
 
     def flushBuffers(self):
-        pass
+        super().flushBuffers()
 
     def startAcquisition(self):
         if not self._running:
@@ -126,7 +127,7 @@ class ESP32CamManager(DetectorManager):
         self._camera.close()
 
     @property
-    def pixelSizeUm(self):
+    def sensorPixelSizeUm(self):
         return [1, 1, 1]
 
     def crop(self, hpos, vpos, hsize, vsize):
@@ -0,0 +1,195 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+
+
+@dataclass
+class FrameBundle:
+    """ A set of frames, one per detector, that were captured at the same
+    time. """
+
+    frames: Dict[str, np.ndarray]
+    """ The frames, as a map from detector names to views into the detectors'
+    frame buffers. """
+
+    metadata: Dict[str, np.void]
+    """ The metadata records (of type frameMetadataDtype) of the frames, as a
+    map from detector names. """
+
+    @property
+    def timestamp(self) -> float:
+        """ The earliest timestamp of the frames in the bundle. """
+        return min(record['timestamp'] for record in self.metadata.values())
+
+
+class FrameAggregator:
+    """ Groups frames from several detectors into bundles of frames that were
+    captured at the same time. Frames are matched either by their timestamps
+    or by their trigger indices (the detectors' frame numbers, counted from the
+    first frame each detector delivers to the aggregator).
+
+    Only complete bundles are returned. Frames that have no counterpart from
+    one of the other detectors are discarded and counted as stragglers. The
+    frames in the bundles are views into the detectors' frame buffers, so no
+    frame data is copied, and the same caveat as for
+    DetectorManager.getChunk applies: they must be consumed before the frame
+    buffers are refilled.
+
+    Unmatched frames are held as positions in the frame buffers rather than
+    as views, and their data is only looked up when their bundle is
+    complete. A frame that the detector has overwritten by then, because its
+    counterparts arrived more than a frame buffer's worth of frames later,
+    is discarded and counted in numOverwritten, instead of ending up in a
+    bundle with the pixels of a newer frame.
+
+    Create instances through DetectorsManager.createFrameAggregator. """
+
+    def __init__(self, detectors, alignBy: str = 'timestamp', tolerance: float = 0.001,
+                 maxPending: int = 64) -> None:
+        """
+        Args:
+            detectors: The detector managers to aggregate frames from, as a
+              map from detector names.
+            alignBy: ``timestamp`` to match frames whose timestamps are within
+              tolerance of each other, or ``index`` to match frames with the
+              same trigger index.
+            tolerance: The maximum timestamp difference between the frames in
+              a bundle, in seconds. Only used when aligning by timestamp.
+            maxPending: The maximum number of unmatched frames to hold per
+              detector; if exceeded, the oldest frames are discarded as
+              stragglers. It is capped at the capacity of the detector's
+              frame buffer, since older frames have been overwritten.
+        """
+        if alignBy not in ['timestamp', 'index']:
+            raise ValueError(f'Invalid alignment "{alignBy}"; must be "timestamp" or "index"')
+        if len(detectors) < 1:
+            raise ValueError('At least one detector must be specified')
+
+        self._detectors = dict(detectors)
+        self._alignByIndex = alignBy == 'index'
+        self._tolerance = 0 if self._alignByIndex else tolerance
+        self._maxPending = maxPending
+
+        self._readers = {name: detector.frameBuffer.createReader()
+                         for name, detector in self._detectors.items()}
+        self._pending = {name: deque() for name in self._detectors.keys()}
+        self._firstFrameNumbers = {name: None for name in self._detectors.keys()}
+        self._numStragglers = {name: 0 for name in self._detectors.keys()}
+        self._numOverwritten = {name: 0 for name in self._detectors.keys()}
+        self._numBundles = 0
+
+    @property
+    def detectorNames(self) -> List[str]:
+        """ The names of the detectors that frames are aggregated from. """
+        return list(self._detectors.keys())
+
+    @property
+    def numBundles(self) -> int:
+        """ The number of bundles that have been returned. """
+        return self._numBundles
+
+    @property
+    def numStragglers(self) -> Dict[str, int]:
+        """ The number of frames per detector that were discarded because
+        they had no counterpart from the other detectors. """
+        return dict(self._numStragglers)
+
+    @property
+    def numOverwritten(self) -> Dict[str, int]:
+        """ The number of frames per detector that were discarded because
+        they had been overwritten in the detector's frame buffer before their
+        bundle was complete. The other frames of such bundles are counted as
+        stragglers. """
+        return dict(self._numOverwritten)
+
+    def poll(self) -> List[FrameBundle]:
+        """ Collects the frames that the detectors have captured since the
+        last call and returns the bundles that could be completed, oldest
+        first. """
+
+        self._collectFrames()
+
+        bundles = []
+        while all(self._pending.values()):
+            heads = {name: pending[0] for name, pending in self._pending.items()}
+            latestKey = max(head[0] for head in heads.values())
+
+            stragglerNames = [name for name, head in heads.items()
+                              if head[0] < latestKey - self._tolerance]
+            if stragglerNames:
+                # These frames are too old to be matched with the latest head, and frames that
+                # arrive later will be even newer, so they will never be part of a bundle
+                for name in stragglerNames:
+                    self._pending[name].popleft()
+                    self._numStragglers[name] += 1
+                continue
+
+            for pending in self._pending.values():
+                pending.popleft()
+
+            frames = {name: self._detectors[name].frameBuffer.frameAt(head[1])
+                      for name, head in heads.items()}
+            overwrittenNames = [name for name, frame in frames.items() if frame is None]
+            if overwrittenNames:
+                for name in frames.keys():
+                    if name in overwrittenNames:
+                        self._numOverwritten[name] += 1
+                    else:
+                        self._numStragglers[name] += 1
+                continue
+
+            bundles.append(FrameBundle(
+                frames=frames,
+                metadata={name: head[2] for name, head in heads.items()}
+            ))
+
+        self._numBundles += len(bundles)
+        return bundles
+
+    def reset(self) -> None:
+        """ Discards the unmatched frames and restarts the trigger index
+        count, e.g. after the detectors have been restarted. """
+        for name in self._detectors.keys():
+            self._readers[name].skip()
+            self._pending[name].clear()
+            self._firstFrameNumbers[name] = None
+
+    def _collectFrames(self):
+        for name, detector in self._detectors.items():
+            detector.pullFrames()
+            firstIndex, metadata = self._readers[name].readMetadata()
+            pending = self._pending[name]
+            for index, record in enumerate(metadata, firstIndex):
+                pending.append((self._getKey(name, record), index, record))
+
+            numExcess = len(pending) - min(self._maxPending, detector.frameBuffer.capacity)
+            for _ in range(max(numExcess, 0)):
+                pending.popleft()
+                self._numStragglers[name] += 1
+
+    def _getKey(self, name, record):
+        if not self._alignByIndex:
+            return float(record['timestamp'])
+
+        if self._firstFrameNumbers[name] is None:
+            self._firstFrameNumbers[name] = int(record['frameNumber'])
+        return int(record['frameNumber']) - self._firstFrameNumbers[name]
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,309 @@
+import threading
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+
+frameMetadataDtype = np.dtype([
+    ('timestamp', 'f8'),  # Hardware timestamp, or host time when the frame was received (s)
+    ('frameNumber', 'i8'),  # Frame counter of the detector
+    ('exposure', 'f4')  # Exposure time (s), NaN if unknown
+])
+""" The dtype of the per-frame metadata records that are stored alongside
+the frames in a FrameBuffer. """
+
+
+class FrameBuffer:
+    """ Preallocated, fixed-capacity ring buffer of detector frames. Frames
+    are copied into the buffer once when they are pushed, after which all
+    readers get views into the same memory. Each reader keeps its own read
+    position, so that e.g. live view, recording and analysis can consume the
+    same frames independently.
+
+    Every frame has a metadata record of type frameMetadataDtype, which is
+    stored in a parallel ring and can be read together with the frames.
+
+    The buffer memory is allocated when the first frame is pushed, and is only
+    reallocated if the frame shape or dtype changes. """
+
+    def __init__(self, capacity: Optional[int] = None,
+                 maxBytes: int = 256 * 1024 ** 2) -> None:
+        """
+        Args:
+            capacity: The number of frames that the buffer holds. If None, it
+              is chosen when the buffer is allocated so that the buffer takes
+              up at most maxBytes (but holds at least two frames).
+            maxBytes: See capacity.
+        """
+        if capacity is not None and capacity < 1:
+            raise ValueError('Frame buffer capacity must be at least 1')
+
+        self._requestedCapacity = capacity
+        self._maxBytes = maxBytes
+        self._capacity = capacity if capacity is not None else 2
+        self._lock = threading.Lock()
+        self._frames = None
+        self._metadata = None
+        self._writeCount = 0  # Total number of frames pushed
+        self._startIndex = 0  # Index of the first frame with the current shape and dtype
+        self._overruns = 0
+
+    @property
+    def capacity(self) -> int:
+        """ The maximum number of frames that the buffer holds. """
+        return self._capacity
+
+    @property
+    def dtype(self) -> Optional[np.dtype]:
+        """ The data type of the frames in the buffer, or None if no frames
+        have been pushed. """
+        return self._frames.dtype if self._frames is not None else None
+
+    @property
+    def writeCount(self) -> int:
+        """ The total number of frames that have been pushed to the buffer. """
+        return self._writeCount
+
+    @property
+    def overruns(self) -> int:
+        """ The total number of frames that were overwritten before a reader
+        had read them. """
+        return self._overruns
+
+    def push(self, frames: Union[np.ndarray, Sequence[np.ndarray], None],
+             metadata: Optional[np.ndarray] = None) -> int:
+        """ Copies the given frames into the buffer and returns the number of
+        frames pushed. frames may be a numpy array of shape
+        (numFrames, height, width), a single frame of shape (height, width),
+        or a sequence of frames. metadata, if specified, must be an array of
+        type frameMetadataDtype with one record per frame. """
+
+        if frames is None:
+            return 0
+
+        if isinstance(frames, np.ndarray):
+            if frames.ndim == 2:
+                frames = frames[np.newaxis]
+            elif frames.ndim != 3:
+                raise ValueError(f'Frames must be 2D or 3D, got {frames.ndim} dimensions')
+
+            n = len(frames)
+            if n < 1:
+                return 0
+
+            if metadata is None:
+                metadata = _unknownMetadata(n)
+
+            with self._lock:
+                self._ensureAllocated(frames.shape[1:], frames.dtype)
+                self._writeBlock(frames, metadata)
+            return n
+
+        n = 0
+        with self._lock:
+            for frame in frames:
+                frame = np.asarray(frame)
+                self._ensureAllocated(frame.shape, frame.dtype)
+                index = self._writeCount % self._capacity
+                self._frames[index] = frame
+                self._metadata[index] = metadata[n] if metadata is not None else _unknownRecord
+                self._writeCount += 1
+                n += 1
+        return n
+
+    def latest(self) -> Optional[np.ndarray]:
+        """ Returns a view of the most recently pushed frame, or None if no
+        frames have been pushed. """
+        with self._lock:
+            if self._writeCount <= self._startIndex:
+                return None
+            return self._frames[(self._writeCount - 1) % self._capacity]
+
+    def frameAt(self, index: int) -> Optional[np.ndarray]:
+        """ Returns a view of the frame with the specified index (frames are
+        numbered in the order they were pushed, starting from 0, as counted by
+        writeCount), or None if the frame has been overwritten or not pushed
+        yet. Like the frames returned by readers, the view is only valid until
+        the buffer has been refilled. """
+        with self._lock:
+            if index < self._oldestAvailable() or index >= self._writeCount:
+                return None
+            return self._frames[index % self._capacity]
+
+    def latestMetadata(self) -> Optional[np.void]:
+        """ Returns the metadata record of the most recently pushed frame, or
+        None if no frames have been pushed. """
+        with self._lock:
+            if self._writeCount <= self._startIndex:
+                return None
+            return self._metadata[(self._writeCount - 1) % self._capacity].copy()
+
+    def createReader(self, fromStart: bool = False) -> 'FrameBufferReader':
+        """ Creates a reader that will return frames pushed after this call.
+        If fromStart is True, the reader will also return the frames that are
+        currently held by the buffer. """
+        with self._lock:
+            if fromStart:
+                position = self._oldestAvailable()
+            else:
+                position = self._writeCount
+        return FrameBufferReader(self, position)
+
+    def _read(self, reader: 'FrameBufferReader', maxFrames: Optional[int] = None,
+              withMetadata: bool = False):
+        with self._lock:
+            if self._frames is None:
+                frames, metadata = np.empty((0, 0, 0)), _unknownMetadata(0)
+            else:
+                frames, metadata = self._readLocked(reader, maxFrames)
+
+        return (frames, metadata) if withMetadata else frames
+
+    def _readMetadata(self, reader: 'FrameBufferReader'):
+        with self._lock:
+            if self._frames is None:
+                return reader._position, _unknownMetadata(0)
+
+            self._catchUp(reader)
+            start = reader._position
+            indices = np.arange(start, self._writeCount) % self._capacity
+            reader._position = self._writeCount
+            return start, self._metadata[indices]
+
+    def _oldestAvailable(self):
+        return max(self._startIndex, self._writeCount - self._capacity)
+
+    def _catchUp(self, reader):
+        """ Moves the reader past frames that have been overwritten. """
+        oldestAvailable = self._oldestAvailable()
+        if reader._position < oldestAvailable:
+            if reader._position >= self._startIndex:
+                numLost = oldestAvailable - reader._position
+                reader._droppedFrames += numLost
+                self._overruns += numLost
+            reader._position = oldestAvailable
+
+    def _readLocked(self, reader, maxFrames):
+        self._catchUp(reader)
+
+        numFrames = self._writeCount - reader._position
+        if maxFrames is not None:
+            numFrames = min(numFrames, maxFrames)
+        if numFrames < 1:
+            return self._frames[:0], self._metadata[:0]
+
+        start = reader._position % self._capacity
+        end = start + numFrames
+        reader._position += numFrames
+        if end <= self._capacity:
+            return self._frames[start:end], self._metadata[start:end]
+        else:
+            # Wrapped around the end of the buffer; this is the only case where we copy
+            return (np.concatenate((self._frames[start:], self._frames[:end - self._capacity])),
+                    np.concatenate((self._metadata[start:],
+                                    self._metadata[:end - self._capacity])))
+
+    def _skip(self, reader: 'FrameBufferReader') -> None:
+        with self._lock:
+            reader._position = self._writeCount
+
+    def _ensureAllocated(self, shape, dtype) -> None:
+        if (self._frames is not None and self._frames.shape[1:] == tuple(shape) and
+                self._frames.dtype == dtype):
+            return
+
+        if self._requestedCapacity is None:
+            frameBytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            self._capacity = min(max(self._maxBytes // frameBytes, 2), 1024)
+
+        self._frames = np.empty((self._capacity, *shape), dtype=dtype)
+        self._metadata = _unknownMetadata(self._capacity)
+        self._startIndex = self._writeCount
+
+    def _writeBlock(self, frames: np.ndarray, metadata: np.ndarray) -> None:
+        n = len(frames)
+        if n > self._capacity:
+            # Only the last frames would survive anyway
+            self._writeCount += n - self._capacity
+            frames = frames[-self._capacity:]
+            metadata = metadata[-self._capacity:]
+            n = self._capacity
+
+        start = self._writeCount % self._capacity
+        numUntilEnd = min(n, self._capacity - start)
+        self._frames[start:start + numUntilEnd] = frames[:numUntilEnd]
+        self._metadata[start:start + numUntilEnd] = metadata[:numUntilEnd]
+        if numUntilEnd < n:
+            self._frames[:n - numUntilEnd] = frames[numUntilEnd:]
+            self._metadata[:n - numUntilEnd] = metadata[numUntilEnd:]
+        self._writeCount += n
+
+
+class FrameBufferReader:
+    """ A read position in a FrameBuffer. Created by
+    FrameBuffer.createReader. """
+
+    def __init__(self, frameBuffer: FrameBuffer, position: int) -> None:
+        self._frameBuffer = frameBuffer
+        self._position = position
+        self._droppedFrames = 0
+
+    @property
+    def droppedFrames(self) -> int:
+        """ The number of frames that were overwritten in the buffer before
+        this reader read them. """
+        return self._droppedFrames
+
+    @property
+    def numAvailable(self) -> int:
+        """ The number of frames that have been pushed since this reader last
+        read. """
+        return max(0, self._frameBuffer.writeCount - self._position)
+
+    def read(self, maxFrames: Optional[int] = None, withMetadata: bool = False):
+        """ Returns the frames pushed since the last read as a numpy array of
+        shape (numFrames, height, width). The array is a view into the buffer
+        memory (except when the frames wrap around the end of the buffer), so
+        it is only valid until the buffer has been refilled. If withMetadata is
+        True, a tuple ``(frames, metadata)`` is returned, where metadata is an
+        array of type frameMetadataDtype with one record per frame. """
+        return self._frameBuffer._read(self, maxFrames, withMetadata)
+
+    def readMetadata(self):
+        """ Like read with withMetadata set, but returns a tuple
+        ``(firstIndex, metadata)`` without the frames, where firstIndex is the
+        index of the first frame whose metadata is returned. The frames can
+        be fetched later with FrameBuffer.frameAt, as long as they have not
+        been overwritten. """
+        return self._frameBuffer._readMetadata(self)
+
+    def skip(self) -> None:
+        """ Moves the read position to the latest frame, so that the next read
+        only returns frames pushed after this call. """
+        self._frameBuffer._skip(self)
+
+
+def _unknownMetadata(numFrames):
+    metadata = np.empty(numFrames, dtype=frameMetadataDtype)
+    metadata[:] = _unknownRecord
+    return metadata
+
+
+_unknownRecord = np.array((np.nan, -1, np.nan), dtype=frameMetadataDtype)
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -55,7 +55,8 @@ class GXPIPYManager(DetectorManager):
         }
 
         super().__init__(detectorInfo, name, fullShape=fullShape, supportedBinnings=[1],
-                         model=model, parameters=parameters, actions=actions, croppable=True)
+                         model=model, parameters=parameters, actions=actions, croppable=True,
+                         softwareBinnings=[2, 4])
 
     def getLatestFrame(self, is_save=False):
         if is_save:
@@ -93,14 +94,14 @@ class GXPIPYManager(DetectorManager):
         super().setBinning(binning) 
         
 
-    def getChunk(self):
+    def grabChunk(self):
         try:
             return np.expand_dims(self._camera.getLastChunk(),0)
         except:
             return None
 
     def flushBuffers(self):
-        pass
+        super().flushBuffers()
 
     def startAcquisition(self):
         if not self._running:
@@ -125,7 +126,7 @@ class GXPIPYManager(DetectorManager):
         self._camera.close()
 
     @property
-    def pixelSizeUm(self):
+    def sensorPixelSizeUm(self):
         return [1, 1, 1]
 
     def crop(self, hpos, vpos, hsize, vsize):
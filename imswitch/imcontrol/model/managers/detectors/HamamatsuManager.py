@@ -1,3 +1,5 @@
+import numpy as np
+
 from imswitch.imcommon.model import initLogger
 from .DetectorManager import (
     DetectorManager, DetectorNumberParameter, DetectorListParameter
@@ -53,23 +55,33 @@ class HamamatsuManager(DetectorManager):
         }
 
         super().__init__(detectorInfo, name, fullShape=fullShape, supportedBinnings=[1, 2, 4],
-                         model=model, parameters=parameters, croppable=True)
+                         model=model, parameters=parameters, croppable=True,
+                         dtype=np.uint16)
         self._updatePropertiesFromCamera()
         super().setParameter('Set exposure time', self.parameters['Real exposure time'].value)
 
     @property
-    def pixelSizeUm(self):
+    def sensorPixelSizeUm(self):
         umxpx = self.parameters['Camera pixel size'].value
         return [1, umxpx, umxpx]
 
     def getLatestFrame(self):
         return self._camera.getLast()
 
-    def getChunk(self):
+    def grabChunk(self):
         return self._camera.getFrames()[0]
 
+    def grabChunkWithMetadata(self):
+        frames = self.grabChunk()
+        lastFrameNumber = self._camera.last_frame_number
+        return frames, {
+            'frameNumber': np.arange(lastFrameNumber - len(frames), lastFrameNumber),
+            'exposure': self.parameters['Real exposure time'].value
+        }
+
     def flushBuffers(self):
         self._camera.updateIndices()
+        super().flushBuffers()
 
     def crop(self, hpos, vpos, hsize, vsize):
         """Method to crop the frame read out by the camera. """
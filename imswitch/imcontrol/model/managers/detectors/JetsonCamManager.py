@@ -53,7 +53,8 @@ class JetsonCamManager(DetectorManager):
         }
 
         super().__init__(detectorInfo, name, fullShape=fullShape, supportedBinnings=[1],
-                         model=model, parameters=parameters, actions=actions, croppable=True)
+                         model=model, parameters=parameters, actions=actions, croppable=True,
+                         softwareBinnings=[2, 4])
 
     def getLatestFrame(self, is_save=False):
         if is_save:
@@ -90,11 +91,11 @@ class JetsonCamManager(DetectorManager):
     def setBinning(self, binning):
         super().setBinning(binning) 
         
-    def getChunk(self):        
+    def grabChunk(self):        
         return np.expand_dims(self._camera.getLastChunk(),0)
 
     def flushBuffers(self):
-        pass
+        super().flushBuffers()
 
     def startAcquisition(self):
         if not self._running:
@@ -119,7 +120,7 @@ class JetsonCamManager(DetectorManager):
         self._camera.close()
 
     @property
-    def pixelSizeUm(self):
+    def sensorPixelSizeUm(self):
         return [1, 1, 1]
 
     def crop(self, hpos, vpos, hsize, vsize):
@@ -50,12 +50,13 @@ class PhotometricsManager(DetectorManager):
         }
 
         super().__init__(detectorInfo, name, fullShape=fullShape, supportedBinnings=[1, 2, 4],
-                         model=model, parameters=parameters, croppable=True)
+                         model=model, parameters=parameters, croppable=True,
+                         dtype=np.uint16)
         self._updatePropertiesFromCamera()
         super().setParameter('Set exposure time', self.parameters['Real exposure time'].value)
 
     @property
-    def pixelSizeUm(self):
+    def sensorPixelSizeUm(self):
         umxpx = self.parameters['Camera pixel size'].value
         return [1, umxpx, umxpx]
 
@@ -69,20 +70,28 @@ class PhotometricsManager(DetectorManager):
         except RuntimeError:
             return self.image
 
-    def getChunk(self):
+    def grabChunk(self):
+        return self.grabChunkWithMetadata()[0]
+
+    def grabChunkWithMetadata(self):
         frames = []
+        frameNumbers = []
         status = self._camera.check_frame_status()
         try:
             if not status == "READOUT_NOT_ACTIVE":
                 while True:
-                    im = np.array(self._camera.poll_frame()[0]['pixel_data'])
-                    frames.append(im)
+                    frame, _, frameCount = self._camera.poll_frame()
+                    frames.append(frame['pixel_data'])
+                    frameNumbers.append(frameCount)
         except RuntimeError:
             pass
-        return frames
+        return frames, {
+            'frameNumber': np.array(frameNumbers, dtype=np.int64),
+            'exposure': self.parameters['Real exposure time'].value / 1000
+        }
 
     def flushBuffers(self):
-        pass
+        super().flushBuffers()
 
     def crop(self, hpos, vpos, hsize, vsize):
         """Method to crop the frame read out by the camera. """
@@ -56,7 +56,8 @@ class PiCamManager(DetectorManager):
         }
 
         super().__init__(detectorInfo, name, fullShape=fullShape, supportedBinnings=[1],
-                         model=model, parameters=parameters, actions=actions, croppable=True)
+                         model=model, parameters=parameters, actions=actions, croppable=True,
+                         softwareBinnings=[2, 4])
 
     def getLatestFrame(self, is_save=False):
         if is_save:
@@ -94,11 +95,11 @@ class PiCamManager(DetectorManager):
         super().setBinning(binning) 
         
 
-    def getChunk(self):
+    def grabChunk(self):
         return self._camera.getLastChunk()
 
     def flushBuffers(self):
-        pass
+        super().flushBuffers()
 
     def startAcquisition(self):
         if not self._running:
@@ -123,7 +124,7 @@ class PiCamManager(DetectorManager):
         self._camera.close()
 
     @property
-    def pixelSizeUm(self):
+    def sensorPixelSizeUm(self):
         return [1, 1, 1]
 
     def crop(self, hpos, vpos, hsize, vsize):
@@ -0,0 +1,309 @@
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .FrameBuffer import frameMetadataDtype
+
+
+_headerDtype = np.dtype([
+    ('magic', 'u4'),
+    ('version', 'u4'),
+    ('capacity', 'i8'),
+    ('height', 'i8'),
+    ('width', 'i8'),
+    ('dtype', 'S8'),
+    ('pendingCount', 'i8'),  # Number of frames written, including ones being written right now
+    ('writeCount', 'i8'),  # Number of frames written and ready to be read
+    ('closed', 'u1')  # Set when the writer closes the ring or replaces it with a new one
+])
+
+_unknownRecord = np.array((np.nan, -1, np.nan), dtype=frameMetadataDtype)
+
+_writerNames = set()  # Names of the shared memory blocks created by writers in this process
+
+_magic = 0x494D5346  # "IMSF"
+_version = 1
+_alignment = 64
+
+
+class SharedFrameRingWriter:
+    """ Publishes frames into a ring buffer in named shared memory, so that
+    other processes can read them without copying through
+    SharedFrameRingReader.
+
+    The shared memory starts with a small header that acts as the control
+    channel: it describes the frame shape and dtype and holds the write
+    counters that readers use to find new frames and to detect frames that
+    were overwritten while being read. The header is followed by the
+    per-frame metadata records (of type frameMetadataDtype) and the frames.
+
+    The shared memory is created when the first frame is pushed. If the
+    frame shape or dtype changes, it is replaced by new shared memory with
+    the same name, and readers reattach automatically. """
+
+    def __init__(self, name: str, capacity: int = 32) -> None:
+        """
+        Args:
+            name: Name of the shared memory block.
+            capacity: The number of frames that the ring holds.
+        """
+        if capacity < 1:
+            raise ValueError('Shared frame ring capacity must be at least 1')
+
+        self._name = name
+        self._capacity = capacity
+        self._shm = None
+        self._header = None
+        self._metadata = None
+        self._frames = None
+
+    @property
+    def name(self) -> str:
+        """ Name of the shared memory block. """
+        return self._name
+
+    @property
+    def capacity(self) -> int:
+        """ The number of frames that the ring holds. """
+        return self._capacity
+
+    def push(self, frames: np.ndarray, metadata: Optional[np.ndarray] = None) -> None:
+        """ Publishes the given frames, a numpy array of shape
+        (numFrames, height, width). metadata, if specified, must be an array
+        of type frameMetadataDtype with one record per frame. """
+
+        n = len(frames)
+        if n < 1:
+            return
+
+        if (self._frames is None or self._frames.shape[1:] != frames.shape[1:] or
+                self._frames.dtype != frames.dtype):
+            self._create(frames.shape[1:], frames.dtype)
+
+        header = self._header
+        writeCount = int(header['writeCount'])
+        if n > self._capacity:
+            # Only the last frames would survive anyway
+            writeCount += n - self._capacity
+            frames = frames[-self._capacity:]
+            metadata = metadata[-self._capacity:] if metadata is not None else None
+            n = self._capacity
+
+        header['pendingCount'] = writeCount + n
+        start = writeCount % self._capacity
+        numUntilEnd = min(n, self._capacity - start)
+        self._frames[start:start + numUntilEnd] = frames[:numUntilEnd]
+        self._frames[:n - numUntilEnd] = frames[numUntilEnd:]
+        if metadata is not None:
+            self._metadata[start:start + numUntilEnd] = metadata[:numUntilEnd]
+            self._metadata[:n - numUntilEnd] = metadata[numUntilEnd:]
+        else:
+            self._metadata[start:start + numUntilEnd] = _unknownRecord
+            self._metadata[:n - numUntilEnd] = _unknownRecord
+        header['writeCount'] = writeCount + n
+
+    def close(self) -> None:
+        """ Closes and removes the shared memory. Readers that are attached
+        will see the ring as closed. """
+        if self._shm is None:
+            return
+
+        self._header['closed'] = 1
+        self._header = self._metadata = self._frames = None
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        self._shm = None
+        _writerNames.discard(self._name)
+
+    def _create(self, shape, dtype) -> None:
+        self.close()
+
+        dtype = np.dtype(dtype)
+        metadataOffset, framesOffset, size = _getLayout(self._capacity, shape, dtype)
+        try:
+            self._shm = shared_memory.SharedMemory(name=self._name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a process that didn't exit cleanly
+            stale = shared_memory.SharedMemory(name=self._name)
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(name=self._name, create=True, size=size)
+
+        _writerNames.add(self._name)
+
+        self._header, self._metadata, self._frames = _mapRing(
+            self._shm, self._capacity, shape, dtype, metadataOffset, framesOffset
+        )
+        self._header['magic'] = _magic
+        self._header['version'] = _version
+        self._header['capacity'] = self._capacity
+        self._header['height'], self._header['width'] = shape
+        self._header['dtype'] = dtype.str.encode('ascii')
+        self._header['pendingCount'] = 0
+        self._header['writeCount'] = 0
+        self._header['closed'] = 0
+
+
+class SharedFrameRingReader:
+    """ Reads frames published by a SharedFrameRingWriter, possibly in
+    another process. Frames are returned as views into the shared memory, so
+    no data is copied. Since the writer does not wait for readers, a view can
+    be overwritten if the reader falls more than the ring capacity behind;
+    call isValid after processing a read to check for this. """
+
+    def __init__(self, name: str, fromStart: bool = False) -> None:
+        """
+        Args:
+            name: Name of the shared memory block, as passed to the writer.
+            fromStart: Whether to also return the frames that the ring
+              currently holds, instead of only frames published after this
+              call.
+        """
+        self._name = name
+        self._shm = None
+        self._header = None
+        self._metadata = None
+        self._frames = None
+        self._capacity = 0
+        self._position = 0
+        self._lastReadStart = 0
+        self._droppedFrames = 0
+        self._attach(fromStart)
+
+    @property
+    def droppedFrames(self) -> int:
+        """ The number of frames that were overwritten before this reader read
+        them. """
+        return self._droppedFrames
+
+    @property
+    def numAvailable(self) -> int:
+        """ The number of frames that have been published since this reader
+        last read. """
+        if self._header is None:
+            return 0
+        return max(0, int(self._header['writeCount']) - self._position)
+
+    def read(self, maxFrames: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """ Returns a tuple ``(frames, metadata)`` with the frames published
+        since the last read, where frames is a numpy array of shape
+        (numFrames, height, width) and metadata an array of type
+        frameMetadataDtype. Both are views into the shared memory. At most the
+        frames up to the end of the ring are returned in each call; the rest
+        are returned by the next call. """
+
+        if self._header is None or self._header['closed']:
+            self._attach(fromStart=True)
+            if self._header is None:
+                return np.empty((0, 0, 0)), np.empty(0, dtype=frameMetadataDtype)
+
+        writeCount = int(self._header['writeCount'])
+        oldestAvailable = int(self._header['pendingCount']) - self._capacity
+        if self._position < oldestAvailable:
+            self._droppedFrames += oldestAvailable - self._position
+            self._position = oldestAvailable
+
+        start = self._position % self._capacity
+        numFrames = min(writeCount - self._position, self._capacity - start)
+        if maxFrames is not None:
+            numFrames = min(numFrames, maxFrames)
+        numFrames = max(numFrames, 0)
+
+        self._lastReadStart = self._position
+        self._position += numFrames
+        return self._frames[start:start + numFrames], self._metadata[start:start + numFrames]
+
+    def latest(self) -> Optional[np.ndarray]:
+        """ Returns a view of the most recently published frame, or None if no
+        frames have been published. """
+        if self._header is None or self._header['closed']:
+            self._attach(fromStart=False)
+        if self._header is None or self._header['writeCount'] < 1:
+            return None
+        return self._frames[(int(self._header['writeCount']) - 1) % self._capacity]
+
+    def isValid(self) -> bool:
+        """ Returns whether the frames returned by the last read are still
+        intact, i.e. have not been overwritten by the writer since. """
+        if self._header is None or self._header['closed']:
+            return False
+        return int(self._header['pendingCount']) - self._capacity <= self._lastReadStart
+
+    def close(self) -> None:
+        """ Detaches from the shared memory. Views returned by read must not be
+        used after this. """
+        self._header = self._metadata = self._frames = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def _attach(self, fromStart):
+        self.close()
+        # The writer owns the shared memory; don't let this process remove it on exit
+        try:
+            try:
+                self._shm = shared_memory.SharedMemory(name=self._name, track=False)
+            except TypeError:  # Python < 3.13
+                self._shm = shared_memory.SharedMemory(name=self._name)
+                if self._name not in _writerNames:
+                    resource_tracker.unregister(self._shm._name, 'shared_memory')
+        except FileNotFoundError:
+            return  # The writer hasn't published any frames yet
+
+        header = np.ndarray((), dtype=_headerDtype, buffer=self._shm.buf)
+        if header['magic'] != _magic or header['version'] != _version:
+            self.close()
+            raise ValueError(f'Shared memory "{self._name}" does not contain a frame ring')
+
+        self._capacity = int(header['capacity'])
+        shape = (int(header['height']), int(header['width']))
+        dtype = np.dtype(header['dtype'].item().decode('ascii'))
+        metadataOffset, framesOffset, _ = _getLayout(self._capacity, shape, dtype)
+        del header
+        self._header, self._metadata, self._frames = _mapRing(
+            self._shm, self._capacity, shape, dtype, metadataOffset, framesOffset
+        )
+
+        writeCount = int(self._header['writeCount'])
+        self._position = max(0, writeCount - self._capacity) if fromStart else writeCount
+        self._lastReadStart = self._position
+
+
+def _getLayout(capacity, shape, dtype):
+    metadataOffset = _align(_headerDtype.itemsize)
+    framesOffset = _align(metadataOffset + capacity * frameMetadataDtype.itemsize)
+    size = framesOffset + capacity * int(np.prod(shape)) * dtype.itemsize
+    return metadataOffset, framesOffset, size
+
+
+def _mapRing(shm, capacity, shape, dtype, metadataOffset, framesOffset):
+    header = np.ndarray((), dtype=_headerDtype, buffer=shm.buf)
+    metadata = np.ndarray((capacity,), dtype=frameMetadataDtype, buffer=shm.buf,
+                          offset=metadataOffset)
+    frames = np.ndarray((capacity, *shape), dtype=dtype, buffer=shm.buf, offset=framesOffset)
+    return header, metadata, frames
+
+
+def _align(offset):
+    return (offset + _alignment - 1) // _alignment * _alignment
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,130 @@
+from imswitch.imcommon.model import initLogger
+from imswitch.imcontrol.model.interfaces.syntheticcamera import SyntheticCamera
+from .DetectorManager import DetectorManager, DetectorListParameter, DetectorNumberParameter
+
+
+class SyntheticCameraManager(DetectorManager):
+    """ DetectorManager for a software camera that produces synthetic frames
+    at a configurable rate. Intended for benchmarking live view, recording
+    and reconstruction without hardware; it can reach well over 1000 frames
+    per second since frames are taken from a pregenerated bank.
+
+    Manager properties:
+
+    - ``width`` -- frame width in pixels (default: 512)
+    - ``height`` -- frame height in pixels (default: 512)
+    - ``dtype`` -- frame data type (default: ``"uint16"``)
+    - ``fps`` -- frame rate in frames per second (default: 100)
+    - ``pattern`` -- what the frames show; ``"beads"``, ``"moving"`` or
+      ``"noise"`` (default: ``"beads"``)
+    - ``bankSize`` -- number of distinct frames to pregenerate (default: 64)
+    - ``dropProbability`` -- probability that a frame is dropped, to simulate
+      lost frames (default: 0)
+    - ``jitter`` -- standard deviation of the frame timestamp jitter, in
+      seconds (default: 0)
+    - ``seed`` -- seed for the random number generator, to make the frames,
+      the dropped frames and the jitter reproducible (default: none)
+    - ``pixelSizeUm`` -- pixel size in micrometers (default: 1)
+    """
+
+    def __init__(self, detectorInfo, name, **_lowLevelManagers):
+        self.__logger = initLogger(self, instanceName=name)
+
+        properties = detectorInfo.managerProperties
+        self._pixelSizeUm = properties.get('pixelSizeUm', 1)
+        self._camera = SyntheticCamera(
+            width=properties.get('width', 512),
+            height=properties.get('height', 512),
+            dtype=properties.get('dtype', 'uint16'),
+            fps=properties.get('fps', 100),
+            pattern=properties.get('pattern', 'beads'),
+            bankSize=properties.get('bankSize', 64),
+            dropProbability=properties.get('dropProbability', 0),
+            jitter=properties.get('jitter', 0),
+            seed=properties.get('seed')
+        )
+        self.__logger.info(f'Initialized camera, model: {self._camera.model}')
+
+        fullShape = (self._camera.width, self._camera.height)
+
+        # Prepare parameters
+        parameters = {
+            'Frame rate': DetectorNumberParameter(group='Synthetic', value=self._camera.fps,
+                                                  valueUnits='fps', editable=True),
+            'Pattern': DetectorListParameter(group='Synthetic', value=self._camera.pattern,
+                                             options=SyntheticCamera.patterns, editable=True),
+            'Drop probability': DetectorNumberParameter(group='Synthetic',
+                                                        value=self._camera.dropProbability,
+                                                        valueUnits='', editable=True)
+        }
+
+        super().__init__(detectorInfo, name, fullShape=fullShape, supportedBinnings=[1],
+                         model=self._camera.model, parameters=parameters, croppable=True,
+                         softwareBinnings=[2, 4], dtype=self._camera.dtype)
+
+    @property
+    def sensorPixelSizeUm(self):
+        return [1, self._pixelSizeUm, self._pixelSizeUm]
+
+    def setParameter(self, name, value):
+        super().setParameter(name, value)
+
+        if name == 'Frame rate':
+            self._camera.fps = float(value)
+            if self._camera.running:
+                self._camera.startAcquisition()  # Restart timing at the new rate
+        elif name == 'Pattern':
+            self._camera.pattern = value
+            self._camera.generateBank()
+        elif name == 'Drop probability':
+            self._camera.dropProbability = float(value)
+
+        return self.parameters
+
+    def getLatestFrame(self):
+        return self._camera.getLast()
+
+    def grabChunk(self):
+        return self._camera.grabFrames()[0]
+
+    def grabChunkWithMetadata(self):
+        frames, frameNumbers, timestamps = self._camera.grabFrames()
+        return frames, {
+            'frameNumber': frameNumbers,
+            'timestamp': timestamps,
+            'exposure': 1 / self._camera.fps
+        }
+
+    def flushBuffers(self):
+        self._camera.flush()
+        super().flushBuffers()
+
+    def startAcquisition(self):
+        if not self._camera.running:
+            self._camera.startAcquisition()
+
+    def stopAcquisition(self):
+        self._camera.stopAcquisition()
+
+    def crop(self, hpos, vpos, hsize, vsize):
+        self._camera.width, self._camera.height = hsize, vsize
+        self._camera.generateBank()
+        self._frameStart = (hpos, vpos)
+        self._shape = (hsize, vsize)
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -86,11 +86,11 @@ class TISManager(DetectorManager):
     def setBinning(self, binning):
         super().setBinning(binning)
 
-    def getChunk(self):
+    def grabChunk(self):
         return self._camera.grabFrame()[np.newaxis, :, :]
 
     def flushBuffers(self):
-        pass
+        super().flushBuffers()
 
     def startAcquisition(self):
         if not self._running:
@@ -110,7 +110,7 @@ class TISManager(DetectorManager):
         self.__logger.debug('stoplive')
 
     @property
-    def pixelSizeUm(self):
+    def sensorPixelSizeUm(self):
         return [1, 1, 1]
 
     def crop(self, hpos, vpos, hsize, vsize):
@@ -0,0 +1,152 @@
+import struct
+import zlib
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+class ChunkCompressor:
+    """ Compresses HDF5 chunks outside of HDF5, so that compression can be
+    done on several threads and the compressed chunks written with direct
+    chunk writes. The compressed data is in the format that the corresponding
+    HDF5 filter produces, so the files can be read by any HDF5 reader that has
+    the filter. Chunks can also be compressed for Zarr arrays, in the format
+    of the corresponding numcodecs codec.
+
+    Supported codecs:
+
+    - ``gzip`` -- the built-in deflate filter. Slow, but readable everywhere.
+    - ``lz4`` -- the LZ4 filter plugin. Requires the ``lz4`` package.
+    - ``zstd`` -- the Zstandard filter plugin. Requires the ``zstandard``
+      package.
+    - ``blosc`` -- the Blosc filter plugin, with byte shuffling and LZ4
+      inside. Requires the ``blosc`` package.
+
+    The plugin filters are registered with HDF5 through the ``hdf5plugin``
+    package, which is required to write and read HDF5 files that use them. """
+
+    codecs = ['gzip', 'lz4', 'zstd', 'blosc']
+
+    def __init__(self, codec: str, level: Optional[int] = None) -> None:
+        """
+        Args:
+            codec: The codec to use; one of the codecs listed in the class
+              description.
+            level: Compression level. If None, a level that favors speed is
+              used.
+        """
+        if codec not in self.codecs:
+            raise ValueError(f'Unsupported compression codec "{codec}"; supported codecs are'
+                             f' {", ".join(self.codecs)}')
+
+        self._codec = codec
+        self._datasetOptions = None
+        try:
+            if codec == 'gzip':
+                self._level = level if level is not None else 1
+                self._zarrConfig = {'id': 'zlib', 'level': self._level}
+            elif codec == 'lz4':
+                import lz4.block
+                self._lz4Block = lz4.block
+                self._level = None  # LZ4 is used in its fast mode, which has no levels
+                self._zarrConfig = {'id': 'lz4', 'acceleration': 1}
+            elif codec == 'zstd':
+                import zstandard
+                self._level = level if level is not None else 1
+                self._zstandard = zstandard
+                self._zarrConfig = {'id': 'zstd', 'level': self._level}
+            elif codec == 'blosc':
+                import blosc
+                self._level = level if level is not None else 5
+                self._blosc = blosc
+                self._zarrConfig = {'id': 'blosc', 'cname': 'lz4', 'clevel': self._level,
+                                    'shuffle': 1, 'blocksize': 0}
+        except ModuleNotFoundError as e:
+            raise ModuleNotFoundError(
+                f'The "{e.name}" package is required for {codec} compression'
+            ) from e
+
+    @property
+    def codec(self) -> str:
+        """ Name of the codec. """
+        return self._codec
+
+    @property
+    def datasetOptions(self) -> Dict[str, Any]:
+        """ Keyword arguments to pass to h5py's create_dataset to set up the
+        matching filter. """
+        if self._datasetOptions is None:
+            # Only needed for HDF5, so hdf5plugin isn't required for Zarr recordings
+            self._datasetOptions = self._getDatasetOptions()
+        return dict(self._datasetOptions)
+
+    @property
+    def zarrConfig(self) -> Dict[str, Any]:
+        """ The numcodecs configuration of the matching Zarr compressor. """
+        return dict(self._zarrConfig)
+
+    def compress(self, chunk: np.ndarray) -> bytes:
+        """ Compresses a full chunk, a C-contiguous numpy array. Safe to call
+        from several threads at once; the codecs release the GIL while they
+        work. """
+        data = memoryview(chunk).cast('B')
+        if self._codec == 'gzip':
+            return zlib.compress(data, self._level)
+        elif self._codec == 'lz4':
+            # The LZ4 filter format: total size and block size (big-endian 64 and 32 bits),
+            # then each block as its compressed size and data. We use a single block.
+            compressed = self._lz4Block.compress(data, store_size=False)
+            if len(compressed) >= len(data):
+                compressed = bytes(data)  # Stored uncompressed; marked by size == block size
+            return struct.pack('>qii', len(data), len(data), len(compressed)) + compressed
+        elif self._codec == 'zstd':
+            return self._zstandard.ZstdCompressor(level=self._level).compress(data)
+        elif self._codec == 'blosc':
+            return self._blosc.compress(data, typesize=chunk.dtype.itemsize,
+                                        clevel=self._level, shuffle=self._blosc.SHUFFLE,
+                                        cname='lz4')
+
+    def compressForZarr(self, chunk: np.ndarray) -> bytes:
+        """ Like compress, but produces the format of the Zarr compressor
+        described by zarrConfig. """
+        if self._codec == 'lz4':
+            # numcodecs prefixes the block with its size (little-endian 32 bits), like lz4 does
+            return self._lz4Block.compress(memoryview(chunk).cast('B'), store_size=True)
+        return self.compress(chunk)  # The other codecs use the same format as the HDF5 filters
+
+    def _getDatasetOptions(self):
+        if self._codec == 'gzip':
+            return {'compression': 'gzip', 'compression_opts': self._level}
+
+        try:
+            import hdf5plugin
+        except ModuleNotFoundError as e:
+            raise ModuleNotFoundError(
+                f'The "hdf5plugin" package is required for {self._codec} compression in HDF5'
+                f' files'
+            ) from e
+
+        if self._codec == 'lz4':
+            return dict(hdf5plugin.LZ4())
+        elif self._codec == 'zstd':
+            return dict(hdf5plugin.Zstd(clevel=self._level))
+        elif self._codec == 'blosc':
+            return dict(hdf5plugin.Blosc(cname='lz4', clevel=self._level,
+                                         shuffle=hdf5plugin.Blosc.SHUFFLE))
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
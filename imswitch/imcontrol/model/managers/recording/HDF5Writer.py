@@ -0,0 +1,233 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+
+from ..detectors.FrameBuffer import frameMetadataDtype
+from .Compression import ChunkCompressor
+
+
+class HDF5Writer:
+    """ Writes frames and their metadata records to a pair of datasets in an
+    HDF5 file, in a way that keeps up with fast detectors.
+
+    The frame dataset is chunked by whole frames, so that every chunk can be
+    written with a single direct chunk write that bypasses the HDF5 filter
+    pipeline and chunk cache. Frames are collected in a staging buffer until
+    they fill a chunk; the last, partial chunk is written normally when the
+    writer is closed. Instead of resizing the datasets for every write, their
+    extent is preallocated from the expected number of frames and grown
+    geometrically when exceeded, and trimmed to the number of frames written
+    on close. Since the datasets are chunked, extent that has not been
+    written to takes up no space in the file.
+
+    If a compressor is specified, full chunks are compressed on a pool of
+    threads and the compressed chunks written directly as they complete, so
+    the writer only waits for the codec when the pool falls behind. """
+
+    def __init__(self, file, datasetName: str, shape: Tuple[int, int], dtype: np.dtype,
+                 expectedFrames: Optional[int] = None, chunkFrames: Optional[int] = None,
+                 metadataGroupName: str = 'frame_metadata',
+                 compressor: Optional[ChunkCompressor] = None,
+                 compressionThreads: Optional[int] = None) -> None:
+        """
+        Args:
+            file: The h5py File to write to.
+            datasetName: Name of the frame dataset. The metadata dataset gets
+              the same name in the group metadataGroupName.
+            shape: Frame shape as a tuple ``(height, width)``.
+            dtype: Frame data type.
+            expectedFrames: The number of frames that are expected to be
+              written, if known; used to preallocate the datasets.
+            chunkFrames: The number of frames per chunk. If None, it is chosen
+              so that chunks are about 1 MiB (but hold at least one frame).
+            compressor: The compressor to compress the frames with, or None
+              to store them uncompressed.
+            compressionThreads: The number of threads to compress chunks on.
+              If None, one per CPU core is used.
+        """
+        self._shape = tuple(shape)
+        self._dtype = np.dtype(dtype)
+        frameBytes = max(int(np.prod(self._shape)) * self._dtype.itemsize, 1)
+        if chunkFrames is None:
+            chunkFrames = min(max(_targetChunkBytes // frameBytes, 1), 1024)
+        self._chunkFrames = chunkFrames
+
+        self._capacity = max(expectedFrames if expectedFrames else 0,
+                             self._chunkFrames * _initialChunks)
+        self._dataset = file.create_dataset(
+            datasetName, (self._capacity, *self._shape), maxshape=(None, *self._shape),
+            chunks=(self._chunkFrames, *self._shape), dtype=self._dtype,
+            **(compressor.datasetOptions if compressor is not None else {})
+        )
+        self._metadataDataset = file.require_group(metadataGroupName).create_dataset(
+            datasetName, (self._capacity,), maxshape=(None,),
+            chunks=(_metadataChunkRecords,), dtype=frameMetadataDtype,
+            fillvalue=np.array((np.nan, -1, np.nan), dtype=frameMetadataDtype)
+        )
+
+        self._staging = np.empty((self._chunkFrames, *self._shape), dtype=self._dtype)
+        self._numStaged = 0
+        self._numFrames = 0
+        self._numChunksWritten = 0
+        self._closed = False
+
+        self._compressor = compressor
+        self._compressionPool = None
+        self._maxPendingChunks = 0
+        self._pendingChunks = deque()  # (chunk index, future of the compressed chunk)
+        if compressor is not None:
+            if compressionThreads is None:
+                compressionThreads = os.cpu_count() or 1
+            self._compressionPool = ThreadPoolExecutor(compressionThreads,
+                                                       thread_name_prefix='ChunkCompressor')
+            self._maxPendingChunks = 2 * compressionThreads
+
+    @property
+    def dataset(self):
+        """ The h5py dataset that the frames are written to. """
+        return self._dataset
+
+    @property
+    def metadataDataset(self):
+        """ The h5py dataset that the metadata records are written to. """
+        return self._metadataDataset
+
+    @property
+    def attrs(self):
+        """ The attributes of the frame dataset. """
+        return self._dataset.attrs
+
+    @property
+    def metadataAttrs(self):
+        """ The attributes of the metadata dataset. """
+        return self._metadataDataset.attrs
+
+    @property
+    def numFrames(self) -> int:
+        """ The number of frames that have been written. """
+        return self._numFrames
+
+    def write(self, frames: np.ndarray, metadata: Optional[np.ndarray] = None) -> None:
+        """ Appends the given frames, a numpy array of shape
+        (numFrames, height, width), to the dataset. metadata, if specified,
+        must be an array of type frameMetadataDtype with one record per frame.
+        The frames are copied or written before this returns, so they may be
+        views into a frame buffer. """
+
+        n = len(frames)
+        if n < 1:
+            return
+        if self._closed:
+            raise RuntimeError('Writer has been closed')
+
+        self._ensureCapacity(self._numFrames + n)
+        if metadata is not None:
+            self._metadataDataset[self._numFrames:self._numFrames + n] = metadata
+
+        i = 0
+        if self._numStaged > 0:
+            # Top up the partially filled chunk first
+            i = min(n, self._chunkFrames - self._numStaged)
+            self._staging[self._numStaged:self._numStaged + i] = frames[:i]
+            self._numStaged += i
+            if self._numStaged == self._chunkFrames:
+                self._writeChunk(self._staging)
+                self._numStaged = 0
+
+        # Write whole chunks straight from the source frames
+        while n - i >= self._chunkFrames:
+            self._writeChunk(frames[i:i + self._chunkFrames])
+            i += self._chunkFrames
+
+        self._staging[:n - i] = frames[i:]
+        self._numStaged += n - i
+        self._numFrames += n
+
+    def flush(self) -> None:
+        """ Flushes the written frames to the file. The last, partial chunk is
+        not written until the writer is closed. """
+        self._dataset.file.flush()
+
+    def close(self) -> None:
+        """ Writes the remaining frames and trims the datasets to the number
+        of frames written. Does not close the file. """
+        if self._closed:
+            return
+
+        self._writeCompressedChunks(waitForAll=True)
+        if self._compressionPool is not None:
+            self._compressionPool.shutdown()
+
+        if self._numStaged > 0:
+            start = self._numChunksWritten * self._chunkFrames
+            self._dataset[start:start + self._numStaged] = self._staging[:self._numStaged]
+            self._numStaged = 0
+
+        self._dataset.resize(self._numFrames, axis=0)
+        self._metadataDataset.resize(self._numFrames, axis=0)
+        self._staging = None
+        self._closed = True
+
+    def _writeChunk(self, frames):
+        chunkIndex = self._numChunksWritten
+        self._numChunksWritten += 1
+
+        if self._compressor is None:
+            if frames.dtype != self._dtype or not frames.flags.c_contiguous:
+                frames = np.ascontiguousarray(frames, dtype=self._dtype)
+            self._dataset.id.write_direct_chunk((chunkIndex * self._chunkFrames, 0, 0), frames)
+            return
+
+        # Copied, since the frames may be a view into a buffer that is reused while compressing
+        frames = np.array(frames, dtype=self._dtype, order='C')
+        self._pendingChunks.append(
+            (chunkIndex, self._compressionPool.submit(self._compressor.compress, frames))
+        )
+        self._writeCompressedChunks(waitForAll=False)
+
+    def _writeCompressedChunks(self, waitForAll):
+        """ Writes the compressed chunks that are done, in order. Waits for the
+        oldest chunks if there are too many in flight, or for all of them if
+        waitForAll is True. """
+        while self._pendingChunks:
+            chunkIndex, future = self._pendingChunks[0]
+            mustWait = waitForAll or len(self._pendingChunks) > self._maxPendingChunks
+            if not mustWait and not future.done():
+                break
+
+            self._dataset.id.write_direct_chunk((chunkIndex * self._chunkFrames, 0, 0),
+                                                future.result())
+            self._pendingChunks.popleft()
+
+    def _ensureCapacity(self, numFrames):
+        if numFrames <= self._capacity:
+            return
+
+        self._capacity = max(numFrames, 2 * self._capacity)
+        self._dataset.resize(self._capacity, axis=0)
+        self._metadataDataset.resize(self._capacity, axis=0)
+
+
+_targetChunkBytes = 1024 ** 2
+_initialChunks = 16
+_metadataChunkRecords = 1024
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
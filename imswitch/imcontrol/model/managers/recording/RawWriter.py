@@ -0,0 +1,167 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .Sidecar import getSidecarPath, writeSidecar
+from ..detectors.FrameBuffer import frameMetadataDtype
+
+
+class RawWriter:
+    """ Appends frames to a headerless binary file, back to back in C order,
+    which is the fastest format to write and can be opened as a memory map
+    (e.g. with numpy.memmap) without any parsing.
+
+    Data is written to the file in whole blocks of blockBytes (a multiple of
+    the page size), so that every write is page-aligned; only the final write
+    on close may be partial. The file is accompanied by a JSON sidecar with
+    ``.json`` appended to its name (see getSidecarPath), which describes the
+    frame shape and data type, and holds the attributes set through attrs
+    and metadataAttrs and the metadata records of the frames. The sidecar is
+    written when the writer is created and again when it is closed; the
+    number of frames is given by the size of the file. """
+
+    alignment = 4096
+
+    def __init__(self, path: str, shape: Tuple[int, int], dtype: np.dtype,
+                 pixelSizeUm: Optional[List[float]] = None,
+                 blockBytes: int = 4 * 1024 ** 2) -> None:
+        """
+        Args:
+            path: Path of the file.
+            shape: Frame shape as a tuple ``(height, width)``.
+            dtype: Frame data type.
+            pixelSizeUm: Pixel size as a list ``[z, y, x]``.
+            blockBytes: Size of the blocks that data is written in. Rounded
+              up to a multiple of alignment.
+        """
+        self._path = path
+        self._shape = tuple(shape)
+        self._dtype = np.dtype(dtype)
+        self._pixelSizeUm = pixelSizeUm if pixelSizeUm is not None else [1, 1, 1]
+
+        blockBytes = -(-max(blockBytes, 1) // self.alignment) * self.alignment
+        self._block = np.empty(blockBytes, dtype=np.uint8)
+        self._blockFill = 0
+
+        self._attrs = {}
+        self._metadataAttrs = {}
+        self._numFrames = 0
+        self._metadata = np.empty(1024, dtype=frameMetadataDtype)
+        self._file = open(path, 'wb', buffering=0)
+        self._writeSidecar()
+
+    @property
+    def attrs(self) -> dict:
+        """ Attributes to store with the frames. Saved to the sidecar when
+        the file is closed. """
+        return self._attrs
+
+    @property
+    def metadataAttrs(self) -> dict:
+        """ Attributes to store with the frame metadata. Saved to the sidecar
+        when the file is closed. """
+        return self._metadataAttrs
+
+    @property
+    def numFrames(self) -> int:
+        """ The number of frames that have been written. """
+        return self._numFrames
+
+    def write(self, frames: np.ndarray, metadata: Optional[np.ndarray] = None) -> None:
+        """ Appends frames to the file. frames has the shape ``(n, height,
+        width)``; metadata, if not None, is a frameMetadataDtype array of
+        length n. """
+        n = len(frames)
+        data = np.ascontiguousarray(frames, dtype=self._dtype).reshape(-1).view(np.uint8)
+
+        blockBytes = len(self._block)
+        i = 0
+        if self._blockFill > 0:
+            # Top up the partially filled block first
+            i = min(blockBytes - self._blockFill, len(data))
+            self._block[self._blockFill:self._blockFill + i] = data[:i]
+            self._blockFill += i
+            if self._blockFill == blockBytes:
+                self._writeAll(self._block)
+                self._blockFill = 0
+
+        # Whole blocks are written straight from the frames, without copying
+        numDirect = (len(data) - i) // blockBytes * blockBytes
+        if numDirect > 0:
+            self._writeAll(data[i:i + numDirect])
+            i += numDirect
+
+        remaining = len(data) - i
+        self._block[self._blockFill:self._blockFill + remaining] = data[i:]
+        self._blockFill += remaining
+
+        self._bufferMetadata(metadata, n)
+        self._numFrames += n
+
+    def flush(self) -> None:
+        """ Writes the frames written so far to the file. The partial block is
+        kept, and is written over once it is full, so that the writes stay
+        aligned. """
+        if self._blockFill > 0:
+            position = self._file.tell()
+            self._writeAll(self._block[:self._blockFill])
+            self._file.seek(position)
+
+    def close(self) -> None:
+        """ Writes the remaining data and completes the sidecar. """
+        if self._file is None:
+            return
+
+        if self._blockFill > 0:
+            self._writeAll(self._block[:self._blockFill])
+            self._blockFill = 0
+        self._file.close()
+        self._file = None
+        self._writeSidecar()
+
+    def _writeAll(self, data):
+        view = memoryview(data)
+        while len(view) > 0:
+            view = view[self._file.write(view):]  # Unbuffered writes may be short
+
+    def _writeSidecar(self):
+        metadata = self._metadata[:self._numFrames]
+        writeSidecar(getSidecarPath(self._path), {
+            'shape': list(self._shape),
+            'dtype': self._dtype.str,
+            'pixel_size_um': list(self._pixelSizeUm),
+            'attrs': self._attrs,
+            'frame_metadata_attrs': self._metadataAttrs,
+            'frame_metadata': {field: metadata[field] for field in frameMetadataDtype.names}
+        })
+
+    def _bufferMetadata(self, metadata, n):
+        required = self._numFrames + n
+        if required > len(self._metadata):
+            grown = np.empty(max(required, 2 * len(self._metadata)), dtype=frameMetadataDtype)
+            grown[:self._numFrames] = self._metadata[:self._numFrames]
+            self._metadata = grown
+
+        bufferSlice = slice(self._numFrames, required)
+        if metadata is not None:
+            self._metadata[bufferSlice] = metadata
+        else:
+            self._metadata[bufferSlice] = np.array((np.nan, -1, np.nan),
+                                                   dtype=frameMetadataDtype)
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,158 @@
+import os
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+
+class RolloverWriter:
+    """ Splits a recording across files, starting a new file whenever the
+    current one has reached maxFileBytes of frame data or maxFileFrames
+    frames. The files are named like the first with a counter appended (e.g.
+    ``rec_CAM_1.hdf5`` after ``rec_CAM.hdf5``).
+
+    The files are written by writers made by createWriter, which is called
+    with the path of each file and the largest number of frames that will be
+    written to it. It returns the writer, which must have the interface of
+    HDF5Writer, along with a function that closes the file once the writer
+    has been closed (or None). The attributes set through attrs and
+    metadataAttrs are applied to the writer of every file, and the metadata
+    attribute ``first_frame`` holds the index of the file's first frame in
+    the recording. """
+
+    def __init__(self, path: str, createWriter: Callable[[str, int], Tuple[object, Callable]],
+                 frameBytes: int, maxFileBytes: Optional[int] = None,
+                 maxFileFrames: Optional[int] = None) -> None:
+        """
+        Args:
+            path: Path of the first file.
+            createWriter: Function that creates the writer of a file; see the
+              class description.
+            frameBytes: The size of a frame, in bytes.
+            maxFileBytes: The size of the frame data at which to roll over to
+              a new file, or None for no limit.
+            maxFileFrames: The number of frames at which to roll over to a new
+              file, or None for no limit. At least one frame is written to
+              each file.
+        """
+        self._basePath, self._extension = os.path.splitext(path)
+        self._createWriter = createWriter
+
+        limits = [maxFileFrames] if maxFileFrames is not None else []
+        if maxFileBytes is not None:
+            limits.append(maxFileBytes // max(frameBytes, 1))
+        self._framesPerFile = max(min(limits), 1) if limits else None
+
+        self._attrs = {}
+        self._metadataAttrs = {}
+        self._numFiles = 0
+        self._writer = None
+        self._closeFile = None
+        self._numFramesInFile = 0
+        self._numFrames = 0
+        self._closed = False
+
+    @property
+    def attrs(self) -> dict:
+        """ Attributes to store with the frames of each file. """
+        return self._attrs
+
+    @property
+    def metadataAttrs(self) -> dict:
+        """ Attributes to store with the frame metadata of each file. """
+        return self._metadataAttrs
+
+    @property
+    def framesPerFile(self) -> Optional[int]:
+        """ The number of frames at which files are rolled over, or None if
+        they aren't. """
+        return self._framesPerFile
+
+    @property
+    def numFiles(self) -> int:
+        """ The number of files that have been created so far. """
+        return self._numFiles
+
+    @property
+    def numFrames(self) -> int:
+        """ The number of frames that have been written. """
+        return self._numFrames
+
+    def write(self, frames: np.ndarray, metadata: Optional[np.ndarray] = None) -> None:
+        """ Appends frames to the files. frames has the shape ``(n, height,
+        width)``; metadata, if not None, is a frameMetadataDtype array of
+        length n. """
+        n = len(frames)
+        i = 0
+        while i < n:
+            if self._writer is None:
+                self._openFile()
+
+            numToWrite = n - i
+            if self._framesPerFile is not None:
+                numToWrite = min(numToWrite, self._framesPerFile - self._numFramesInFile)
+
+            self._writer.write(frames[i:i + numToWrite],
+                               metadata[i:i + numToWrite] if metadata is not None else None)
+            self._numFramesInFile += numToWrite
+            self._numFrames += numToWrite
+            i += numToWrite
+
+            if self._numFramesInFile == self._framesPerFile:
+                self._closeWriter()
+
+    def flush(self) -> None:
+        """ Flushes the frames written so far to the current file. """
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self) -> None:
+        """ Completes the current file. If no frames were written, an empty
+        file is created, so that every recording leaves a file. """
+        if self._closed:
+            return
+
+        if self._writer is None and self._numFrames < 1:
+            self._openFile()
+        self._closeWriter()
+        self._closed = True
+
+    def _openFile(self):
+        suffix = f'_{self._numFiles}' if self._numFiles > 0 else ''
+        self._writer, self._closeFile = self._createWriter(
+            f'{self._basePath}{suffix}{self._extension}', self._framesPerFile
+        )
+        self._numFiles += 1
+        self._numFramesInFile = 0
+
+    def _closeWriter(self):
+        if self._writer is None:
+            return
+
+        for key, value in self._attrs.items():
+            self._writer.attrs[key] = value
+        for key, value in self._metadataAttrs.items():
+            self._writer.metadataAttrs[key] = value
+        self._writer.metadataAttrs['first_frame'] = self._numFrames - self._numFramesInFile
+
+        self._writer.close()
+        if self._closeFile is not None:
+            self._closeFile()
+        self._writer = None
+        self._closeFile = None
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
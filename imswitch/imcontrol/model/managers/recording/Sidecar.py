@@ -0,0 +1,56 @@
+import json
+import math
+
+import numpy as np
+
+
+def writeSidecar(path: str, contents: dict) -> None:
+    """ Writes the JSON sidecar that accompanies recordings in formats that
+    can't hold attributes and frame metadata themselves. Values are converted
+    with toJson. """
+    with open(path, 'w') as file:
+        json.dump(toJson(contents), file, indent=4, allow_nan=False)
+
+
+def getSidecarPath(dataPath: str) -> str:
+    """ Returns the path of the JSON sidecar of the data file at dataPath,
+    which is the full path with ``.json`` appended (e.g. ``rec_CAM.raw.json``
+    for ``rec_CAM.raw``), so that recordings in different formats with the
+    same name don't share a sidecar. """
+    return f'{dataPath}.json'
+
+
+def toJson(value):
+    """ Returns value with numpy values and arrays converted to their JSON
+    equivalents, recursively, and NaN and infinite numbers converted to null,
+    so that the result can be written as valid JSON. """
+    if isinstance(value, dict):
+        return {key: toJson(item) for key, item in value.items()}
+    elif isinstance(value, np.ndarray):
+        return toJson(value.tolist())
+    elif isinstance(value, (list, tuple)):
+        return [toJson(item) for item in value]
+    elif isinstance(value, np.generic):
+        return toJson(value.item())
+    elif isinstance(value, float):
+        return value if math.isfinite(value) else None
+    elif isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return value
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
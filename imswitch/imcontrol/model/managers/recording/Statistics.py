@@ -0,0 +1,164 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class DetectorRecordingStatistics:
+    """ Throughput and health of the recording of a single detector, over the
+    interval since the previous report. """
+
+    framesPerSecond: float
+    """ Rate at which frames were collected from the detector. """
+
+    writtenFramesPerSecond: float
+    """ Rate at which frames were written to file. If it stays below
+    framesPerSecond, the writer is falling behind. """
+
+    megabytesPerSecond: float
+    """ Rate at which frame data was written to file, in MB (10^6 bytes) per
+    second, before compression. """
+
+    writeLatencyP50: float
+    """ Median time, in seconds, that writing a chunk of frames took. NaN if
+    no chunks were written. """
+
+    writeLatencyP95: float
+    """ 95th percentile of the chunk write times, in seconds. """
+
+    writeLatencyP99: float
+    """ 99th percentile of the chunk write times, in seconds. """
+
+    bufferOccupancy: float
+    """ The largest fraction of the detector's frame buffer that was filled
+    with frames waiting to be collected. Frames are lost when it reaches 1.
+    """
+
+    numFramesCollected: int
+    """ Total number of frames collected since the start of the recording. """
+
+    numFramesWritten: int
+    """ Total number of frames written since the start of the recording. """
+
+    droppedFrames: int
+    """ Total number of frames lost since the start of the recording, by the
+    detector, in its frame buffer or in the write queue. """
+
+
+@dataclass(frozen=True)
+class RecordingStatistics:
+    """ Throughput and health of a recording. """
+
+    detectors: Dict[str, DetectorRecordingStatistics]
+    """ Statistics per detector. """
+
+    queuedFrames: int
+    """ Number of frames waiting in the write queues. """
+
+    queuedBytes: int
+    """ Number of bytes of frames waiting in the write queues, in memory. """
+
+    queueHighWaterMarkBytes: int
+    """ The largest number of bytes that have been waiting in each write
+    queue at once, summed over the write queues. """
+
+    spilledFrames: int
+    """ Total number of frames that have been spilled to disk because a
+    write queue was full. """
+
+
+class RecordingStatisticsTracker:
+    """ Gathers the measurements that RecordingStatistics are made from. The
+    collecting and writing sides of a recording may report from different
+    threads. """
+
+    def __init__(self, detectorNames) -> None:
+        self._lock = threading.Lock()
+        self._detectorNames = list(detectorNames)
+        self._lastSnapshotTime = time.monotonic()
+        self._numCollected = dict.fromkeys(self._detectorNames, 0)
+        self._numWritten = dict.fromkeys(self._detectorNames, 0)
+        self._numCollectedAtSnapshot = dict.fromkeys(self._detectorNames, 0)
+        self._numWrittenAtSnapshot = dict.fromkeys(self._detectorNames, 0)
+        self._bytesWritten = dict.fromkeys(self._detectorNames, 0)
+        self._writeLatencies = {detectorName: [] for detectorName in self._detectorNames}
+        self._peakOccupancy = dict.fromkeys(self._detectorNames, 0.0)
+
+    def framesCollected(self, detectorName: str, numFrames: int, occupancy: float) -> None:
+        """ Records that numFrames frames were collected from a detector,
+        whose frame buffer was filled to the specified fraction at the time.
+        """
+        with self._lock:
+            self._numCollected[detectorName] += numFrames
+            self._peakOccupancy[detectorName] = max(self._peakOccupancy[detectorName],
+                                                    occupancy)
+
+    def chunkWritten(self, detectorName: str, numFrames: int, numBytes: int,
+                     latency: float) -> None:
+        """ Records that a chunk of frames was written in latency seconds. """
+        with self._lock:
+            self._numWritten[detectorName] += numFrames
+            self._bytesWritten[detectorName] += numBytes
+            self._writeLatencies[detectorName].append(latency)
+
+    def snapshot(self, droppedFrames: Dict[str, int], writeQueues) -> RecordingStatistics:
+        """ Returns the statistics over the interval since the previous
+        snapshot, and starts a new interval. """
+        with self._lock:
+            now = time.monotonic()
+            elapsed = max(now - self._lastSnapshotTime, 1e-9)
+            self._lastSnapshotTime = now
+
+            detectors = {}
+            for detectorName in self._detectorNames:
+                latencies = self._writeLatencies[detectorName]
+                p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) if latencies
+                                 else (np.nan, np.nan, np.nan))
+                detectors[detectorName] = DetectorRecordingStatistics(
+                    framesPerSecond=(self._numCollected[detectorName] -
+                                     self._numCollectedAtSnapshot[detectorName]) / elapsed,
+                    writtenFramesPerSecond=(self._numWritten[detectorName] -
+                                            self._numWrittenAtSnapshot[detectorName]) / elapsed,
+                    megabytesPerSecond=self._bytesWritten[detectorName] / elapsed / 1e6,
+                    writeLatencyP50=float(p50),
+                    writeLatencyP95=float(p95),
+                    writeLatencyP99=float(p99),
+                    bufferOccupancy=self._peakOccupancy[detectorName],
+                    numFramesCollected=self._numCollected[detectorName],
+                    numFramesWritten=self._numWritten[detectorName],
+                    droppedFrames=droppedFrames.get(detectorName, 0)
+                )
+
+                self._numCollectedAtSnapshot[detectorName] = self._numCollected[detectorName]
+                self._numWrittenAtSnapshot[detectorName] = self._numWritten[detectorName]
+                self._bytesWritten[detectorName] = 0
+                self._writeLatencies[detectorName] = []
+                self._peakOccupancy[detectorName] = 0.0
+
+        return RecordingStatistics(
+            detectors=detectors,
+            queuedFrames=sum(writeQueue.numFrames for writeQueue in writeQueues),
+            queuedBytes=sum(writeQueue.numBytes for writeQueue in writeQueues),
+            queueHighWaterMarkBytes=sum(writeQueue.highWaterMark for writeQueue in writeQueues),
+            spilledFrames=sum(writeQueue.numSpilled for writeQueue in writeQueues)
+        )
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
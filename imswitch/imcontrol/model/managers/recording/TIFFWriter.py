@@ -0,0 +1,131 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+import tifffile as tiff
+
+from .Sidecar import getSidecarPath, writeSidecar
+from ..detectors.FrameBuffer import frameMetadataDtype
+
+
+class TIFFWriter:
+    """ Streams frames to a BigTIFF file as they arrive, one page per frame.
+
+    The pages are stored uncompressed and back to back, so the frames of the
+    file form a single contiguous block that can be opened as a memory map
+    (e.g. with tifffile.memmap), and any TIFF reader (such as Fiji) sees a
+    stack of frames. The pixel size is stored in the resolution tags.
+
+    The file is accompanied by a JSON sidecar with ``.json`` appended to its
+    name (see getSidecarPath), written when the file is completed, which holds the
+    attributes set through attrs and metadataAttrs, and the metadata records
+    of the frames. Recordings are split across files by RolloverWriter, as
+    in the other formats. """
+
+    def __init__(self, path: str, shape: Tuple[int, int], dtype: np.dtype,
+                 pixelSizeUm: Optional[List[float]] = None) -> None:
+        """
+        Args:
+            path: Path of the file.
+            shape: Frame shape as a tuple ``(height, width)``.
+            dtype: Frame data type.
+            pixelSizeUm: Pixel size as a list ``[z, y, x]``.
+        """
+        self._path = path
+        self._shape = tuple(shape)
+        self._dtype = np.dtype(dtype)
+
+        pixelSizeUm = pixelSizeUm if pixelSizeUm is not None else [1, 1, 1]
+        self._resolution = (1e4 / pixelSizeUm[2], 1e4 / pixelSizeUm[1])  # Pixels per cm
+
+        self._attrs = {}
+        self._metadataAttrs = {}
+        self._tiffWriter = None
+        self._numFrames = 0
+        self._metadata = np.empty(1024, dtype=frameMetadataDtype)
+        self._closed = False
+
+    @property
+    def attrs(self) -> dict:
+        """ Attributes to store with the frames. Saved to the sidecar when
+        the file is completed. """
+        return self._attrs
+
+    @property
+    def metadataAttrs(self) -> dict:
+        """ Attributes to store with the frame metadata. Saved to the sidecar
+        when the file is completed. """
+        return self._metadataAttrs
+
+    @property
+    def numFrames(self) -> int:
+        """ The number of frames that have been written. """
+        return self._numFrames
+
+    def write(self, frames: np.ndarray, metadata: Optional[np.ndarray] = None) -> None:
+        """ Appends frames to the file. frames has the shape ``(n, height,
+        width)``; metadata, if not None, is a frameMetadataDtype array of
+        length n. """
+        if self._tiffWriter is None:
+            self._tiffWriter = tiff.TiffWriter(self._path, bigtiff=True)
+
+        for frame in frames:
+            self._tiffWriter.write(frame, contiguous=True, photometric='minisblack',
+                                   resolution=self._resolution, resolutionunit='CENTIMETER')
+        self._bufferMetadata(metadata, len(frames))
+        self._numFrames += len(frames)
+
+    def flush(self) -> None:
+        """ Flushes the frames written so far to the file. """
+        if self._tiffWriter is not None:
+            self._tiffWriter.filehandle.flush()
+
+    def close(self) -> None:
+        """ Completes the file and writes its sidecar. If no frames were
+        written, an empty file is created, so that every recording leaves a
+        file. """
+        if self._closed:
+            return
+
+        if self._tiffWriter is None:
+            self._tiffWriter = tiff.TiffWriter(self._path, bigtiff=True)
+        self._tiffWriter.close()
+        self._tiffWriter = None
+
+        metadata = self._metadata[:self._numFrames]
+        writeSidecar(getSidecarPath(self._path), {
+            'attrs': self._attrs,
+            'frame_metadata_attrs': self._metadataAttrs,
+            'frame_metadata': {field: metadata[field] for field in frameMetadataDtype.names}
+        })
+        self._closed = True
+
+    def _bufferMetadata(self, metadata, n):
+        required = self._numFrames + n
+        if required > len(self._metadata):
+            grown = np.empty(max(required, 2 * len(self._metadata)), dtype=frameMetadataDtype)
+            grown[:self._numFrames] = self._metadata[:self._numFrames]
+            self._metadata = grown
+
+        bufferSlice = slice(self._numFrames, required)
+        if metadata is not None:
+            self._metadata[bufferSlice] = metadata
+        else:
+            self._metadata[bufferSlice] = np.array((np.nan, -1, np.nan),
+                                                   dtype=frameMetadataDtype)
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
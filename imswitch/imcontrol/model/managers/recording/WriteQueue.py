@@ -0,0 +1,214 @@
+import os
+import shutil
+import tempfile
+import threading
+from collections import deque
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+
+class WriteQueue:
+    """ Bounded FIFO queue of frame chunks between the stage of a recording
+    that collects frames from the detectors and the stage that writes them to
+    files. Chunks are copied when they are put in the queue, before waiting
+    for room, so the producer may pass views into a frame buffer.
+
+    The queue is bounded by the number of bytes of frame data it holds. What
+    happens when a chunk doesn't fit depends on the policy:
+
+    - ``block`` -- wait until the writer has made room. The frames pile up in
+      the detectors' frame buffers in the meantime.
+    - ``drop`` -- discard the chunk. The number of discarded frames is counted
+      per key.
+    - ``spill`` -- write the chunk to a temporary file, which the writer reads
+      back when it gets to the chunk. Spilled chunks don't count towards the
+      memory budget.
+
+    A chunk is always accepted into an empty queue, even if it is larger than
+    the memory budget. The queue is meant to be used by a single producer and
+    a single consumer. """
+
+    policies = ['block', 'drop', 'spill']
+
+    def __init__(self, maxBytes: int, policy: str = 'block',
+                 spillDir: Optional[str] = None) -> None:
+        """
+        Args:
+            maxBytes: The maximum number of bytes of frame data to hold.
+            policy: What to do with chunks that don't fit; see the class
+              description.
+            spillDir: Directory to create the spill files in, if the policy is
+              ``spill``. If None, the system's temporary directory is used.
+        """
+        if policy not in self.policies:
+            raise ValueError(f'Invalid write queue policy "{policy}"; must be one of'
+                             f' {", ".join(self.policies)}')
+
+        self._maxBytes = maxBytes
+        self._policy = policy
+        self._spillDir = spillDir
+        self._spillPath = None
+        self._numSpillFiles = 0
+
+        self._condition = threading.Condition()
+        self._items = deque()
+        self._numFrames = 0
+        self._numBytes = 0
+        self._highWaterMark = 0
+        self._numDropped = {}
+        self._numSpilled = 0
+        self._closed = False
+        self._error = None
+
+    @property
+    def numFrames(self) -> int:
+        """ The number of frames currently in the queue. """
+        return self._numFrames
+
+    @property
+    def numBytes(self) -> int:
+        """ The number of bytes of frame data currently held in memory. """
+        return self._numBytes
+
+    @property
+    def highWaterMark(self) -> int:
+        """ The largest number of bytes of frame data that has been held in
+        memory at once. """
+        return self._highWaterMark
+
+    @property
+    def numSpilled(self) -> int:
+        """ The number of frames that have been spilled to disk. """
+        return self._numSpilled
+
+    def numDropped(self, key: Any) -> int:
+        """ Returns the number of frames with the specified key that have been
+        discarded because the queue was full. """
+        return self._numDropped.get(key, 0)
+
+    def put(self, key: Any, frames: np.ndarray, metadata: Optional[np.ndarray] = None) -> bool:
+        """ Adds a copy of the given frames and metadata to the queue, tagged
+        with key. Returns whether the frames were accepted (they are not if
+        the policy is ``drop`` and the queue is full). Raises an error if the
+        consumer has aborted the queue. """
+
+        n = len(frames)
+        if n < 1:
+            return True
+
+        with self._condition:
+            self._checkError()
+            if self._closed:
+                raise RuntimeError('Write queue has been closed')
+
+            fits = self._fits(frames.nbytes)
+            if not fits and self._policy == 'drop':
+                self._numDropped[key] = self._numDropped.get(key, 0) + n
+                return False
+
+        if not fits and self._policy == 'block':
+            # Copy before waiting, since the frame buffer that the frames may be a view into keeps
+            # being written to in the meantime
+            item = (key, np.array(frames), _copyOrNone(metadata), None)
+            with self._condition:
+                while not self._fits(frames.nbytes) and self._error is None:
+                    self._condition.wait()
+                self._checkError()
+        elif fits:
+            # Copy (or spill) outside of the lock, so that the consumer isn't held up
+            item = (key, np.array(frames), _copyOrNone(metadata), None)
+        else:
+            item = (key, None, _copyOrNone(metadata), self._spill(frames))
+
+        with self._condition:
+            self._items.append(item)
+            self._numFrames += n
+            if item[3] is None:
+                self._numBytes += frames.nbytes
+                self._highWaterMark = max(self._highWaterMark, self._numBytes)
+            else:
+                self._numSpilled += n
+            self._condition.notify_all()
+        return True
+
+    def get(self) -> Optional[Tuple[Any, np.ndarray, Optional[np.ndarray]]]:
+        """ Removes the oldest chunk from the queue and returns it as a tuple
+        ``(key, frames, metadata)``, waiting for one to be added if the queue
+        is empty. Returns None once the queue has been closed and is empty. """
+
+        with self._condition:
+            while not self._items and not self._closed:
+                self._condition.wait()
+            if not self._items:
+                return None
+            key, frames, metadata, spillFile = self._items[0]
+
+        if spillFile is not None:
+            frames = np.load(spillFile)
+            os.remove(spillFile)
+
+        with self._condition:
+            self._items.popleft()
+            self._numFrames -= len(frames)
+            if spillFile is None:
+                self._numBytes -= frames.nbytes
+            self._condition.notify_all()
+        return key, frames, metadata
+
+    def close(self) -> None:
+        """ Marks that no more chunks will be added. get will return the
+        remaining chunks, and then None. """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def abort(self, error: BaseException) -> None:
+        """ Called by the consumer when it can't continue, e.g. because
+        writing failed. Unblocks the producer and makes further calls to put
+        raise an error. """
+        with self._condition:
+            self._error = error
+            self._condition.notify_all()
+
+    def cleanUp(self) -> None:
+        """ Removes any spill files that were not read back. """
+        if self._spillPath is not None:
+            shutil.rmtree(self._spillPath, ignore_errors=True)
+            self._spillPath = None
+
+    def _fits(self, numBytes):
+        return not self._items or self._numBytes + numBytes <= self._maxBytes
+
+    def _checkError(self):
+        if self._error is not None:
+            raise RuntimeError('Writing recorded frames failed') from self._error
+
+    def _spill(self, frames):
+        if self._spillPath is None:
+            self._spillPath = tempfile.mkdtemp(prefix='imswitch_spill_', dir=self._spillDir)
+        self._numSpillFiles += 1
+        spillFile = os.path.join(self._spillPath, f'{self._numSpillFiles}.npy')
+        np.save(spillFile, frames)
+        return spillFile
+
+
+def _copyOrNone(array):
+    return np.array(array) if array is not None else None
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,323 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ..detectors.FrameBuffer import frameMetadataDtype
+from .Compression import ChunkCompressor
+from .Sidecar import toJson
+
+
+class ZarrWriter:
+    """ Writes frames and their metadata records to an OME-Zarr image in a
+    Zarr (format version 2) directory store.
+
+    The image is a group named groupName in the store. The frames go to the
+    array ``0`` in the group, chunked by whole frames, and the metadata
+    records to one array per field in the group's ``frame_metadata``
+    subgroup. The group's attributes hold the OME-Zarr ``multiscales``
+    description along with the attributes set through attrs.
+
+    Each chunk is a file of its own, so chunks are compressed (if a
+    compressor is specified) and written on a pool of threads in parallel.
+    The array shape in the store is advanced as chunks complete, so other
+    processes can open the image and read the frames written so far while
+    the recording is still running. The Zarr format is simple enough to be
+    written directly; the ``zarr`` package is not required. """
+
+    def __init__(self, storePath: str, groupName: str, shape: Tuple[int, int],
+                 dtype: np.dtype, pixelSizeUm: Optional[List[float]] = None,
+                 chunkFrames: Optional[int] = None,
+                 compressor: Optional[ChunkCompressor] = None,
+                 writeThreads: Optional[int] = None) -> None:
+        """
+        Args:
+            storePath: Path of the store directory. Created if it doesn't
+              exist; may already contain other images.
+            groupName: Name of the image group in the store.
+            shape: Frame shape as a tuple ``(height, width)``.
+            dtype: Frame data type.
+            pixelSizeUm: Pixel size as a list ``[z, y, x]``, used for the
+              OME-Zarr coordinate transformations.
+            chunkFrames: The number of frames per chunk. If None, it is chosen
+              so that chunks are about 1 MiB (but hold at least one frame).
+            compressor: The compressor to compress the chunks with, or None to
+              store them uncompressed.
+            writeThreads: The number of threads to compress and write chunks
+              on. If None, one per CPU core is used.
+        """
+        self._shape = tuple(shape)
+        self._dtype = np.dtype(dtype)
+        frameBytes = max(int(np.prod(self._shape)) * self._dtype.itemsize, 1)
+        if chunkFrames is None:
+            chunkFrames = min(max(_targetChunkBytes // frameBytes, 1), 1024)
+        self._chunkFrames = chunkFrames
+        self._compressor = compressor
+        self._pixelSizeUm = pixelSizeUm if pixelSizeUm is not None else [1, 1, 1]
+
+        self._groupPath = os.path.join(storePath, groupName)
+        if os.path.exists(self._groupPath):
+            raise FileExistsError(f'Zarr group "{groupName}" already exists in "{storePath}"')
+        _writeJson(os.path.join(storePath, '.zgroup'), {'zarr_format': 2})
+        _writeJson(os.path.join(self._groupPath, '.zgroup'), {'zarr_format': 2})
+
+        compressorConfig = compressor.zarrConfig if compressor is not None else None
+        self._frameArray = _ZarrArray(
+            os.path.join(self._groupPath, '0'), (self._chunkFrames, *self._shape),
+            self._dtype, 0, compressorConfig
+        )
+        metadataGroupPath = os.path.join(self._groupPath, 'frame_metadata')
+        _writeJson(os.path.join(metadataGroupPath, '.zgroup'), {'zarr_format': 2})
+        self._metadataArrays = {
+            field: _ZarrArray(os.path.join(metadataGroupPath, field), (_metadataChunkRecords,),
+                              frameMetadataDtype[field], fillValue, None)
+            for field, fillValue in [('timestamp', 'NaN'), ('frameNumber', -1),
+                                     ('exposure', 'NaN')]
+        }
+
+        self._attrs = {}
+        self._metadataAttrs = {}
+        self._writeAttrs()
+
+        self._staging = np.empty((self._chunkFrames, *self._shape), dtype=self._dtype)
+        self._numStaged = 0
+        self._numFrames = 0
+        self._numChunksSubmitted = 0
+        self._numChunksCompleted = 0
+        self._lastShapeUpdateTime = 0
+        self._metadata = np.empty(_metadataChunkRecords, dtype=frameMetadataDtype)
+        self._numMetadataBuffered = 0
+        self._numMetadataChunksWritten = 0
+        self._closed = False
+
+        if writeThreads is None:
+            writeThreads = os.cpu_count() or 1
+        self._writePool = ThreadPoolExecutor(writeThreads, thread_name_prefix='ZarrWriter')
+        self._maxPendingChunks = 2 * writeThreads
+        self._pendingChunks = deque()
+
+    @property
+    def attrs(self) -> dict:
+        """ Attributes to store with the image. Saved when the writer is
+        closed; values must be JSON-serializable or numpy scalars or arrays.
+        """
+        return self._attrs
+
+    @property
+    def metadataAttrs(self) -> dict:
+        """ Attributes to store with the frame metadata. Saved when the writer
+        is closed. """
+        return self._metadataAttrs
+
+    @property
+    def numFrames(self) -> int:
+        """ The number of frames that have been written. """
+        return self._numFrames
+
+    def write(self, frames: np.ndarray, metadata: Optional[np.ndarray] = None) -> None:
+        """ Appends the given frames, a numpy array of shape
+        (numFrames, height, width), to the image. metadata, if specified, must
+        be an array of type frameMetadataDtype with one record per frame. The
+        frames are copied before this returns, so they may be views into a
+        frame buffer. """
+
+        n = len(frames)
+        if n < 1:
+            return
+        if self._closed:
+            raise RuntimeError('Writer has been closed')
+
+        self._bufferMetadata(metadata, n)
+
+        i = 0
+        while i < n:
+            numToStage = min(n - i, self._chunkFrames - self._numStaged)
+            self._staging[self._numStaged:self._numStaged + numToStage] = \
+                frames[i:i + numToStage]
+            self._numStaged += numToStage
+            i += numToStage
+            if self._numStaged == self._chunkFrames:
+                self._submitChunk(self._staging)
+                self._staging = np.empty_like(self._staging)  # The old one is being written
+                self._numStaged = 0
+
+        self._numFrames += n
+        self._completeChunks(waitForAll=False)
+
+    def flush(self) -> None:
+        """ Waits for the chunks that are being written and advances the
+        stored array shape to include them. """
+        self._completeChunks(waitForAll=True)
+        self._frameArray.writeMetadata(self._numChunksCompleted * self._chunkFrames)
+
+    def close(self) -> None:
+        """ Writes the remaining frames, metadata and attributes, and sets the
+        stored array shapes to the number of frames written. """
+        if self._closed:
+            return
+
+        if self._numStaged > 0:
+            self._staging[self._numStaged:] = 0  # Zarr chunks at the edge are stored in full
+            self._submitChunk(self._staging)
+            self._numStaged = 0
+        self._completeChunks(waitForAll=True)
+        self._writePool.shutdown()
+
+        self._writeMetadataChunk(final=True)
+        self._frameArray.writeMetadata(self._numFrames)
+        for array in self._metadataArrays.values():
+            array.writeMetadata(self._numFrames)
+        self._writeAttrs()
+
+        self._staging = None
+        self._closed = True
+
+    def _submitChunk(self, frames):
+        chunkIndex = self._numChunksSubmitted
+        self._numChunksSubmitted += 1
+        self._pendingChunks.append(
+            self._writePool.submit(self._encodeAndWriteChunk, chunkIndex, frames)
+        )
+
+    def _encodeAndWriteChunk(self, chunkIndex, frames):
+        data = (self._compressor.compressForZarr(frames) if self._compressor is not None
+                else memoryview(frames).cast('B'))
+        self._frameArray.writeChunk(chunkIndex, data)
+
+    def _completeChunks(self, waitForAll):
+        """ Collects the chunks that have been written, in order, and
+        occasionally advances the stored shape so that readers can see them.
+        Waits for the oldest chunks if there are too many in flight, or for
+        all of them if waitForAll is True. """
+        while self._pendingChunks:
+            future = self._pendingChunks[0]
+            mustWait = waitForAll or len(self._pendingChunks) > self._maxPendingChunks
+            if not mustWait and not future.done():
+                break
+
+            future.result()  # Raises the error if writing failed
+            self._pendingChunks.popleft()
+            self._numChunksCompleted += 1
+
+        now = time.monotonic()
+        if now - self._lastShapeUpdateTime >= _shapeUpdateInterval:
+            self._lastShapeUpdateTime = now
+            self._frameArray.writeMetadata(self._numChunksCompleted * self._chunkFrames)
+
+    def _bufferMetadata(self, metadata, n):
+        i = 0
+        while i < n:
+            numToBuffer = min(n - i, _metadataChunkRecords - self._numMetadataBuffered)
+            bufferSlice = slice(self._numMetadataBuffered,
+                                self._numMetadataBuffered + numToBuffer)
+            if metadata is not None:
+                self._metadata[bufferSlice] = metadata[i:i + numToBuffer]
+            else:
+                self._metadata[bufferSlice] = np.array((np.nan, -1, np.nan),
+                                                       dtype=frameMetadataDtype)
+            self._numMetadataBuffered += numToBuffer
+            i += numToBuffer
+            if self._numMetadataBuffered == _metadataChunkRecords:
+                self._writeMetadataChunk(final=False)
+
+    def _writeMetadataChunk(self, final):
+        if self._numMetadataBuffered < 1:
+            return
+
+        if final:
+            self._metadata[self._numMetadataBuffered:] = np.array(
+                (np.nan, -1, np.nan), dtype=frameMetadataDtype
+            )
+        for field, array in self._metadataArrays.items():
+            array.writeChunk(self._numMetadataChunksWritten,
+                             np.ascontiguousarray(self._metadata[field]))
+        self._numMetadataChunksWritten += 1
+        self._numMetadataBuffered = 0
+
+    def _writeAttrs(self):
+        _, pixelSizeY, pixelSizeX = self._pixelSizeUm
+        groupAttrs = dict(self._attrs)
+        groupAttrs['multiscales'] = [{
+            'version': '0.4',
+            'name': os.path.basename(self._groupPath),
+            'axes': [
+                {'name': 't', 'type': 'time'},
+                {'name': 'y', 'type': 'space', 'unit': 'micrometer'},
+                {'name': 'x', 'type': 'space', 'unit': 'micrometer'}
+            ],
+            'datasets': [{
+                'path': '0',
+                'coordinateTransformations': [
+                    {'type': 'scale', 'scale': [1.0, float(pixelSizeY), float(pixelSizeX)]}
+                ]
+            }]
+        }]
+        _writeJson(os.path.join(self._groupPath, '.zattrs'), groupAttrs)
+        _writeJson(os.path.join(self._groupPath, 'frame_metadata', '.zattrs'),
+                   self._metadataAttrs)
+
+
+class _ZarrArray:
+    """ A Zarr array in a directory store that grows along its first axis. """
+
+    def __init__(self, path, chunks, dtype, fillValue, compressorConfig):
+        self._path = path
+        self._chunks = tuple(chunks)
+        self._dtype = np.dtype(dtype)
+        self._fillValue = fillValue
+        self._compressorConfig = compressorConfig
+        os.makedirs(path)
+        self.writeMetadata(0)
+
+    def writeMetadata(self, length):
+        _writeJson(os.path.join(self._path, '.zarray'), {
+            'zarr_format': 2,
+            'shape': [length, *self._chunks[1:]],
+            'chunks': list(self._chunks),
+            'dtype': self._dtype.str,
+            'compressor': self._compressorConfig,
+            'fill_value': self._fillValue,
+            'order': 'C',
+            'filters': None,
+            'dimension_separator': '.'
+        })
+
+    def writeChunk(self, chunkIndex, data):
+        chunkKey = '.'.join([str(chunkIndex)] + ['0'] * (len(self._chunks) - 1))
+        with open(os.path.join(self._path, chunkKey), 'wb') as file:
+            file.write(data)
+
+
+def _writeJson(path, content):
+    # Written to a temporary file first, so that readers never see a partially written file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporaryPath = f'{path}.tmp'
+    with open(temporaryPath, 'w') as file:
+        json.dump(toJson(content), file, indent=4, allow_nan=False)
+    os.replace(temporaryPath, path)
+
+
+_targetChunkBytes = 1024 ** 2
+_metadataChunkRecords = 1024
+_shapeUpdateInterval = 0.5  # Seconds between updates of the stored shape while recording
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
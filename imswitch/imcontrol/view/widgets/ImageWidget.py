@@ -1,5 +1,5 @@
 import numpy as np
-from qtpy import QtWidgets
+from qtpy import QtCore, QtWidgets
 
 from imswitch.imcommon.model import shortcut
 from imswitch.imcommon.view.guitools import naparitools
@@ -8,6 +8,8 @@ from imswitch.imcommon.view.guitools import naparitools
 class ImageWidget(QtWidgets.QWidget):
     """ Widget containing viewbox that displays the new detector frames. """
 
+    sigContinuousLevelsToggled = QtCore.Signal(bool)  # (enabled)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -16,6 +18,7 @@ class ImageWidget(QtWidgets.QWidget):
         self.updateLevelsWidget = naparitools.NapariUpdateLevelsWidget.addToViewer(
             self.napariViewer
         )
+        self.updateLevelsWidget.sigContinuousToggled.connect(self.sigContinuousLevelsToggled)
         self.NapariShiftWidget = naparitools.NapariShiftWidget.addToViewer(self.napariViewer)
         self.imgLayers = {}
 
@@ -37,9 +40,11 @@ class ImageWidget(QtWidgets.QWidget):
                 self.napariViewer.layers.remove(img, force=True)
 
         def addImage(name, colormap=None):
+            # Multiscale, so that frames can be shown from a downsampled pyramid level, with
+            # napari loading the full resolution level only when zoomed in
             self.imgLayers[name] = self.napariViewer.add_image(
-                np.zeros((1, 1)), rgb=False, name=f'Live: {name}', blending='additive',
-                colormap=colormap, protected=True
+                [np.zeros((1, 1))], multiscale=True, rgb=False, name=f'Live: {name}',
+                blending='additive', colormap=colormap, protected=True
             )
 
         for name in names:
@@ -56,10 +61,14 @@ class ImageWidget(QtWidgets.QWidget):
         return self.napariViewer.active_layer.name
 
     def getImage(self, name):
-        return self.imgLayers[name].data
+        """ Returns the full resolution image of a live view layer. """
+        return self.imgLayers[name].data[0]
 
     def setImage(self, name, im):
-        self.imgLayers[name].data = im
+        """ Sets the image of a live view layer. im is either an image, or a
+        list of increasingly downsampled versions of an image, as returned by
+        guitools.displayPyramid. """
+        self.imgLayers[name].data = im if isinstance(im, list) else [im]
 
     def clearImage(self, name):
         self.setImage(name, np.zeros((1, 1)))
@@ -21,13 +21,16 @@ class RecordingWidget(Widget):
     sigScanOncePicked = QtCore.Signal()
     sigScanLapsePicked = QtCore.Signal()
     sigUntilStopPicked = QtCore.Signal()
+    sigPreTriggerPicked = QtCore.Signal()
 
     sigSnapSaveFormatChanged = QtCore.Signal()
     sigSnapSaveModeChanged = QtCore.Signal()
     sigRecSaveModeChanged = QtCore.Signal()
+    sigRecSaveFormatChanged = QtCore.Signal()
 
     sigSnapRequested = QtCore.Signal()
     sigRecToggled = QtCore.Signal(bool)  # (enabled)
+    sigTriggerRequested = QtCore.Signal()
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -66,6 +69,15 @@ class RecordingWidget(Widget):
         self.recButton.setCheckable(True)
         self.recButton.setSizePolicy(QtWidgets.QSizePolicy.Preferred,
                                      QtWidgets.QSizePolicy.Expanding)
+        self.triggerButton = guitools.BetterPushButton('TRIGGER')
+        self.triggerButton.setStyleSheet("font-size:16px")
+        self.triggerButton.setSizePolicy(QtWidgets.QSizePolicy.Preferred,
+                                         QtWidgets.QSizePolicy.Expanding)
+        self.triggerButton.setEnabled(False)
+
+        # Throughput and health of the current recording
+        self.recStatisticsLabel = QtWidgets.QLabel()
+        self.recStatisticsLabel.setWordWrap(True)
 
         # Number of frames and measurement timing
         modeTitle = QtWidgets.QLabel('<strong>Recording mode</strong>')
@@ -94,6 +106,9 @@ class RecordingWidget(Widget):
 
         self.untilSTOPbtn = QtWidgets.QRadioButton('Run until STOP')
 
+        self.preTriggerBtn = QtWidgets.QRadioButton('Run until STOP, from (s) before trigger')
+        self.preTriggerTimeEdit = QtWidgets.QLineEdit('5')
+
         self.snapSaveFormatLabel = QtWidgets.QLabel('<strong>Snap format:</strong>')
         self.snapSaveFormatList = QtWidgets.QComboBox()
         self.snapSaveFormatList.addItems(['HDF5', 'TIFF'])
@@ -104,6 +119,13 @@ class RecordingWidget(Widget):
                                         'Save to image display',
                                         'Save on disk and to image display'])
 
+        self.recSaveFormatLabel = QtWidgets.QLabel('<strong>Rec format:</strong>')
+        self.recSaveFormatList = QtWidgets.QComboBox()
+        self.recSaveFormatList.addItem('HDF5', 1)
+        self.recSaveFormatList.addItem('TIFF', 2)
+        self.recSaveFormatList.addItem('Zarr', 3)
+        self.recSaveFormatList.addItem('Raw', 4)
+
         self.recSaveModeLabel = QtWidgets.QLabel('<strong>Rec save mode:</strong>')
         self.recSaveModeList = QtWidgets.QComboBox()
         self.recSaveModeList.addItems(['Save on disk',
@@ -117,6 +139,7 @@ class RecordingWidget(Widget):
         buttonGrid.addWidget(self.snapTIFFButton, 0, 0)
         buttonWidget.setSizePolicy(QtWidgets.QSizePolicy.Preferred,
                                    QtWidgets.QSizePolicy.Expanding)
+        buttonGrid.addWidget(self.triggerButton, 0, 1)
         buttonGrid.addWidget(self.recButton, 0, 2)
 
         layout = QtWidgets.QVBoxLayout()
@@ -173,6 +196,10 @@ class RecordingWidget(Widget):
         recGrid.addWidget(self.untilSTOPbtn, gridRow, 0, 1, -1)
         gridRow += 1
 
+        recGrid.addWidget(self.preTriggerBtn, gridRow, 0, 1, 2)
+        recGrid.addWidget(self.preTriggerTimeEdit, gridRow, 2)
+        gridRow += 1
+
         recGrid.addWidget(self.snapSaveFormatLabel, gridRow, 0)
         recGrid.addWidget(self.snapSaveFormatList, gridRow, 1, 1, -1)
         gridRow += 1
@@ -181,6 +208,10 @@ class RecordingWidget(Widget):
         recGrid.addWidget(self.snapSaveModeList, gridRow, 1, 1, -1)
         gridRow += 1
 
+        recGrid.addWidget(self.recSaveFormatLabel, gridRow, 0)
+        recGrid.addWidget(self.recSaveFormatList, gridRow, 1, 1, -1)
+        gridRow += 1
+
         recGrid.addWidget(self.recSaveModeLabel, gridRow, 0)
         recGrid.addWidget(self.recSaveModeList, gridRow, 1, 1, -1)
         gridRow += 1
@@ -190,6 +221,7 @@ class RecordingWidget(Widget):
 
         layout.addWidget(self.recGridContainer)
         layout.addWidget(buttonWidget)
+        layout.addWidget(self.recStatisticsLabel)
 
         # Initial condition of fields and checkboxes.
         self.filenameEdit.setEnabled(False)
@@ -206,13 +238,16 @@ class RecordingWidget(Widget):
         self.recScanOnceBtn.clicked.connect(self.sigScanOncePicked)
         self.recScanLapseBtn.clicked.connect(self.sigScanLapsePicked)
         self.untilSTOPbtn.clicked.connect(self.sigUntilStopPicked)
+        self.preTriggerBtn.clicked.connect(self.sigPreTriggerPicked)
 
         self.snapSaveFormatList.currentIndexChanged.connect(self.sigSnapSaveFormatChanged)
         self.snapSaveModeList.currentIndexChanged.connect(self.sigSnapSaveModeChanged)
         self.recSaveModeList.currentIndexChanged.connect(self.sigRecSaveModeChanged)
+        self.recSaveFormatList.currentIndexChanged.connect(self.sigRecSaveFormatChanged)
 
         self.snapTIFFButton.clicked.connect(self.sigSnapRequested)
         self.recButton.toggled.connect(self.sigRecToggled)
+        self.triggerButton.clicked.connect(self.sigTriggerRequested)
 
     def getDetectorMode(self):
         """ Returns -1 if "current detector at start" is selected, -2 if "all
@@ -237,6 +272,9 @@ class RecordingWidget(Widget):
     def getRecSaveMode(self):
         return self.recSaveModeList.currentIndex() + 1
 
+    def getRecSaveFormat(self):
+        return self.recSaveFormatList.itemData(self.recSaveFormatList.currentIndex())
+
     def getRecFolder(self):
         return self.folderEdit.text()
 
@@ -252,6 +290,9 @@ class RecordingWidget(Widget):
     def getTimeToRec(self):
         return float(self.timeToRec.text())
 
+    def getPreTriggerTime(self):
+        return float(self.preTriggerTimeEdit.text())
+
     def getTimelapseTime(self):
         return int(float(self.timeLapseEdit.text()))
 
@@ -312,6 +353,12 @@ class RecordingWidget(Widget):
     def setRecSaveMode(self, saveMode):
         self.recSaveModeList.setCurrentIndex(saveMode - 1)
 
+    def setRecSaveFormat(self, saveFormat):
+        self.recSaveFormatList.setCurrentIndex(self.recSaveFormatList.findData(saveFormat))
+
+    def setRecSaveFormatEnabled(self, value):
+        self.recSaveFormatList.setEnabled(value)
+
     def setRecSaveModeVisible(self, value):
         self.recSaveModeLabel.setVisible(value)
         self.recSaveModeList.setVisible(value)
@@ -343,12 +390,17 @@ class RecordingWidget(Widget):
     def checkUntilStop(self):
         self.untilSTOPbtn.setChecked(True)
 
+    def checkPreTrigger(self):
+        self.preTriggerBtn.setChecked(True)
+
     def setFieldsEnabled(self, enabled):
         self.recGridContainer.setEnabled(enabled)
 
-    def setEnabledParams(self, specFrames=False, specTime=False, scanLapse=False):
+    def setEnabledParams(self, specFrames=False, specTime=False, scanLapse=False,
+                         preTrigger=False):
         self.numExpositionsEdit.setEnabled(specFrames)
         self.timeToRec.setEnabled(specTime)
+        self.preTriggerTimeEdit.setEnabled(preTrigger)
         self.timeLapseEdit.setEnabled(scanLapse)
         self.freqEdit.setEnabled(scanLapse)
         self.singleFileLapseBox.setEnabled(scanLapse)
@@ -356,12 +408,18 @@ class RecordingWidget(Widget):
     def setRecButtonChecked(self, checked):
         self.recButton.setChecked(checked)
 
+    def setTriggerButtonEnabled(self, enabled):
+        self.triggerButton.setEnabled(enabled)
+
     def setNumExpositions(self, numExpositions):
         self.numExpositionsEdit.setText(str(numExpositions))
 
     def setTimeToRec(self, secondsToRec):
         self.numExpositionsEdit.setText(str(secondsToRec))
 
+    def setPreTriggerTime(self, secondsBefore):
+        self.preTriggerTimeEdit.setText(str(secondsBefore))
+
     def setTimelapseTime(self, secondsToRec):
         self.timeLapseEdit.setText(str(secondsToRec))
 
@@ -380,6 +438,9 @@ class RecordingWidget(Widget):
     def updateRecLapseNum(self, lapseNum):
         self.currentLapse.setText(str(lapseNum) + ' /')
 
+    def setRecStatisticsText(self, text):
+        self.recStatisticsLabel.setText(text)
+
     @shortcut('Ctrl+R', "Record")
     def toggleRecButton(self):
         self.recButton.toggle()
@@ -17,6 +17,9 @@ class MultiDataFrameController(ImRecWidgetController):
         self._moduleCommChannel.memoryRecordings.sigDataSavedToDisk.connect(
             self.memoryDataSavedToDisk
         )
+        self._moduleCommChannel.memoryRecordings.sigDataWillEvict.connect(
+            self.memoryDataWillEvict
+        )
         self._moduleCommChannel.memoryRecordings.sigDataWillRemove.connect(
             self.memoryDataWillRemove
         )
@@ -53,7 +56,7 @@ class MultiDataFrameController(ImRecWidgetController):
         if not isinstance(data, h5py.File):
             data = h5py.File(data)
 
-        for datasetName in data.keys():
+        for datasetName in DataObj._getHdf5DatasetNames(data):
             self.makeAndAddDataObj(
                 name, datasetName, path=vFileItem.filePath if vFileItem.savedToDisk else None,
                 file=data
@@ -65,6 +68,12 @@ class MultiDataFrameController(ImRecWidgetController):
             self._widget.setDataObjMemoryFlag(dataObj, False)
         self.updateInfo()
 
+    def memoryDataWillEvict(self, name):
+        # The data has been saved to disk, and will be loaded from there when needed
+        for dataObj in list(self.getDataObjsByMemRecordingName(name)):
+            dataObj.checkAndUnloadData()
+        self.updateInfo()
+
     def memoryDataWillRemove(self, name):
         for dataObj in self.getDataObjsByMemRecordingName(name):
             dataObj.checkAndUnloadData()
@@ -1,3 +1,4 @@
+import json
 import os
 
 import h5py
@@ -28,7 +29,15 @@ class DataObj:
         if isinstance(self._file, h5py.File):
             self._data = np.array(self._file.get(self._datasetName)[:])
         elif isinstance(self._file, tiff.TiffFile):
-            self._data = self._file.asarray()
+            try:
+                # Recorded stacks are stored contiguously, so they needn't be read into memory
+                self._data = tiff.memmap(self._file.filehandle.path, mode='r')
+            except ValueError:
+                self._data = self._file.asarray()
+            if self._data.ndim == 2:
+                self._data = self._data[np.newaxis]  # Single frame
+        elif isinstance(self._file, RawFile):
+            self._data = self._file.data
 
         return self._data
 
@@ -41,6 +50,14 @@ class DataObj:
             attrs = dict(self._file.attrs)
             attrs.update(dict(self._file[self.datasetName].attrs))
             self._attrs = attrs
+        elif isinstance(self._file, tiff.TiffFile):
+            # Recordings store their attributes in a JSON sidecar
+            sidecarPath = f'{self._file.filehandle.path}.json'
+            if os.path.isfile(sidecarPath):
+                with open(sidecarPath) as sidecarFile:
+                    self._attrs = json.load(sidecarFile).get('attrs')
+        elif isinstance(self._file, RawFile):
+            self._attrs = self._file.sidecar.get('attrs')
 
         return self._attrs
 
@@ -91,8 +108,8 @@ class DataObj:
         file, _ = DataObj._open(path, allowMultipleDatasets=True)
         try:
             if isinstance(file, h5py.File):
-                return list(file.keys())
-            elif isinstance(file, tiff.TiffFile):
+                return DataObj._getHdf5DatasetNames(file)
+            elif isinstance(file, (tiff.TiffFile, RawFile)):
                 return ['default']
             else:
                 raise ValueError(f'Unsupported file type "{type(file).__name__}"')
@@ -104,20 +121,28 @@ class DataObj:
         ext = os.path.splitext(path)[1]
         if ext in ['.hdf5', '.hdf']:
             file = h5py.File(path, 'r')
-            if len(file) < 1:
+            datasetNames = DataObj._getHdf5DatasetNames(file)
+            if len(datasetNames) < 1:
                 raise RuntimeError('File does not contain any datasets')
-            elif len(file) > 1 and datasetName is None and not allowMultipleDatasets:
+            elif len(datasetNames) > 1 and datasetName is None and not allowMultipleDatasets:
                 raise RuntimeError('File contains multiple datasets')
 
             if datasetName is None and not allowMultipleDatasets:
-                datasetName = list(file.keys())[0]
+                datasetName = datasetNames[0]
 
             return file, datasetName
         elif ext in ['.tiff', '.tif']:
             return tiff.TiffFile(path), None
+        elif ext == '.raw':
+            return RawFile(path), None
         else:
             raise ValueError(f'Unsupported file extension "{ext}"')
 
+    @staticmethod
+    def _getHdf5DatasetNames(file):
+        # Only top-level datasets contain images; groups such as frame_metadata are skipped
+        return [name for name, item in file.items() if isinstance(item, h5py.Dataset)]
+
     def describesSameAs(self, other):  # Don't use __eq__, that makes the class unhashable
         try:
             sameFile = self._file == other._file or self._file.filename == other._file.filename
@@ -130,6 +155,29 @@ class DataObj:
                 self.datasetName == other.datasetName)
 
 
+class RawFile:
+    """ A raw binary recording, opened as a read-only memory map, so that
+    even very large recordings needn't be read into memory. The frame shape
+    and data type are read from the JSON sidecar next to the file, which has
+    ``.json`` appended to the file's name. """
+
+    def __init__(self, path):
+        self.filename = path
+        with open(f'{path}.json') as sidecarFile:
+            self.sidecar = json.load(sidecarFile)
+
+        shape = tuple(self.sidecar['shape'])
+        dtype = np.dtype(self.sidecar['dtype'])
+        numFrames = os.path.getsize(path) // (int(np.prod(shape)) * dtype.itemsize)
+        if numFrames > 0:
+            self.data = np.memmap(path, dtype=dtype, mode='r', shape=(numFrames, *shape))
+        else:
+            self.data = np.empty((0, *shape), dtype=dtype)  # Empty files can't be mapped
+
+    def close(self):
+        self.data = None  # The memory map is closed once all references to it are gone
+
+
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
 #
@@ -0,0 +1,79 @@
+""" Benchmarks compressed recording: writes synthetic frames to an HDF5 file
+with each codec that ChunkCompressor supports, and reports the achieved
+throughput and compression ratio.
+
+Usage: python tools/benchmarkcompression.py [numFrames] [directory]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import h5py
+
+from imswitch.imcontrol.model.interfaces.syntheticcamera import SyntheticCamera
+from imswitch.imcontrol.model.managers.recording.Compression import ChunkCompressor
+from imswitch.imcontrol.model.managers.recording.HDF5Writer import HDF5Writer
+
+
+def benchmark(frames, numFrames, directory, codec):
+    filePath = os.path.join(directory, f'benchmark_{codec or "none"}.hdf5')
+    compressor = ChunkCompressor(codec) if codec is not None else None
+    chunkSize = 16
+
+    startTime = time.perf_counter()
+    with h5py.File(filePath, 'w') as file:
+        writer = HDF5Writer(file, 'data', frames.shape[1:], frames.dtype,
+                            expectedFrames=numFrames, compressor=compressor)
+        for i in range(0, numFrames, chunkSize):
+            start = i % (len(frames) - chunkSize)
+            writer.write(frames[start:start + chunkSize])
+        writer.close()
+        rawSize = writer.numFrames * frames[0].nbytes
+        storageSize = file['data'].id.get_storage_size()
+    duration = time.perf_counter() - startTime
+
+    os.remove(filePath)
+    return rawSize / duration / 1024 ** 2, rawSize / storageSize
+
+
+def main():
+    numFrames = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    directory = sys.argv[2] if len(sys.argv) > 2 else tempfile.gettempdir()
+
+    # Sparse beads with camera noise in the range of a 12-bit camera
+    frames = SyntheticCamera(width=1024, height=1024, fps=100, pattern='beads',
+                             bankSize=64, seed=0)._bank >> 4
+
+    print(f'{numFrames} frames of {frames.shape[2]}x{frames.shape[1]} {frames.dtype}'
+          f' to {directory}')
+    print(f'{"Codec":<8}{"MB/s":>10}{"Ratio":>10}')
+    for codec in [None] + ChunkCompressor.codecs:
+        try:
+            throughput, ratio = benchmark(frames, numFrames, directory, codec)
+        except ModuleNotFoundError as e:
+            print(f'{codec:<8}  skipped: {e}')
+            continue
+        print(f'{codec or "none":<8}{throughput:>10.0f}{ratio:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.